@@ -0,0 +1,66 @@
+'''
+    Importing required modules
+'''
+import threading
+
+
+class AllocGroups:
+
+    '''
+        Constructor :
+            numbers 0 .. total-1 (inodes or data blocks) are split into about 'count' groups of consecutive numbers,
+            group size is a multiple of 'align'; every group has its own lock, so threads allocating from
+            different groups do not wait for each other
+    '''
+    def __init__(self, total, count, align=1):
+        size = -(-total // max(count, 1))
+        self.total = total                                      # no of numbers split into groups
+        self.group_size = max(-(-size // align) * align, align) # no of numbers per group, last group might be shorter
+        self.count = max(-(-total // self.group_size), 1)       # no of groups
+        self.locks = [threading.Lock() for x in range(self.count)]  # lock of every group
+
+
+    '''
+        Function to fetch group of number 'num'
+    '''
+    def get_group(self, num):
+        return num // self.group_size
+
+
+    '''
+        Function to fetch range of numbers of group 'group' as (start, end), end excluded
+    '''
+    def get_range(self, group):
+        return group*self.group_size, min((group + 1)*self.group_size, self.total)
+
+
+    '''
+        Function to fetch order in which groups are searched by a thread whose own group is 'home' :
+        its own group first, then following groups (wrapping around), so that a thread whose group has
+        run dry takes from its neighbours
+    '''
+    def search_order(self, home):
+        home %= self.count
+        return list(range(home, self.count)) + list(range(home))
+
+
+    '''
+        Function to split list of numbers by group, returns dictionary of group -> numbers (order kept)
+    '''
+    def split(self, nums):
+        groups = {}
+        for num in nums:
+            groups.setdefault(num // self.group_size, []).append(num)
+        return groups
+
+
+    '''
+        Functions to acquire/release locks of all groups (in ascending order), for operations spanning groups
+    '''
+    def acquire_all(self):
+        for lock in self.locks:
+            lock.acquire()
+
+    def release_all(self):
+        for lock in reversed(self.locks):
+            lock.release()
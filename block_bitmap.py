@@ -0,0 +1,242 @@
+'''
+    Importing required modules
+'''
+import re
+
+
+class BlockBitmap:
+
+    # static variables, shared by all instances of class
+    word_size = 8                           # bitmap is persisted in words of 8 bytes (64 blocks)
+    not_full_byte = re.compile(b'[^\xff]')  # matches a byte having at least one free block
+    not_empty_byte = re.compile(b'[^\x00]') # matches a byte having at least one used block
+
+    '''
+        Constructor :
+            one bit per data block, bit set means block is in use, all blocks are free initially;
+            blocks are split into groups of 'group_size' blocks (multiple of 64, whole bitmap by default),
+            every group has counters of its own, so that different groups can be changed by different threads
+    '''
+    def __init__(self, total_blocks, group_size=0):
+        self.total_blocks = total_blocks                        # no of blocks tracked by bitmap
+        self.bits = bytearray((total_blocks + 7) // 8)          # bit (x % 8) of byte (x // 8) represents block x
+        self.group_size = group_size if group_size > 0 else max(total_blocks, 1)  # no of blocks per group
+        self.group_count = max(-(-total_blocks // self.group_size), 1)            # no of groups
+        self.group_used = [0]*self.group_count                  # no of blocks in use in every group
+        self.group_first_free = [x*self.group_size for x in range(self.group_count)]  # no block of group below this is free
+        self.dirty_words = set()                                # word indexes changed since last flush
+        self.mark_all_dirty()
+
+
+    '''
+        Function to load bitmap from byte stream read from drive
+    '''
+    def load(self, byte_stream):
+        self.bits = bytearray(byte_stream[:len(self.bits)])
+        self.group_used = []
+        for group in range(self.group_count):
+            start, end = self.get_group_range(group)
+            self.group_used.append(bin(int.from_bytes(self.bits[start >> 3:(end + 7) >> 3], 'big')).count('1'))
+        self.group_first_free = [x*self.group_size for x in range(self.group_count)]
+        self.dirty_words = set()
+
+
+    '''
+        Function to get count of blocks in use
+    '''
+    @property
+    def used_count(self):
+        return sum(self.group_used)
+
+
+    '''
+        Function to get range of blocks of group 'group' as (start, end), whole bitmap if group is None
+    '''
+    def get_group_range(self, group=None):
+        if group is None:
+            return 0, self.total_blocks
+        return group*self.group_size, min((group + 1)*self.group_size, self.total_blocks)
+
+
+    '''
+        Function to get count of free blocks, of group 'group' only if given
+    '''
+    def get_free_count(self, group=None):
+        if group is None:
+            return self.total_blocks - self.used_count
+        start, end = self.get_group_range(group)
+        return end - start - self.group_used[group]
+
+
+    '''
+        Function to check whether a block is in use
+    '''
+    def is_used(self, block_num):
+        return (self.bits[block_num >> 3] >> (block_num & 7)) & 1 == 1
+
+
+    '''
+        Functions to mark 'count' blocks starting from 'start' as used/free
+    '''
+    def set_used(self, start, count=1):
+        for block_num in range(start, start + count):
+            mask = 1 << (block_num & 7)
+            if not self.bits[block_num >> 3] & mask:
+                self.bits[block_num >> 3] |= mask
+                self.group_used[block_num // self.group_size] += 1
+                self.dirty_words.add(block_num >> 6)
+
+    def set_free(self, start, count=1):
+        for block_num in range(start, start + count):
+            mask = 1 << (block_num & 7)
+            if self.bits[block_num >> 3] & mask:
+                group = block_num // self.group_size
+                self.bits[block_num >> 3] &= ~mask
+                self.group_used[group] -= 1
+                self.dirty_words.add(block_num >> 6)
+                if block_num < self.group_first_free[group]:
+                    self.group_first_free[group] = block_num
+
+
+    '''
+        Generator function to iterate over runs of free blocks as (start, length), from block 'start' till
+        block 'end' (excluded, end of bitmap by default)
+    '''
+    def free_runs(self, start=0, end=None):
+        end = self.total_blocks if end is None else end
+        if start >= end:
+            return
+        group = start // self.group_size
+        group_end = min((group + 1)*self.group_size, self.total_blocks)
+        from_first_free = start <= self.group_first_free[group]
+        pos = max(start, self.group_first_free[group])
+        while pos < end:
+            # searching first free block at or after pos, fully used bytes are skipped by regex
+            byte_idx = pos >> 3
+            byte = self.bits[byte_idx] | ((1 << (pos & 7)) - 1)
+            if byte == 0xff:
+                match = self.not_full_byte.search(self.bits, byte_idx + 1)
+                if match is None:
+                    return
+                byte_idx = match.start()
+                byte = self.bits[byte_idx]
+            bit = (~byte & (byte + 1)).bit_length() - 1
+            run_start = (byte_idx << 3) + bit
+            if run_start >= end:
+                return
+            if from_first_free:
+                # blocks of group skipped so far are all in use, moving the hint forward
+                self.group_first_free[group] = min(run_start, group_end)
+                from_first_free = False
+
+            # searching first used block after run_start, fully free bytes are skipped by regex
+            byte = self.bits[byte_idx] & ~((1 << (bit + 1)) - 1) & 0xff
+            if byte == 0:
+                match = self.not_empty_byte.search(self.bits, byte_idx + 1)
+                if match is None:
+                    run_end = end
+                else:
+                    byte_idx = match.start()
+                    byte = self.bits[byte_idx]
+                    run_end = (byte_idx << 3) + (byte & -byte).bit_length() - 1
+            else:
+                run_end = (byte_idx << 3) + (byte & -byte).bit_length() - 1
+
+            run_end = min(run_end, end)
+            yield run_start, run_end - run_start
+            pos = run_end
+
+
+    '''
+        Function to allocate 'n' blocks using first fit,
+        returns list of block numbers, or empty list if there are not enough free blocks
+    '''
+    def allocate(self, n):
+        if n > self.get_free_count():
+            return []
+
+        blocks = []
+        for run_start, run_len in self.free_runs():
+            take = min(run_len, n - len(blocks))
+            self.set_used(run_start, take)
+            blocks.extend(range(run_start, run_start + take))
+            if len(blocks) == n:
+                break
+        return blocks
+
+
+    '''
+        Function to allocate 'n' contiguous blocks using first fit, within group 'group' if given,
+        returns starting block number, -1 if no free run is long enough
+    '''
+    def allocate_run(self, n, group=None):
+        for run_start, run_len in self.free_runs(*self.get_group_range(group)):
+            if run_len >= n:
+                self.set_used(run_start, n)
+                return run_start
+        return -1
+
+
+    '''
+        Function to allocate 'n' blocks as few extents as possible, within group 'group' if given,
+        a single run is preferred (first fit), otherwise longest free runs are taken first,
+        returns list of (start, count), or empty list if there are not enough free blocks
+    '''
+    def allocate_extents(self, n, group=None):
+        if n <= 0 or n > self.get_free_count(group):
+            return []
+
+        start = self.allocate_run(n, group)
+        if start >= 0:
+            return [(start, n)]
+
+        # no single run is long enough, picking longest runs
+        runs = sorted(self.free_runs(*self.get_group_range(group)), key=lambda run: run[1], reverse=True)
+        extents = []
+        for run_start, run_len in runs:
+            take = min(run_len, n)
+            self.set_used(run_start, take)
+            extents.append((run_start, take))
+            n -= take
+            if n == 0:
+                break
+
+        # keeping extents in block order, so that file data is laid out sequentially where possible
+        extents.sort()
+        return extents
+
+
+    '''
+        Function to release list of blocks
+    '''
+    def release(self, blocks):
+        for block_num in blocks:
+            self.set_free(block_num)
+
+
+    '''
+        Functions to manage words that have to be written to drive
+    '''
+    def mark_all_dirty(self):
+        self.dirty_words = set(range((len(self.bits) + self.word_size - 1) // self.word_size))
+
+    def clear_dirty(self):
+        self.dirty_words = set()
+
+
+    '''
+        Function to fetch changed parts of bitmap as list of (byte offset, bytes),
+        adjacent dirty words are coalesced into one entry
+    '''
+    def get_dirty_runs(self):
+        runs = []
+        run_start, run_end = -1, -1
+        for word in sorted(self.dirty_words):
+            if word != run_end:
+                if run_start >= 0:
+                    runs.append((run_start*self.word_size, bytes(self.bits[run_start*self.word_size:run_end*self.word_size])))
+                run_start = word
+            run_end = word + 1
+        if run_start >= 0:
+            runs.append((run_start*self.word_size, bytes(self.bits[run_start*self.word_size:run_end*self.word_size])))
+        return runs
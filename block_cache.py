@@ -0,0 +1,101 @@
+'''
+    Importing required modules
+'''
+from collections import OrderedDict
+import threading
+
+
+class BlockCache:
+
+    '''
+        Constructor :
+            max_bytes is the byte budget of cache, least recently used blocks are evicted beyond it,
+            cache can be used by several threads
+    '''
+    def __init__(self, max_bytes):
+        self.mutex = threading.Lock()
+        self.max_bytes = max_bytes          # byte budget of cache
+        self.used_bytes = 0                 # bytes currently held by cached blocks
+        self.blocks = OrderedDict()         # data block number -> block bytes, ordered from least to most recently used
+        self.hits = 0                       # no of reads served by cache
+        self.misses = 0                     # no of reads that had to go to drive
+        self.evictions = 0                  # no of blocks evicted to stay within budget
+
+
+    '''
+        Function to fetch first 'n' bytes of data block 'block_num',
+        returns None if block is not cached (or cached part is shorter than 'n')
+    '''
+    def get(self, block_num, n):
+        with self.mutex:
+            data = self.blocks.get(block_num)
+            if data is None or len(data) < n:
+                self.misses += 1
+                return None
+
+            self.blocks.move_to_end(block_num)
+            self.hits += 1
+        if len(data) == n:
+            return data
+        return data[:n]
+
+
+    '''
+        Function to store (or replace) data of block 'block_num' in cache
+    '''
+    def put(self, block_num, data):
+        data = bytes(data)
+        with self.mutex:
+            self.invalidate_locked(block_num)
+            if len(data) > self.max_bytes:
+                return
+
+            self.blocks[block_num] = data
+            self.used_bytes += len(data)
+
+            # evicting least recently used blocks
+            while self.used_bytes > self.max_bytes:
+                old_num, old_data = self.blocks.popitem(last=False)
+                self.used_bytes -= len(old_data)
+                self.evictions += 1
+
+
+    '''
+        Function to drop a block from cache, called when block is released or rewritten outside cache
+    '''
+    def invalidate(self, block_num):
+        with self.mutex:
+            self.invalidate_locked(block_num)
+
+    def invalidate_blocks(self, block_nums):
+        with self.mutex:
+            for block_num in block_nums:
+                self.invalidate_locked(block_num)
+
+    def invalidate_locked(self, block_num):
+        data = self.blocks.pop(block_num, None)
+        if data is not None:
+            self.used_bytes -= len(data)
+
+
+    '''
+        Function to empty the cache
+    '''
+    def clear(self):
+        with self.mutex:
+            self.blocks.clear()
+            self.used_bytes = 0
+
+
+    '''
+        Function to fetch cache counters, used to size the cache
+    '''
+    def get_stats(self):
+        total = self.hits + self.misses
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': (self.hits / total) if total > 0 else 0.0,
+                'evictions': self.evictions,
+                'cached_blocks': len(self.blocks),
+                'used_bytes': self.used_bytes,
+                'max_bytes': self.max_bytes}
@@ -0,0 +1,386 @@
+'''
+    Importing required modules
+'''
+import mmap
+import os
+
+
+'''
+    Function to drop first 'n' bytes from a list of buffers, used to resume a partial vectored read/write
+'''
+def advance_buffers(buffers, n):
+    remaining = []
+    for buf in buffers:
+        buf = memoryview(buf).cast('B')
+        if n >= len(buf):
+            n -= len(buf)
+        else:
+            remaining.append(buf[n:])
+            n = 0
+    return remaining
+
+
+'''
+    Function to copy 'n' bytes from 'src_offset' of file descriptor 'src_fd' to 'dst_offset' of 'dst_fd' inside the kernel,
+    os.copy_file_range is tried first, then os.sendfile, then pread/pwrite through a bounded buffer,
+    returns no of bytes copied, fewer than 'n' only if end of source file is reached
+'''
+def copy_range(src_fd, src_offset, dst_fd, dst_offset, n, chunk_size=1024*1024):
+    copied = 0
+
+    # copy_file_range (Linux), fails with EXDEV/ENOSYS/EINVAL where it is not supported, e.g. across file systems
+    if hasattr(os, 'copy_file_range'):
+        try:
+            while copied < n:
+                count = os.copy_file_range(src_fd, dst_fd, n - copied, src_offset + copied, dst_offset + copied)
+                if count == 0:
+                    return copied
+                copied += count
+            return copied
+        except OSError:
+            pass
+
+    # sendfile writes at current position of destination, not used within one file
+    # as copies inside drive may run concurrently on the shared descriptor
+    if hasattr(os, 'sendfile') and src_fd != dst_fd:
+        try:
+            os.lseek(dst_fd, dst_offset + copied, os.SEEK_SET)
+            while copied < n:
+                count = os.sendfile(dst_fd, src_fd, src_offset + copied, n - copied)
+                if count == 0:
+                    return copied
+                copied += count
+            return copied
+        except OSError:
+            pass
+
+    while copied < n:
+        if hasattr(os, 'pread'):
+            data = os.pread(src_fd, min(chunk_size, n - copied), src_offset + copied)
+        else:
+            os.lseek(src_fd, src_offset + copied, os.SEEK_SET)
+            data = os.read(src_fd, min(chunk_size, n - copied))
+        if len(data) == 0:
+            break
+        view = memoryview(data)
+        while len(view) > 0:
+            if hasattr(os, 'pwrite'):
+                written = os.pwrite(dst_fd, view, dst_offset + copied)
+            else:
+                os.lseek(dst_fd, dst_offset + copied, os.SEEK_SET)
+                written = os.write(dst_fd, view)
+            view = view[written:]
+            copied += written
+    return copied
+
+
+'''
+    Function to write 'n' zero bytes at 'offset' of file descriptor 'fd', through a bounded buffer
+'''
+def write_zeros(fd, offset, n, chunk_size=1024*1024):
+    zeros = memoryview(bytes(min(n, chunk_size)))
+    while n > 0:
+        if hasattr(os, 'pwrite'):
+            written = os.pwrite(fd, zeros[:n], offset)
+        else:
+            os.lseek(fd, offset, os.SEEK_SET)
+            written = os.write(fd, zeros[:n])
+        offset += written
+        n -= written
+
+
+class BlockDevice:
+
+    # static variables, shared by all instances of class
+    block_size = 4096           # default no of bytes per data block, drives of format version 3 choose their own
+    inode_size = 256            # no of bytes per inode
+
+    '''
+        Constructor :
+            opens the drive file once, the file descriptor stays open till close() is called
+    '''
+    def __init__(self, drive_filename, inode_block_offset, data_block_offset, block_size=4096):
+        self.drive_filename = drive_filename                    # name of the virtual drive file
+        self.block_size = block_size                            # no of bytes per data block of this drive
+        self.inode_block_offset = inode_block_offset            # starting position of inode block
+        self.data_block_offset = data_block_offset              # starting position of data block
+        self.has_pread = hasattr(os, 'pread')                   # positional I/O is not available on every platform
+        self.has_preadv = hasattr(os, 'preadv')                 # vectored positional I/O (Linux/BSD only)
+        self.fd = os.open(drive_filename, os.O_RDWR | getattr(os, 'O_BINARY', 0))
+
+
+    '''
+        Function to read 'n' bytes starting at 'offset' of the drive,
+        returns fewer bytes only if end of drive file is reached
+    '''
+    def pread(self, offset, n):
+        chunks = []
+        while n > 0:
+            if self.has_pread:
+                chunk = os.pread(self.fd, n, offset)
+            else:
+                os.lseek(self.fd, offset, os.SEEK_SET)
+                chunk = os.read(self.fd, n)
+            if len(chunk) == 0:
+                break
+            chunks.append(chunk)
+            offset += len(chunk)
+            n -= len(chunk)
+
+        if len(chunks) == 1:
+            return chunks[0]
+        return b''.join(chunks)
+
+
+    '''
+        Function to write byte stream at 'offset' of the drive
+    '''
+    def pwrite(self, offset, byte_stream):
+        view = memoryview(byte_stream)
+        while len(view) > 0:
+            if self.has_pread:
+                written = os.pwrite(self.fd, view, offset)
+            else:
+                os.lseek(self.fd, offset, os.SEEK_SET)
+                written = os.write(self.fd, view)
+            view = view[written:]
+            offset += written
+
+
+    '''
+        Function to read drive starting at 'offset' directly into list of writable buffers (scatter read),
+        buffer space beyond end of drive file is left untouched, returns no of bytes read
+    '''
+    def preadv(self, offset, buffers):
+        if not self.has_preadv:
+            total = 0
+            for buf in buffers:
+                data = self.pread(offset + total, len(buf))
+                buf[:len(data)] = data
+                total += len(buf)
+            return total
+
+        total = 0
+        buffers = advance_buffers(buffers, 0)
+        while len(buffers) > 0:
+            n = os.preadv(self.fd, buffers, offset + total)
+            if n == 0:
+                break
+            total += n
+            buffers = advance_buffers(buffers, n)
+        return total
+
+
+    '''
+        Function to write list of buffers to drive starting at 'offset' (gather write), no buffer is concatenated
+    '''
+    def pwritev(self, offset, buffers):
+        if not self.has_preadv:
+            self.pwrite(offset, b''.join(buffers))
+            return
+
+        buffers = advance_buffers(buffers, 0)
+        while len(buffers) > 0:
+            n = os.pwritev(self.fd, buffers, offset)
+            offset += n
+            buffers = advance_buffers(buffers, n)
+
+
+    '''
+        Functions to read/write data block 'block_num', 'n' can be used to read partial (last) block,
+        'offset' is position inside the block where write starts
+    '''
+    def read_block(self, block_num, n=None):
+        if n is None:
+            n = self.block_size
+        return self.pread(self.data_block_offset + block_num*self.block_size, n)
+
+    def write_block(self, block_num, byte_stream, offset=0):
+        self.pwrite(self.data_block_offset + block_num*self.block_size + offset, byte_stream)
+
+    def readinto_block(self, block_num, buf):
+        return self.preadv(self.data_block_offset + block_num*self.block_size, [buf])
+
+
+    '''
+        Functions to copy data between drive and a host file without passing it through Python objects,
+        import copies 'n' bytes of host file 'fd' at 'fd_offset' to data block 'block_num' (at 'offset' inside block),
+        returns no of bytes copied; export copies 'n' bytes of block 'block_num' to host file 'fd' at 'fd_offset',
+        drive space beyond end of drive file is exported as zeros
+    '''
+    def import_blocks(self, block_num, fd, fd_offset, n, offset=0):
+        return copy_range(fd, fd_offset, self.fd, self.data_block_offset + block_num*self.block_size + offset, n)
+
+    def export_blocks(self, block_num, fd, fd_offset, n, offset=0):
+        copied = copy_range(self.fd, self.data_block_offset + block_num*self.block_size + offset, fd, fd_offset, n)
+        if copied < n:
+            write_zeros(fd, fd_offset + copied, n - copied)
+
+
+    '''
+        Function to copy 'n' bytes from data block 'src_block' to data block 'dst_block' inside the drive file,
+        source and destination ranges must not overlap
+    '''
+    def copy_blocks(self, src_block, dst_block, n):
+        dst_offset = self.data_block_offset + dst_block*self.block_size
+        copied = copy_range(self.fd, self.data_block_offset + src_block*self.block_size, self.fd, dst_offset, n)
+        if copied < n:
+            # destination block may hold data of a released file
+            write_zeros(self.fd, dst_offset + copied, n - copied)
+
+
+    '''
+        Functions to read/write raw bytes of inode 'inode_num'
+    '''
+    def read_inode(self, inode_num):
+        return self.pread(self.inode_block_offset + inode_num*self.inode_size, self.inode_size)
+
+    def write_inode(self, inode_num, byte_stream):
+        self.pwrite(self.inode_block_offset + inode_num*self.inode_size, byte_stream)
+
+
+    '''
+        Function to flush pending writes, writes on file descriptor are not buffered
+    '''
+    def flush(self):
+        pass
+
+
+    '''
+        Function to close the drive file
+    '''
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+class MappedBlockDevice(BlockDevice):
+
+    '''
+        Constructor :
+            maps the entire drive into memory, drive file is extended to 'drive_size' if it is smaller;
+            raises OSError/ValueError (drive file closed) if drive can not be mapped
+    '''
+    def __init__(self, drive_filename, inode_block_offset, data_block_offset, drive_size, block_size=4096):
+        BlockDevice.__init__(self, drive_filename, inode_block_offset, data_block_offset, block_size)
+
+        # data region is not preallocated by formatting, mapping needs the whole drive to be present
+        try:
+            if os.fstat(self.fd).st_size < drive_size:
+                os.ftruncate(self.fd, drive_size)
+            self.mm = mmap.mmap(self.fd, 0)
+        except (OSError, ValueError):
+            BlockDevice.close(self)
+            raise
+
+
+    '''
+        Function to read 'n' bytes starting at 'offset', no system call is needed
+    '''
+    def pread(self, offset, n):
+        return self.mm[offset:offset+n]
+
+
+    '''
+        Function to copy drive contents starting at 'offset' into list of writable buffers
+    '''
+    def preadv(self, offset, buffers):
+        total = 0
+        with memoryview(self.mm) as mm_view:
+            for buf in buffers:
+                buf[:] = mm_view[offset + total:offset + total + len(buf)]
+                total += len(buf)
+        return total
+
+
+    '''
+        Function to store list of buffers in place starting at 'offset'
+    '''
+    def pwritev(self, offset, buffers):
+        for buf in buffers:
+            self.pwrite(offset, buf)
+            offset += len(buf)
+
+
+    '''
+        Functions to copy data between mapping and a host file, mapped pages are handed to the kernel directly
+    '''
+    def import_blocks(self, block_num, fd, fd_offset, n, offset=0):
+        start = self.data_block_offset + block_num*self.block_size + offset
+        copied = 0
+        with memoryview(self.mm) as mm_view:
+            while copied < n:
+                if self.has_preadv:
+                    count = os.preadv(fd, [mm_view[start+copied:start+n]], fd_offset + copied)
+                else:
+                    data = os.pread(fd, n - copied, fd_offset + copied)
+                    count = len(data)
+                    mm_view[start+copied:start+copied+count] = data
+                if count == 0:
+                    break
+                copied += count
+        return copied
+
+    def export_blocks(self, block_num, fd, fd_offset, n, offset=0):
+        start = self.data_block_offset + block_num*self.block_size + offset
+        copied = 0
+        with memoryview(self.mm) as mm_view:
+            while copied < n:
+                copied += os.pwrite(fd, mm_view[start+copied:start+n], fd_offset + copied)
+
+
+    '''
+        Function to copy 'n' bytes from data block 'src_block' to data block 'dst_block' inside the mapping
+    '''
+    def copy_blocks(self, src_block, dst_block, n):
+        self.mm.move(self.data_block_offset + dst_block*self.block_size,
+                     self.data_block_offset + src_block*self.block_size, n)
+
+
+    '''
+        Function to fetch zero-copy view of 'n' bytes starting at 'offset' (or of data block 'block_num'),
+        view must be released before drive is closed
+    '''
+    def view(self, offset, n):
+        return memoryview(self.mm)[offset:offset+n]
+
+    def view_block(self, block_num, n=None):
+        if n is None:
+            n = self.block_size
+        return self.view(self.data_block_offset + block_num*self.block_size, n)
+
+
+    '''
+        Function to read adjacent data blocks starting at 'block_num' into buffer 'buf',
+        bytes are copied straight from view of mapped drive
+    '''
+    def readinto_block(self, block_num, buf):
+        with self.view_block(block_num, len(buf)) as block_view:
+            buf[:] = block_view
+        return len(buf)
+
+
+    '''
+        Function to store byte stream in place at 'offset'
+    '''
+    def pwrite(self, offset, byte_stream):
+        self.mm[offset:offset+len(byte_stream)] = byte_stream
+
+
+    '''
+        Function to write dirty pages of mapping back to drive file
+    '''
+    def flush(self):
+        self.mm.flush()
+
+
+    '''
+        Function to flush and unmap the drive, then close the drive file
+    '''
+    def close(self):
+        if self.mm is not None:
+            self.mm.flush()
+            self.mm.close()
+            self.mm = None
+        BlockDevice.close(self)
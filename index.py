@@ -1,27 +1,64 @@
 '''
     Importing required modules
 '''
+from array import array
+import struct
+
 
 class Index:
     # static variable
     index_block_offset = 299532     # stores offset of an index block
+    index_size = 2048               # no of bytes per index table
+    total_pointers = 1024           # no of data block pointers per index table
+    pointer_format = 'H'            # struct format of a pointer on drive, 2 bytes till format version 2, 4 bytes after
+    drive = None                    # BlockDevice of mounted drive, opened by Superblock
 
     '''
         Constuctor
     '''
-    def __init__(self):
-        self.data_pointers = [0 for x in range(1024)]
+    def __init__(self, index_num=0):
+        self.index_num = index_num                                  # position of index table in index block
+        self.data_pointers = array('I', bytes(4*self.total_pointers))   # data block pointers, zero marks unused pointer
 
     '''
         This function fetched byte stream of index table
     '''
     def get_index_bytestream(self):
+        return struct.pack('>%d%s' % (self.total_pointers, self.pointer_format), *self.data_pointers)
+
+
+    '''
+        Function to set size of index tables and of pointers stored in them, called when drive geometry is known
+    '''
+    @staticmethod
+    def set_geometry(index_size, pointer_size):
+        Index.index_size = index_size
+        Index.pointer_format = 'H' if pointer_size == 2 else 'I'
+        Index.total_pointers = index_size // pointer_size
 
 
-        byte_stream = bytearray()
+    '''
+        Function to assign data blocks to index table, unused pointers are set to zero
+    '''
+    def set_data_pointers(self, data_blocks):
+        self.data_pointers = array('I', bytes(4*self.total_pointers))
+        self.data_pointers[:len(data_blocks)] = array('I', data_blocks)
+
 
-        for x in self.data_pointers:
-            byte_stream += x.to_bytes(2, byteorder='big')
+    '''
+        Functions to write/read index table to/from drive file
+    '''
+    def write_index_to_file(self):
+        try:
+            self.drive.pwrite(self.index_block_offset + self.index_num*self.index_size, self.get_index_bytestream())
+        except IOError:
+            print('Error in writing index table !')
 
-        return byte_stream
+    def read_index_from_file(self):
+        byte_stream = bytes(self.index_size)
+        try:
+            byte_stream = self.drive.pread(self.index_block_offset + self.index_num*self.index_size, self.index_size)
+        except IOError:
+            print('Error in reading index table !')
 
+        self.data_pointers = array('I', struct.unpack_from('>%d%s' % (self.total_pointers, self.pointer_format), byte_stream, 0))
@@ -1,15 +1,45 @@
 '''
 Importing important modules
 '''
+from array import array
 import datetime
+import struct
+
+from index import *
 
 class Inode:
 
+    # data members of every inode, no per instance __dict__ is kept
+    __slots__ = ('read_mode', 'write_mode', 'edit_flag', 'inode_number', 'parent_inode', 'file_type',
+                 'size_in_bytes', 'file_creation_time', 'last_access_time', 'last_modify_time',
+                 'blocks_allocated', 'direct_block_pointers', 'indirect_block_pointers', 'filename', 'dirty',
+                 'block_map')
+
     # Static variable, shared by all instances of class
     inode_block_offset = 35336              # starting position of inode block
     data_block_offset = 1348108             # starting position of data block
     inode_size = 256                        # stores inode size in bytes
+    block_size = 4096                       # no of bytes per data block
+    extra_space = 90                        # extra space of 90 bytes, reserved for future
+    empty_timestamp = (0, 0, 0, 0, 0, 0)    # timestamp of inode not yet stamped
+    empty_pointers = bytes(64)              # 16 zero block pointers, kept as 4 byte values in memory
+    max_name_size = 64                      # max no of bytes of filename, stored UTF-8 encoded
+    total_direct = 16                       # no of direct block pointers
+    total_indirect = 16                     # no of indirect pointers, each points to an index table
+    max_blocks = total_direct + total_indirect*Index.total_pointers    # max no of data blocks of a file
     drive_filename = "virtual_drive.csfs"   # file name of virtual drive
+    drive = None                            # BlockDevice of mounted drive, opened by Superblock
+    block_cache = None                      # BlockCache of data blocks, shared with Superblock
+    dirty_inodes = set()                    # inode numbers modified since last flush, written back by Superblock
+
+    '''
+        Layout of 256 byte inode record : read mode, write mode, edit flag, inode number, parent inode, file type,
+        size, 3 timestamps of 6 bytes, blocks allocated, 16 direct and 16 indirect pointers, filename, extra space;
+        format version 3 uses 8 byte size and 4 byte pointers
+    '''
+    record_v2 = struct.Struct('>BBBIIBI6B6B6BI16H16H64s90x')
+    record_v3 = struct.Struct('>BBBIIBQ6B6B6BI16I16I64s22x')
+    record = record_v2
 
     mon_map = {1:'Jan', 2:'Feb', 3:'Mar',
                4:'Apr', 5:'May', 6:'Jun',
@@ -28,31 +58,38 @@ class Inode:
         self.parent_inode = 0                                   # root is default parent
         self.file_type = 0                                      # initially file type is directory (0), can be set to normal file (1)
         self.size_in_bytes = 0                                  # stores file size in bytes, intially zero
-        self.file_creation_time = []                            # stores when file was created
-        self.last_access_time = []                              # stores timestamp when file was last accessed, initially
-        self.last_modify_time = []                              # stores when file was last modified
+        self.file_creation_time = self.empty_timestamp          # stores when file was created (tuple of 6 values)
+        self.last_access_time = self.empty_timestamp            # stores timestamp when file was last accessed, initially
+        self.last_modify_time = self.empty_timestamp            # stores when file was last modified
         self.blocks_allocated = 0                               # stores number of blocks allocated
-        self.direct_block_pointers = []                         # stores direct pointers of file blocks, total 16, each of size 4 bytes
-        self.indirect_block_pointers = []                       # stores indirect pointers of file blocks, total 16, each of size 4 bytes
-        self.filename = ""                                      # stores name of the file, max 64 characters
-        self.extra_space = 90                                   # extra space of 90 bytes, reserved for future
-        self.inode_create_init()
+        self.direct_block_pointers = array('I', self.empty_pointers)    # stores direct pointers of file blocks, total 16, 4 bytes each in memory (2 bytes on drive till format version 2)
+        self.indirect_block_pointers = array('I', self.empty_pointers)  # stores indirect pointers (index table numbers), total 16, 4 bytes each in memory (2 bytes on drive till format version 2)
+        self.filename = ""                                      # stores name of the file, max 64 bytes (UTF-8)
+        self.dirty = False                                      # set when in-memory inode differs from drive copy
+        self.block_map = None                                   # all data blocks of file in order, loaded from index tables on first use
 
 
     '''
-        This function handles some initial assignments when
-        inodes are created for first time
+        Function to set data block size and size of block pointers (2 bytes till format version 2, 4 bytes after),
+        called when drive geometry is known, Index.set_geometry() must be called before
     '''
-    def inode_create_init(self):
+    @staticmethod
+    def set_geometry(block_size, pointer_size):
+        Inode.block_size = block_size
+        Inode.record = Inode.record_v3 if pointer_size == 4 else Inode.record_v2
+        Inode.max_blocks = Inode.total_direct + Inode.total_indirect*Index.total_pointers
 
-        # assigning dummy timestamps
-        self.file_creation_time = [0 for x in range(6)]
-        self.last_access_time = [0 for x in range(6)]
-        self.last_modify_time = [0 for x in range(6)]
 
-        # assigning direct and indirect block pointers
-        self.direct_block_pointers = [0 for x in range(16)]
-        self.indirect_block_pointers = [0 for x in range(16)]
+    '''
+        Function to check whether 'name' fits in filename field of inode and of directory entry
+        (at most 64 bytes once UTF-8 encoded), longer names would be cut in middle of a character
+    '''
+    @staticmethod
+    def name_fits(name):
+        try:
+            return len(name.encode('utf-8')) <= Inode.max_name_size
+        except UnicodeEncodeError:
+            return False
 
 
     '''
@@ -60,44 +97,32 @@ class Inode:
     '''
     def get_inode_bytestream(self):
 
-        byte_stream = bytearray()
-
-        # bytes for private data members of object Inode
-        byte_stream += self.read_mode.to_bytes(1, byteorder='big')
-        byte_stream += self.write_mode.to_bytes(1, byteorder='big')
-        byte_stream += self.edit_flag.to_bytes(1, byteorder='big')
-        byte_stream += self.inode_number.to_bytes(4, byteorder='big')
-        byte_stream += self.parent_inode.to_bytes(4, byteorder='big')
-        byte_stream += self.file_type.to_bytes(1, byteorder='big')
-        byte_stream += self.size_in_bytes.to_bytes(4, byteorder='big')
-
-        # bytes for file related timestamps
-        for x in self.file_creation_time:
-            byte_stream += x.to_bytes(1, byteorder='big')
-
-        for x in self.last_access_time:
-            byte_stream += x.to_bytes(1, byteorder='big')
-
-        for x in self.last_modify_time:
-            byte_stream += x.to_bytes(1, byteorder='big')
-
-        byte_stream += self.blocks_allocated.to_bytes(4, byteorder='big')
-
-        # bytes for direct and indirect block pointers
-        for x in self.direct_block_pointers:
-            byte_stream += x.to_bytes(2, byteorder='big')
+        byte_stream = bytearray(self.inode_size)
+        self.pack_into(byte_stream, 0)
+        return byte_stream
 
-        for x in self.indirect_block_pointers:
-            byte_stream += x.to_bytes(2, byteorder='big')
 
-        fname = self.filename.rjust(64 , '\0')
-        ch_code = [ord(x) for x in fname]
-        for x in ch_code:
-            byte_stream.append(x)
+    '''
+        Function to encode inode into 'buffer' at 'offset', filename is right justified with NUL characters
+    '''
+    def pack_into(self, buffer, offset):
+        self.record.pack_into(buffer, offset,
+                              self.read_mode, self.write_mode, self.edit_flag,
+                              self.inode_number, self.parent_inode, self.file_type, self.size_in_bytes,
+                              *self.file_creation_time, *self.last_access_time, *self.last_modify_time,
+                              self.blocks_allocated,
+                              *self.direct_block_pointers, *self.indirect_block_pointers,
+                              self.filename.encode('utf-8').rjust(64, b'\0'))
 
-        # bytes for extra space
-        byte_stream += bytearray(90)
 
+    '''
+        Function to encode list of inodes into one byte stream, inodes are placed one after other
+    '''
+    @staticmethod
+    def encode_inodes(inodes):
+        byte_stream = bytearray(len(inodes)*Inode.inode_size)
+        for i, node in enumerate(inodes):
+            node.pack_into(byte_stream, i*Inode.inode_size)
         return byte_stream
 
 
@@ -117,36 +142,167 @@ class Inode:
         byte_stream = self.get_inode_bytestream()
 
         try:
-            with open(self.drive_filename, 'rb+') as fp:
-                fp.seek(self.inode_block_offset+self.inode_number*self.inode_size)
-                fp.write(byte_stream)
+            self.drive.write_inode(self.inode_number, byte_stream)
+            self.dirty = False
+            self.dirty_inodes.discard(self.inode_number)
         except IOError:
             print("Error writing file to drive !")
 
 
-    def write_stream_to_blocks(self, byte_stream):
-        n = self.blocks_allocated
-        offset = 0
+    '''
+        Function to mark inode as modified, dirty inodes are written back in one pass by Superblock.flush_inodes()
+    '''
+    def mark_dirty(self):
+        self.dirty = True
+        self.dirty_inodes.add(self.inode_number)
 
+
+    '''
+        Function to write file data to allocated data blocks, one write per extent of adjacent blocks
+    '''
+    def write_stream_to_blocks(self, byte_stream):
         try:
-            with open(self.drive_filename, 'rb+') as fp:
-                # writing first n-1 blocks
-                for i in range(n-1):
-                    fp.seek(self.data_block_offset+self.direct_block_pointers[i]*4096)
-                    fp.write(byte_stream[offset:offset+4096])
-                    offset += 4096
-
-                # writing last block
-                fp.seek(self.data_block_offset+self.direct_block_pointers[n-1]*4096)
-                fp.write(byte_stream[offset:self.size_in_bytes])
+            self.write_data(0, byte_stream)
         except IOError:
             print('Error in writing data blocks !')
             return
 
 
+    '''
+        Function to write byte stream at byte 'offset' of file, only data blocks covering the written
+        range are touched (blocks must already be allocated), one write per extent of adjacent blocks
+    '''
+    def write_data(self, offset, byte_stream):
+        view = memoryview(byte_stream)
+        first = offset // self.block_size
+        block_pos = offset - first*self.block_size     # position of write inside first block
+        pos = 0
+
+        for start, count in self.get_data_extents(first, (offset + len(view) + self.block_size - 1) // self.block_size):
+            length = min(count*self.block_size - block_pos, len(view) - pos)
+            self.drive.write_block(start, view[pos:pos+length], block_pos)
+
+            # blocks written from their beginning are kept in block cache, partially written blocks are dropped
+            for i in range(count):
+                block_start = i*self.block_size - block_pos
+                if block_start < 0:
+                    self.block_cache.invalidate(start+i)
+                else:
+                    self.block_cache.put(start+i, view[pos+block_start:pos+min(block_start+self.block_size, length)])
+            pos += length
+            block_pos = 0
+
+
+    '''
+        Function to copy 'length' bytes of host file 'fd' at 'fd_offset' to byte 'offset' of file inside the kernel,
+        one copy per extent of adjacent blocks (blocks must already be allocated), cached copies of written blocks
+        are dropped, returns no of bytes copied
+    '''
+    def import_data(self, fd, fd_offset, offset, length):
+        first = offset // self.block_size
+        block_pos = offset - first*self.block_size     # position of copy inside first block
+        pos = 0
+
+        for start, count in self.get_data_extents(first, (offset + length + self.block_size - 1) // self.block_size):
+            extent_len = min(count*self.block_size - block_pos, length - pos)
+            self.block_cache.invalidate_blocks(range(start, start+count))
+            copied = self.drive.import_blocks(start, fd, fd_offset + pos, extent_len, block_pos)
+            pos += copied
+            if copied < extent_len:
+                break
+            block_pos = 0
+        return pos
+
+
+    '''
+        Function to copy 'length' bytes starting at byte 'offset' of file to host file 'fd' at 'fd_offset'
+        inside the kernel, one copy per extent of adjacent blocks
+    '''
+    def export_data(self, fd, fd_offset, offset, length):
+        end = min(offset + length, self.size_in_bytes)
+        if offset >= end:
+            return
+
+        first = offset // self.block_size
+        block_pos = offset - first*self.block_size
+        pos = 0
+        for start, count in self.get_data_extents(first, (end + self.block_size - 1) // self.block_size):
+            extent_len = min(count*self.block_size - block_pos, end - offset - pos)
+            self.drive.export_blocks(start, fd, fd_offset + pos, extent_len, block_pos)
+            pos += extent_len
+            block_pos = 0
+
+
+    '''
+        Function to copy data of inode 'source' to this inode inside the drive file, blocks must already be allocated
+    '''
+    def copy_data_from(self, source):
+        for src_block, dst_block, n in self.get_copy_runs(source):
+            self.drive.copy_blocks(src_block, dst_block, n)
+
+
+    '''
+        Function to get copies needed to copy data of inode 'source' to this inode, as list of
+        (source block, destination block, no of bytes); source and destination extents are walked together
+        so every copy covers adjacent blocks on both sides, cached copies of destination blocks are dropped
+    '''
+    def get_copy_runs(self, source):
+        src_blocks = source.get_data_blocks()
+        dst_blocks = self.get_data_blocks()
+        remaining = source.size_in_bytes
+        runs = []
+        i = 0
+        while remaining > 0:
+            # length of run adjacent in both source and destination
+            run = 1
+            while (run*self.block_size < remaining and src_blocks[i+run] == src_blocks[i] + run
+                   and dst_blocks[i+run] == dst_blocks[i] + run):
+                run += 1
+            n = min(run*self.block_size, remaining)
+            self.block_cache.invalidate_blocks(range(dst_blocks[i], dst_blocks[i]+run))
+            runs.append((src_blocks[i], dst_blocks[i], n))
+            remaining -= n
+            i += run
+        return runs
+
+
+    '''
+        Function to assign data blocks to inode, first blocks go to direct pointers and the rest to
+        index tables 'index_nums' (one per Index.total_pointers blocks), index tables are written to drive
+    '''
+    def set_block_pointers(self, data_blocks, index_nums):
+        self.direct_block_pointers = array('I', self.empty_pointers)
+        self.indirect_block_pointers = array('I', self.empty_pointers)
+        self.blocks_allocated = 0
+        self.block_map = array('I')
+        self.append_block_pointers(data_blocks, index_nums)
+
 
+    '''
+        Function to add data blocks after blocks already allocated to inode, 'index_nums' are the index tables
+        needed beyond tables already in use; only index tables receiving new pointers are written to drive
+    '''
+    def append_block_pointers(self, data_blocks, index_nums):
+        block_map = self.get_data_blocks()
+        first = len(block_map)
+        first_index = self.get_index_count(first)
+        block_map.extend(data_blocks)
 
+        # new index tables follow the tables already in use
+        for i, index_num in enumerate(index_nums):
+            self.indirect_block_pointers[first_index + i] = index_num
 
+        for i in range(first, min(len(block_map), self.total_direct)):
+            self.direct_block_pointers[i] = block_map[i]
+
+        # writing index tables that received new blocks, last table in use might have been partially filled
+        for i in range(max(0, first - self.total_direct) // Index.total_pointers, self.get_index_count(len(block_map))):
+            offset = self.total_direct + i*Index.total_pointers
+            table = Index(self.indirect_block_pointers[i])
+            table.set_data_pointers(block_map[offset:offset+Index.total_pointers])
+            table.write_index_to_file()
+
+        self.blocks_allocated = len(block_map)
 
 
     '''
@@ -160,59 +316,51 @@ class Inode:
         byte_stream = bytearray()
 
         try:
-            with open(self.drive_filename, 'rb') as fp:
-                fp.seek(self.inode_block_offset+self.inode_number*self.inode_size)
-                byte_stream = bytearray(fp.read(self.inode_size))
+            byte_stream = bytearray(self.drive.read_inode(self.inode_number))
         except IOError:
             print("Error in reading Inode data !")
 
-        # processing byte_stream
-        offset = 0
-        self.read_mode = int.from_bytes(byte_stream[offset:offset+1], byteorder='big', signed=False)
-        offset += 1
-        self.write_mode = int.from_bytes(byte_stream[offset:offset+1], byteorder='big', signed=False)
-        offset += 1
-        self.edit_flag = int.from_bytes(byte_stream[offset:offset+1], byteorder='big', signed=False)
-        offset += 1
-        self.inode_number = int.from_bytes(byte_stream[offset:offset+4], byteorder='big', signed=False)
-        offset += 4
-        self.parent_inode = int.from_bytes(byte_stream[offset:offset+4], byteorder='big', signed=False)
-        offset += 4
-        self.file_type = int.from_bytes(byte_stream[offset:offset+1], byteorder='big', signed=False)
-        offset += 1
-        self.size_in_bytes = int.from_bytes(byte_stream[offset:offset+4], byteorder='big', signed=False)
-        offset += 4
+        self.read_inode_from_bytes(byte_stream)
 
-        # reading timestamps
-        for i in range(6):
-            self.file_creation_time[i] = int.from_bytes(byte_stream[offset:offset+1], byteorder='big', signed=False)
-            offset += 1
 
-        for i in range(6):
-            self.last_access_time[i] = int.from_bytes(byte_stream[offset:offset + 1], byteorder='big', signed=False)
-            offset += 1
+    '''
+        Function to fill inode from its 256 byte record at 'offset' of byte stream,
+        used when inode block is already in memory
+    '''
+    def read_inode_from_bytes(self, byte_stream, offset=0):
 
-        for i in range(6):
-            self.last_modify_time[i] = int.from_bytes(byte_stream[offset:offset + 1], byteorder='big', signed=False)
-            offset += 1
+        fields = self.record.unpack_from(byte_stream, offset)
+        (self.read_mode, self.write_mode, self.edit_flag,
+         self.inode_number, self.parent_inode, self.file_type, self.size_in_bytes) = fields[0:7]
 
-        self.blocks_allocated = int.from_bytes(byte_stream[offset:offset+4], byteorder='big', signed=False)
-        offset += 4
+        # reading timestamps
+        self.file_creation_time = fields[7:13]
+        self.last_access_time = fields[13:19]
+        self.last_modify_time = fields[19:25]
+        self.blocks_allocated = fields[25]
 
         # reading direct and indirect block pointers
-        for i in range(16):
-            self.direct_block_pointers[i] = int.from_bytes(byte_stream[offset:offset + 2], byteorder='big', signed=False)
-            offset += 2
-
-        for i in range(16):
-            self.indirect_block_pointers[i] = int.from_bytes(byte_stream[offset:offset + 2], byteorder='big', signed=False)
-            offset += 2
+        self.direct_block_pointers = array('I', fields[26:42])
+        self.indirect_block_pointers = array('I', fields[42:58])
+        self.block_map = None
 
         # reading filename
-        self.filename = byte_stream[offset:offset+64].decode('utf-8')
-        self.filename = self.filename.strip('\0')
+        self.filename = fields[58].decode('utf-8').strip('\0')
 
 
+    '''
+        Function to decode inodes 'inode_nums' from in-memory inode block, returns list of inode objects
+    '''
+    @staticmethod
+    def decode_inodes(inode_block, inode_nums):
+        view = memoryview(inode_block)
+        inodes = []
+        for num in inode_nums:
+            node = Inode(num)
+            node.read_inode_from_bytes(view, num*Inode.inode_size)
+            inodes.append(node)
+        return inodes
+
 
 
     '''
@@ -227,20 +375,107 @@ class Inode:
         if self.blocks_allocated == 0:
             return bytearray()
 
-        n = self.blocks_allocated
-        byte_stream = bytearray()
+        return self.read_data(0, self.size_in_bytes)
+
+
+    '''
+        Function to read 'length' bytes starting at byte 'offset' of file, only data blocks covering
+        the requested range are read, buffer is allocated once and every extent is read directly into it
+    '''
+    def read_data(self, offset, length):
+        end = min(offset + length, self.size_in_bytes)
+        if offset >= end:
+            return bytearray()
+
+        first = offset // self.block_size
+        byte_stream = bytearray(end - first*self.block_size)
+        view = memoryview(byte_stream)
+        pos = 0
 
-        # reading first n-1 blocks
-        with open(self.drive_filename, 'rb') as fp:
-            for i in range(n-1):
-                fp.seek(self.data_block_offset+self.direct_block_pointers[i]*4096)
-                byte_stream += fp.read(4096)
-            fp.seek(self.data_block_offset+self.direct_block_pointers[n-1]*4096)
-            byte_stream += fp.read(self.size_in_bytes - (n-1)*4096)
+        # reading one extent of adjacent blocks at a time, last block may be partially filled
+        for start, count in self.get_data_extents(first, (end + self.block_size - 1) // self.block_size):
+            extent_len = min(count*self.block_size, len(byte_stream) - pos)
+            self.read_extent_cached(start, count, view[pos:pos+extent_len])
+            pos += extent_len
 
+        view.release()
+
+        # dropping part of first block before 'offset'
+        del byte_stream[:offset - first*self.block_size]
         return byte_stream
 
 
+    '''
+        Function to read 'count' adjacent data blocks starting at block 'start' into buffer 'buf',
+        extent is served by block cache if all of its blocks are cached, otherwise it is read with a single call
+    '''
+    def read_extent_cached(self, start, count, buf):
+        length = len(buf)
+        chunks = []
+        for i in range(count):
+            data = self.block_cache.get(start+i, min(self.block_size, length - i*self.block_size))
+            if data is None:
+                break
+            chunks.append(data)
+        else:
+            for i in range(count):
+                buf[i*self.block_size:i*self.block_size+len(chunks[i])] = chunks[i]
+            return
+
+        self.drive.readinto_block(start, buf)
+        for i in range(count):
+            self.block_cache.put(start+i, buf[i*self.block_size:min((i+1)*self.block_size, length)])
+
+
+    '''
+        Function to get data blocks of file in order, blocks beyond direct pointers are read from index tables
+    '''
+    def get_data_blocks(self):
+        if self.block_map is not None and len(self.block_map) == self.blocks_allocated:
+            return self.block_map
+
+        self.block_map = array('I', self.direct_block_pointers[:min(self.blocks_allocated, self.total_direct)])
+        remaining = self.blocks_allocated - len(self.block_map)
+        for index_num in self.indirect_block_pointers:
+            if remaining <= 0:
+                break
+            table = Index(index_num)
+            table.read_index_from_file()
+            self.block_map.extend(table.data_pointers[:min(remaining, Index.total_pointers)])
+            remaining -= Index.total_pointers
+
+        return self.block_map
+
+
+    '''
+        Function to get index tables used by inode
+    '''
+    def get_index_tables(self):
+        return list(self.indirect_block_pointers[:self.get_index_count(self.blocks_allocated)])
+
+
+    '''
+        Function to get no of index tables needed to address 'blocks' data blocks
+    '''
+    @staticmethod
+    def get_index_count(blocks):
+        return (max(0, blocks - Inode.total_direct) + Index.total_pointers - 1) // Index.total_pointers
+
+
+    '''
+        Function to get data blocks 'first' to 'last' (excluded) of file as extents,
+        list of (first block, no of adjacent blocks)
+    '''
+    def get_data_extents(self, first=0, last=None):
+        extents = []
+        for x in self.get_data_blocks()[first:last]:
+            if len(extents) > 0 and extents[-1][0] + extents[-1][1] == x:
+                extents[-1][1] += 1
+            else:
+                extents.append([x, 1])
+        return extents
+
+
     '''
     ################################################
         INTERNAL INODE MODIFICATION SECTION
@@ -249,23 +484,29 @@ class Inode:
 
     def set_root(self):
 
-        time_now = datetime.datetime.now()
-        self.file_creation_time = [time_now.year % 2000, time_now.month, time_now.day, time_now.hour, time_now.minute, time_now.second]
-        self.last_modify_time = [time_now.year % 2000, time_now.month, time_now.day, time_now.hour, time_now.minute,time_now.second]
-        self.last_access_time = [time_now.year % 2000, time_now.month, time_now.day, time_now.hour, time_now.minute,time_now.second]
+        time_now = self.get_timestamp()
+        self.file_creation_time = time_now
+        self.last_modify_time = time_now
+        self.last_access_time = time_now
 
 
     def set_last_access_time(self):
-        time_now = datetime.datetime.now()
-        self.last_access_time = [time_now.year % 2000, time_now.month, time_now.day, time_now.hour, time_now.minute,time_now.second]
+        self.last_access_time = self.get_timestamp()
 
     def set_file_creation_time(self):
-        time_now = datetime.datetime.now()
-        self.file_creation_time = [time_now.year % 2000, time_now.month, time_now.day, time_now.hour, time_now.minute,time_now.second]
+        self.file_creation_time = self.get_timestamp()
 
     def set_last_modify_time(self):
+        self.last_modify_time = self.get_timestamp()
+
+
+    '''
+        Function to fetch current time as timestamp stored in inode
+    '''
+    @staticmethod
+    def get_timestamp():
         time_now = datetime.datetime.now()
-        self.last_modify_time = [time_now.year % 2000, time_now.month, time_now.day, time_now.hour, time_now.minute, time_now.second]
+        return (time_now.year % 2000, time_now.month, time_now.day, time_now.hour, time_now.minute, time_now.second)
 
 
     '''
@@ -0,0 +1,115 @@
+'''
+    Importing required modules
+'''
+from collections import OrderedDict
+import threading
+
+from inode import *
+
+
+class InodeTable:
+
+    '''
+        Constructor :
+            is_active tells whether an inode number is in use and active_numbers lists inode numbers in use
+            (both taken from inode list of superblock), inodes in use are read from drive when first accessed;
+            max_resident bounds no of inodes kept in memory (0 keeps every loaded inode), only clean inodes
+            are evicted, by trim(); table can be used by several threads
+    '''
+    def __init__(self, is_active, active_numbers, max_resident=0):
+        self.mutex = threading.Lock()
+        self.is_active = is_active          # function : inode number -> True if inode is in use
+        self.active_numbers = active_numbers    # function : list of inode numbers in use
+        self.max_resident = max_resident    # max no of inodes kept in memory after trim, 0 for no limit
+        self.inodes = OrderedDict()         # inode number -> inode object, least recently used first
+        self.loads = 0                      # no of inodes read from drive on access
+        self.evictions = 0                  # no of clean inodes dropped by trim
+
+
+    '''
+        Function to fetch inode 'inode_num', read from drive if it is in use but not in memory,
+        raises KeyError if inode is not in use (same as dictionary)
+    '''
+    def __getitem__(self, inode_num):
+        with self.mutex:
+            node = self.inodes.get(inode_num)
+            if node is not None:
+                self.inodes.move_to_end(inode_num)
+                return node
+
+            if not self.is_active(inode_num):
+                raise KeyError(inode_num)
+
+            node = Inode(inode_num)
+            node.read_inode_from_file()
+            self.inodes[inode_num] = node
+            self.loads += 1
+            return node
+
+    def get(self, inode_num, default=None):
+        try:
+            return self[inode_num]
+        except KeyError:
+            return default
+
+
+    '''
+        Functions to add/remove inodes, used when inode is fetched from or released to inode list
+    '''
+    def __setitem__(self, inode_num, node):
+        with self.mutex:
+            self.inodes[inode_num] = node
+            self.inodes.move_to_end(inode_num)
+
+    def pop(self, inode_num, default=None):
+        with self.mutex:
+            return self.inodes.pop(inode_num, default)
+
+
+    '''
+        Functions to check membership and iterate over inodes in use, iterating values or items
+        reads every inode in use from drive
+    '''
+    def __contains__(self, inode_num):
+        return inode_num in self.inodes or self.is_active(inode_num)
+
+    def keys(self):
+        return self.active_numbers()
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def values(self):
+        return [self[x] for x in self.keys()]
+
+    def items(self):
+        return [(x, self[x]) for x in self.keys()]
+
+
+    '''
+        Function to evict least recently used clean inodes till at most 'max_resident' are in memory,
+        called between commands (no command is running), when no inode object is held by a caller
+    '''
+    def trim(self):
+        if self.max_resident <= 0 or len(self.inodes) <= self.max_resident:
+            return
+
+        with self.mutex:
+            for inode_num in [x for x in self.inodes if x not in Inode.dirty_inodes]:
+                if len(self.inodes) <= self.max_resident:
+                    break
+                del self.inodes[inode_num]
+                self.evictions += 1
+
+
+    '''
+        Function to fetch table counters
+    '''
+    def get_stats(self):
+        return {'resident': len(self.inodes),
+                'loads': self.loads,
+                'evictions': self.evictions,
+                'max_resident': self.max_resident}
@@ -0,0 +1,126 @@
+'''
+    Importing required modules
+'''
+from collections import OrderedDict
+import threading
+
+
+class PathCache:
+
+    '''
+        Constructor :
+            max_entries bounds each of the two caches, least recently used entries are evicted beyond it;
+            cache can be used by several threads, results of a walk that raced with a change of names are not stored
+    '''
+    def __init__(self, max_entries):
+        self.mutex = threading.Lock()
+        self.max_entries = max_entries      # max no of entries per cache
+        self.paths = OrderedDict()          # absolute path -> (inode number or -1, generation), least recently used first
+        self.names = OrderedDict()          # inode number -> absolute path, least recently used first
+        self.generation = 0                 # incremented whenever a name is added, older negative entries are stale
+        self.removals = 0                   # incremented whenever entries are invalidated (name removed or renamed)
+        self.hits = 0                       # no of lookups served by cache
+        self.misses = 0                     # no of lookups that had to walk directories
+
+
+    '''
+        Function to fetch inode number of absolute path 'path', -1 if path is known not to exist,
+        returns None if path is not cached
+    '''
+    def lookup(self, path):
+        with self.mutex:
+            entry = self.paths.get(path)
+            if entry is None or (entry[0] < 0 and entry[1] != self.generation):
+                self.misses += 1
+                return None
+
+            self.paths.move_to_end(path)
+            self.hits += 1
+            return entry[0]
+
+
+    '''
+        Function to fetch version of cache, taken before walking directories and passed to store()
+    '''
+    def get_version(self):
+        return (self.generation, self.removals)
+
+
+    '''
+        Function to store result of resolving 'path', inode_num is -1 for path that does not exist;
+        result is dropped if a name was added (negative result) or removed (positive result) since 'version'
+    '''
+    def store(self, path, inode_num, version=None):
+        with self.mutex:
+            if version is not None:
+                if (inode_num < 0 and version[0] != self.generation) or (inode_num >= 0 and version[1] != self.removals):
+                    return
+            self.paths[path] = (inode_num, self.generation)
+            self.paths.move_to_end(path)
+            if len(self.paths) > self.max_entries:
+                self.paths.popitem(last=False)
+
+
+    '''
+        Functions to fetch/store absolute path of inode 'inode_num', fetch returns None if path is not cached,
+        path is not stored if names were removed or renamed since 'version'
+    '''
+    def get_path(self, inode_num):
+        with self.mutex:
+            path = self.names.get(inode_num)
+            if path is not None:
+                self.names.move_to_end(inode_num)
+            return path
+
+    def store_path(self, inode_num, path, version=None):
+        with self.mutex:
+            if version is not None and version[1] != self.removals:
+                return
+            self.names[inode_num] = path
+            self.names.move_to_end(inode_num)
+            if len(self.names) > self.max_entries:
+                self.names.popitem(last=False)
+
+
+    '''
+        Function to be called when a name is added to a directory, all negative entries become stale
+    '''
+    def name_added(self):
+        with self.mutex:
+            self.generation += 1
+
+
+    '''
+        Function to drop entries of 'path' and of every path below it, from both caches
+    '''
+    def invalidate_subtree(self, path):
+        prefix = path.rstrip('/') + '/'
+        with self.mutex:
+            self.removals += 1
+            for key in [x for x in self.paths if x == path or x.startswith(prefix)]:
+                del self.paths[key]
+            for key in [x for x, y in self.names.items() if y == path or y.startswith(prefix)]:
+                del self.names[key]
+
+
+    '''
+        Function to drop entries of 'path' only, used when a file (not a directory) is removed or renamed
+    '''
+    def invalidate(self, path, inode_num):
+        with self.mutex:
+            self.removals += 1
+            self.paths.pop(path, None)
+            self.names.pop(inode_num, None)
+
+
+    '''
+        Function to fetch cache counters
+    '''
+    def get_stats(self):
+        total = self.hits + self.misses
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': (self.hits / total) if total > 0 else 0.0,
+                'cached_paths': len(self.paths),
+                'cached_names': len(self.names),
+                'max_entries': self.max_entries}
@@ -0,0 +1,107 @@
+'''
+    Importing required modules
+'''
+import threading
+import weakref
+
+
+class RWLock:
+
+    '''
+        Constructor :
+            lock is held either by any no of readers or by one writer, readers do not wait for each other;
+            a waiting writer stops new readers from entering so that writers are not starved
+    '''
+    def __init__(self):
+        self.cond = threading.Condition(threading.Lock())
+        self.readers = 0                # no of threads holding lock for read
+        self.writer = False             # True while a thread holds lock for write
+        self.writers_waiting = 0        # no of threads waiting to write
+
+
+    '''
+        Functions to acquire/release lock for read (shared)
+    '''
+    def acquire_read(self):
+        with self.cond:
+            while self.writer or self.writers_waiting > 0:
+                self.cond.wait()
+            self.readers += 1
+
+    def release_read(self):
+        with self.cond:
+            self.readers -= 1
+            if self.readers == 0:
+                self.cond.notify_all()
+
+
+    '''
+        Functions to acquire/release lock for write (exclusive)
+    '''
+    def acquire_write(self):
+        with self.cond:
+            self.writers_waiting += 1
+            while self.writer or self.readers > 0:
+                self.cond.wait()
+            self.writers_waiting -= 1
+            self.writer = True
+
+    def release_write(self):
+        with self.cond:
+            self.writer = False
+            self.cond.notify_all()
+
+
+
+class LockTable:
+
+    '''
+        Constructor :
+            one RWLock per key (inode number), created on first use; a lock is dropped once no thread
+            holds or waits for it, so table only keeps locks in use
+    '''
+    def __init__(self):
+        self.mutex = threading.Lock()
+        self.locks = weakref.WeakValueDictionary()      # key -> RWLock
+
+
+    '''
+        Function to fetch lock of 'key'
+    '''
+    def get(self, key):
+        with self.mutex:
+            lock = self.locks.get(key)
+            if lock is None:
+                lock = RWLock()
+                self.locks[key] = lock
+            return lock
+
+
+    '''
+        Function to acquire locks of 'read_keys' for read and of 'write_keys' for write, in ascending order of keys
+        (a key present in both is locked for write), returns list of (key, lock, is_write) in order of acquisition;
+        threads taking all their locks through one call in this order can not deadlock
+    '''
+    def acquire(self, read_keys=(), write_keys=()):
+        write_keys = set(write_keys)
+        held = []
+        for key in sorted(set(read_keys) | write_keys):
+            lock = self.get(key)
+            if key in write_keys:
+                lock.acquire_write()
+            else:
+                lock.acquire_read()
+            held.append((key, lock, key in write_keys))
+        return held
+
+
+    '''
+        Function to release locks returned by acquire(), in reverse order
+    '''
+    @staticmethod
+    def release(held):
+        for key, lock, is_write in reversed(held):
+            if is_write:
+                lock.release_write()
+            else:
+                lock.release_read()
@@ -0,0 +1,97 @@
+'''
+    Importing required modules
+'''
+from array import array
+import struct
+
+
+class ShareTable:
+
+    # static variables, shared by all instances of class
+    entry_size = 2                  # no of bytes per share count on drive
+    word_entries = 64               # table is persisted in words of 64 entries (128 bytes)
+    max_count = 0xffff              # max no of extra files sharing one block
+
+    '''
+        Constructor :
+            one share count per data block, count is no of files referencing the block besides its first owner,
+            zero means block is private to one file
+    '''
+    def __init__(self, total_blocks):
+        self.total_blocks = total_blocks                    # no of blocks tracked by table
+        self.counts = array('H', bytes(2*total_blocks))     # share count of every data block
+        self.shared_count = 0                               # no of blocks having non zero count
+        self.dirty_words = set()                            # word indexes changed since last flush
+
+
+    '''
+        Function to get no of bytes taken by table on drive
+    '''
+    @staticmethod
+    def get_table_size(total_blocks):
+        return total_blocks * ShareTable.entry_size
+
+
+    '''
+        Function to load table from byte stream read from drive
+    '''
+    def load(self, byte_stream):
+        self.counts = array('H', struct.unpack_from('>%dH' % self.total_blocks, byte_stream, 0))
+        self.shared_count = self.total_blocks - self.counts.count(0)
+        self.dirty_words = set()
+
+
+    '''
+        Function to add one reference to every block of 'blocks', returns False (nothing changed)
+        if any of the blocks already has max no of references
+    '''
+    def add_refs(self, blocks):
+        if any(self.counts[x] >= self.max_count for x in blocks):
+            return False
+
+        for block_num in blocks:
+            if self.counts[block_num] == 0:
+                self.shared_count += 1
+            self.counts[block_num] += 1
+            self.dirty_words.add(block_num // self.word_entries)
+        return True
+
+
+    '''
+        Function to drop one reference of every block of 'blocks',
+        returns blocks that had no other reference (these are to be freed by caller)
+    '''
+    def drop_refs(self, blocks):
+        unreferenced = []
+        for block_num in blocks:
+            if self.counts[block_num] == 0:
+                unreferenced.append(block_num)
+                continue
+
+            self.counts[block_num] -= 1
+            if self.counts[block_num] == 0:
+                self.shared_count -= 1
+            self.dirty_words.add(block_num // self.word_entries)
+        return unreferenced
+
+
+    '''
+        Function to fetch changed parts of table as list of (byte offset, bytes),
+        adjacent dirty words are coalesced into one entry
+    '''
+    def get_dirty_runs(self):
+        runs = []
+        words = sorted(self.dirty_words)
+        i = 0
+        while i < len(words):
+            j = i + 1
+            while j < len(words) and words[j] == words[j-1] + 1:
+                j += 1
+            first = words[i]*self.word_entries
+            last = min(words[j-1]*self.word_entries + self.word_entries, self.total_blocks)
+            runs.append((first*self.entry_size, struct.pack('>%dH' % (last - first), *self.counts[first:last])))
+            i = j
+        return runs
+
+    def clear_dirty(self):
+        self.dirty_words = set()
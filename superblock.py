@@ -1,13 +1,28 @@
 '''
 Importing important modules
 '''
+import bisect
 import datetime
+import heapq
+import itertools
 from pathlib import Path
 import os
+import struct
+import threading
+import time
 
 
 from inode import *
+from inode_table import *
 from index import *
+from block_device import *
+from block_cache import *
+from block_bitmap import *
+from share_table import *
+from path_cache import *
+from rw_lock import *
+from thread_state import *
+from alloc_groups import *
 
 
 class Superblock :
@@ -15,6 +30,24 @@ class Superblock :
     #__defining data members of class, static variables, shared by all
 
     drive_filename = "virtual_drive.csfs"   # contains name of the file in which filesystem is stored
+    drive = None                            # BlockDevice kept open while drive is in use, closed at exit
+    drive_size = 69505548                   # total size of drive file in bytes
+    block_cache = None                      # BlockCache of data blocks, created when drive is opened
+    block_cache_size = 8*1024*1024          # byte budget of data block cache
+    stream_chunk_size = 1024*1024           # no of bytes moved at once by put/get, multiple of every block size
+    copy_workers = 4                        # no of threads copying file data in recursive copy
+    lazy_inodes = True                      # inodes are read from drive when first accessed instead of at mount
+    max_resident_inodes = 0                 # no of inodes kept in memory between commands, 0 for no limit
+
+    # write-back state, modified metadata is written to drive by sync()
+    sblock_dirty = False    # superblock counters changed since last flush
+    dblist_dirty = False    # data block list changed since last flush
+    ilist_dirty = False     # inode list header changed since last flush (head of free list)
+    ilist_dirty_slots = set()   # inode list entries changed since last flush
+    idxlist_dirty = False   # index list header changed since last flush (head of free list)
+    idxlist_dirty_slots = set() # index list entries changed since last flush
+    flush_interval = 0      # min seconds between flushes at command end, 0 flushes after every command
+    last_flush_time = 0     # time of last flush
 
     file_sys_type = "CS"    # to check if filesystem is of proper format
     superblock_size = 512   # size of superblock data, hardcoded 512 as standard
@@ -33,15 +66,25 @@ class Superblock :
     username_list = []      # list of usernames[max 16 char long] ("admin" is permanant username for root/admin)
     passwd_list = []        # list of passwords[max 16 char long] ("admin" is temparary password for all)
 
-    extra_space = 220       # extra space kept for future development
+    format_version = 2      # on-disk format, 1 (stored as 0) = linked free block list, 2 = free block bitmap,
+                            # 3 = configurable geometry with 4 byte pointers, counters and list entries
+    extra_space = 218       # extra space kept for future development (format version 3 uses first 36 bytes)
+    ext_fields_offset = 294 # offset of 4 byte geometry fields and counters of format version 3, follows format version
+    list_field_size = 2     # no of bytes of list headers (size, head) and inode list entries, 4 from format version 3
+    chunk_inodes = 4096     # no of empty inodes written at once when inode block is formatted
+
+    # optional features of format version 3, stored after counters
+    feature_flags = 0           # bit set means feature is enabled on drive
+    feature_shared_blocks = 1   # data blocks may be shared by cloned files
+    feature_dir_blocks = 2      # directory entries are stored in data blocks of directory, loaded on first access
+    share_table = None          # ShareTable of data blocks, present only if blocks can be shared
+    share_table_block = 0       # first data block of share table, table takes a contiguous run of blocks
 
 
     #data elements for data block list segment
     data_block_size = 32772     # stores total size of the data block
     block_list_size = 16384     # contains size of total block list
-    block_list_head = 1         # pointer of free data-block list head,initially points to 1 (not 0 as,
-    # zero indicates absense of data block pointer in inode "data block pointer" list
-    block_list = []             # contains array representation of singly linked data block list
+    block_bitmap = None         # BlockBitmap of data blocks, stored after 4 byte header of data block list segment
 
 
     #data elements for inode list segment
@@ -49,6 +92,8 @@ class Superblock :
     inode_list_size = 1024      # contains total length of inode free list
     inode_list_head = 0         # pointer of free inode list head,initially points to 0
     inode_list = []             # contains array representation of list
+    inode_free = []             # free inode numbers of every allocation group (heaps, lowest number first),
+                                # sorted at sync, free list on drive is chained from them in ascending order
 
     inode_block_size = 262144   # Total size of inode blocks (1024*256) = 262144
 
@@ -59,27 +104,163 @@ class Superblock :
     index_list = []             # contains array representation of singly linked index table list
 
 
-    active_inode_dict = {}      # contains Dictionary of active inode objects, key of each object is its inode number
+    active_inode_dict = {}      # InodeTable of active inode objects, key of each object is its inode number
 
 
     #__Defining dentry elements on file system, built when drive in mounted
 
     # contains childrens present within a directory, key = directory inode number
-    # value = tuple of (child inode list,child filename list) for every active inode
+    # value = dictionary of child filename -> child inode number, kept in order of insertion (listing order),
+    # directories are added when first accessed through get_children()
+
+    child_dict = {}
+
+    # position of entries in data blocks of directory (drives with feature_dir_blocks),
+    # entry slots are kept dense : removed entry is replaced by last entry of directory
+    dentry_record = struct.Struct('>IB3x64s')   # child inode number, file type, filename (NUL padded)
+    dentry_names = {}                           # directory inode number -> list of child filenames in slot order
+    dentry_slots = {}                           # directory inode number -> dictionary of child filename -> slot
+    dirty_dentries = {}                         # directory inode number -> set of slots changed since last flush
+
+    path_cache = None           # PathCache of resolved paths and of paths of inodes, built with dentry objects
+    path_cache_size = 4096      # max no of entries in each of path->inode and inode->path caches
+
+
+
+    # members to keep track of current directory and current user, kept per thread (see ThreadState),
+    # thread that never set them uses values of thread that created or mounted the drive
+    state_defaults = {'cur_working_dir': '/',       # contains sequence of directory strings of current path
+                      'cur_working_dir_num': 0,     # contains inode of the current directory,initially set to root
+                      'cur_uname': 'Guest',         # current user name and index, default is (admin, 0)
+                      'cur_uidx': -1}
+    thread_state = ThreadState(state_defaults)
+    owner_thread = None         # thread that created or mounted the drive
+
+    # locks, several threads can run commands on one mounted drive :
+    # every command holds drive lock for read and locks the inodes it uses (lock_inodes) in ascending
+    # inode number order, lock of a directory guards its entries (write lock to add or remove a name),
+    # allocator has a short critical section of its own, sync holds drive lock for write;
+    # order of acquisition is drive lock, rename lock, inode locks, directory load lock, alloc lock,
+    # allocation group locks (in ascending group order when several are held)
+    drive_lock = RWLock()               # read : a command is running, write : metadata is being flushed
+    rename_lock = RWLock()              # held for write by mv of a directory to another directory
+    inode_locks = LockTable()           # reader/writer lock of every inode used by a running command
+    dentry_load_locks = LockTable()     # lock of directory being read from drive into child_dict
+    alloc_lock = threading.RLock()      # index list, share table and their counters
+
+    # allocation groups, inodes and data blocks are split into groups of consecutive numbers, each with a lock
+    # of its own (taken after alloc lock); a thread allocates from its own group, so that threads do not wait
+    # for each other and files of one thread are kept together, and takes from other groups once it runs dry
+    alloc_group_count = 8       # no of allocation groups of inodes and of data blocks
+    inode_groups = None         # AllocGroups of inodes
+    block_groups = None         # AllocGroups of data blocks, groups are multiples of 64 blocks (bitmap words)
+    group_counter = itertools.count(1)  # groups given to threads in turn, thread owning the drive has group 0
 
-    child_dict = {x : ([], []) for x in range(1024)}
+    #__Defining member functions of the class
 
+    '''
+        Functions to fetch/set per thread members (current directory and user), values set by
+        thread owning the drive become defaults of threads started later
+    '''
+    def get_thread_value(self, name):
+        return getattr(self.thread_state, name)
 
+    def set_thread_value(self, name, value):
+        setattr(self.thread_state, name, value)
+        if self.owner_thread is None or self.owner_thread == threading.get_ident():
+            self.state_defaults[name] = value
 
-    # members to keep track of current directory
-    cur_working_dir = '/'        # contains sequence of directory strings of current path
-    cur_working_dir_num = 0     # contains inode of the current directory,initially set to root
+    cur_working_dir = property(lambda self: self.get_thread_value('cur_working_dir'),
+                               lambda self, value: self.set_thread_value('cur_working_dir', value))
+    cur_working_dir_num = property(lambda self: self.get_thread_value('cur_working_dir_num'),
+                                   lambda self, value: self.set_thread_value('cur_working_dir_num', value))
+    cur_uname = property(lambda self: self.get_thread_value('cur_uname'),
+                         lambda self, value: self.set_thread_value('cur_uname', value))
+    cur_uidx = property(lambda self: self.get_thread_value('cur_uidx'),
+                        lambda self, value: self.set_thread_value('cur_uidx', value))
 
-    # current user name and index, default is (admin, 0)
-    cur_uname = 'Guest'
-    cur_uidx = -1
 
-    #__Defining member functions of the class
+    '''
+        Function to lock inodes till end of running command (unlock_inodes), 'read_nums' are shared with other readers,
+        'write_nums' are exclusive; a command locks all its inodes with one call, locks are then taken in ascending
+        inode number order which rules out deadlocks; negative numbers (paths not found) and inodes already locked
+        by running command are skipped (command called by another command, as touch by put)
+    '''
+    def lock_inodes(self, read_nums=(), write_nums=()):
+        held = {key: is_write for key, lock, is_write in self.thread_state.held_locks}
+        read_nums = [x for x in read_nums if x >= 0 and x not in held]
+        write_nums = [x for x in write_nums if x >= 0 and not held.get(x, False)]
+        self.thread_state.held_locks.extend(self.inode_locks.acquire(read_nums, write_nums))
+
+    def unlock_inodes(self, keep=0):
+        LockTable.release(self.thread_state.held_locks[keep:])
+        self.thread_state.held_locks = self.thread_state.held_locks[:keep]
+
+
+    '''
+        Function to take rename lock till end of running command, before any inode lock, moving a directory
+        to another directory holds it so that two such moves can not make a directory its own ancestor
+    '''
+    def lock_rename(self):
+        self.rename_lock.acquire_write()
+        self.thread_state.held_locks.append(('rename', self.rename_lock, True))
+
+    '''
+        This function sets drive geometry and computes size and position of every segment of drive from it,
+        drives of format version 1 and 2 always have 4096 byte blocks, 16384 blocks, 1024 inodes and 512 index tables
+    '''
+    def set_geometry(self, format_version, bytes_per_block, total_blocks, total_inodes, total_index):
+        self.format_version = format_version
+        self.bytes_per_block = bytes_per_block
+        self.total_blocks = total_blocks
+        self.total_inodes = total_inodes
+        self.total_index = total_index
+        self.block_list_size = total_blocks
+        self.inode_list_size = total_inodes
+        self.index_list_size = total_index
+
+        if format_version < 3:
+            # data block list segment has room for linked free list of version 1 (2 bytes per block),
+            # index tables hold 1024 pointers of 2 bytes
+            self.list_field_size = 2
+            pointer_size = 2
+            self.data_block_size = 4 + 2*total_blocks
+            index_size = 2048
+        else:
+            # block bitmap after 4 byte header, index table takes one block of 4 byte pointers
+            self.list_field_size = 4
+            pointer_size = 4
+            self.data_block_size = 4 + (total_blocks + 7) // 8
+            index_size = bytes_per_block
+
+        # allocation groups of inodes and blocks, block groups never share a word of bitmap
+        self.inode_groups = AllocGroups(total_inodes, self.alloc_group_count)
+        self.block_groups = AllocGroups(total_blocks, self.alloc_group_count, 8*BlockBitmap.word_size)
+
+        self.ilist_block_size = self.list_field_size*(2 + total_inodes)
+        self.inode_block_size = self.bytes_per_inode*total_inodes
+        self.idxList_block_size = 2*self.list_field_size + 4*total_index
+
+        Inode.inode_block_offset = self.superblock_size + self.data_block_size + self.ilist_block_size
+        Index.index_block_offset = Inode.inode_block_offset + self.inode_block_size + self.idxList_block_size
+        Inode.data_block_offset = Index.index_block_offset + total_index*index_size
+        if format_version >= 3:
+            # data blocks are aligned to block size
+            Inode.data_block_offset = -(-Inode.data_block_offset // bytes_per_block) * bytes_per_block
+        self.drive_size = Inode.data_block_offset + total_blocks*bytes_per_block
+
+        Index.set_geometry(index_size, pointer_size)
+        Inode.set_geometry(bytes_per_block, pointer_size)
+
+
+    '''
+        Function to compute default no of index tables : enough tables to address every block,
+        plus one partially filled table per file for as many files as there are tables
+    '''
+    def get_default_index_count(self, bytes_per_block, total_blocks, total_inodes):
+        tables = -(-total_blocks // (bytes_per_block // 4))
+        return tables + min(tables, total_inodes) + 1
+
 
     '''
     This function will be called when filesystem is being created for very first time
@@ -100,67 +281,151 @@ class Superblock :
         self.passwd_list = ["admin", "0", "0", "0", "0", "0", "0", "0"]
 
         '''
-        Initializing the block list (array representation of singly linked list)
+        Initializing the block bitmap, 0th data block is reserved (zero indicates absense of
+        data block pointer in inode "data block pointer" list)
         '''
-        self.block_list = [x for x in range(1, self.block_list_size)]
-        self.block_list.append(self.block_list_size)
+        self.block_bitmap = BlockBitmap(self.total_blocks, self.block_groups.group_size)
+        self.block_bitmap.set_used(0)
+        self.total_used_blocks = self.block_bitmap.used_count
 
         '''
-        Initializing the free inode list
+        Initializing the free inode list, changed entries of lists are tracked per drive
+        (sets of class would keep entries changed on previously mounted drive)
         '''
+        self.ilist_dirty_slots = set()
+        self.idxlist_dirty_slots = set()
         self.inode_list = [x for x in range(1, self.inode_list_size)]
         self.inode_list.append(self.inode_list_size)
+        self.build_inode_free_lists()
+        self.reset_alloc_groups()
 
         '''
         Initializing the free index table list
         '''
         self.index_list = [x for x in range(1, self.index_list_size)]
         self.index_list.append(self.index_list_size)
+        self.inode_list_head = 0
+        self.index_list_head = 0
+        self.total_used_index = 0
+
+        # 0th index table is reserved (zero indicates absense of indirect pointer in inode)
+        self.fetch_index()
+
+        # new drive has no optional features
+        self.feature_flags = 0
+        self.share_table = None
+        self.share_table_block = 0
 
+        # dropping inodes of previously mounted drive
+        self.active_inode_dict = InodeTable(self.is_inode_active, self.get_active_inode_numbers,
+                                            self.max_resident_inodes)
+        self.child_dict = {}
+        self.dentry_names = {}
+        self.dentry_slots = {}
+        self.dirty_dentries = {}
+        self.path_cache = PathCache(self.path_cache_size)
+        Inode.dirty_inodes.clear()
+
+
+    '''
+        This function formats the drive, if preallocate is True disk space for entire drive
+        (including data area) is reserved, otherwise data area stays sparse till it is written;
+        new drives use format version 3 with given block size, no of blocks and no of inodes
+    '''
+    def create_empty_vfs(self, preallocate=False, bytes_per_block=4096, total_blocks=16384, total_inodes=1024):
+        if bytes_per_block & (bytes_per_block - 1) != 0 or not 512 <= bytes_per_block <= 65536:
+            print('Block size must be a power of 2 between 512 and 65536 !')
+            return -1
+        if not 2 <= total_blocks < 2**32 or not 2 <= total_inodes < 2**32:
+            print('Invalid no of blocks/inodes !')
+            return -1
 
-    def create_empty_vfs(self):
         try:
-            drivefile = Path(os.getcwd() + "\\" + self.drive_filename)
-            size = 69505548
+            drive_exists = os.path.isfile(self.drive_filename)
+
+            # drive being formatted is reopened, it might be mapped by earlier mount
+            self.close_drive()
 
             #initialising to defaults
+            self.set_geometry(3, bytes_per_block, total_blocks, total_inodes,
+                              self.get_default_index_count(bytes_per_block, total_blocks, total_inodes))
             self.vfs_create_init()
+            self.feature_flags = self.feature_dir_blocks
+
+            # truncating to zero drops old contents, so entire drive reads as zeros after resizing;
+            # index tables and data area need no writes at all
+            fd = os.open(self.drive_filename, os.O_RDWR | os.O_CREAT | getattr(os, 'O_BINARY', 0))
+            try:
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, self.drive_size)
+                if preallocate and hasattr(os, 'posix_fallocate'):
+                    os.posix_fallocate(fd, 0, self.drive_size)
+            finally:
+                os.close(fd)
+
+            # writing metadata regions, each as a single bulk write
+            self.open_drive()
+            self.write_sblock_to_file()
+            self.write_dblist_to_file(True)
+            self.write_ilist_to_file()
+            self.write_iblock_to_file()
+            self.write_idxList_to_file()
 
-            #check if file exists, else create it
-            if drivefile.is_file():
-                self.write_sblock_to_file()
-                self.write_dblist_to_file()
-                self.write_ilist_to_file()
-                self.write_iblock_to_file()
-                self.write_idxList_to_file()
-                self.write_idxBlock_to_file()
+            if drive_exists:
                 print("Existing drive overwritten !")
             else:
-                fp = open(self.drive_filename, 'wb')
-                #fp.seek(size-1)
-                #fp.write(b'\x00')
-                fp.close()
-                self.write_sblock_to_file()
-                self.write_dblist_to_file()
-                self.write_ilist_to_file()
-                self.write_iblock_to_file()
-                self.write_idxList_to_file()
-                self.write_idxBlock_to_file()
-
                 print("Drive created !")
 
             # creating root directory and write it to drive file
             self.create_root_dir()
-            self.active_inode_dict[0].write_inode_to_file()
 
             # writing changes back to directory
-            self.write_sblock_to_file()
-            self.write_ilist_to_file()
+            self.sync()
             return 0
         except Exception:
             return -1
 
 
+    '''
+        Function to open drive file once, the same BlockDevice is shared with Inode objects;
+        drive left open by create is reopened if mount asks for the other kind of device
+    '''
+    def open_drive(self, use_mmap=False):
+        if self.drive is not None and isinstance(self.drive, MappedBlockDevice) != use_mmap:
+            self.close_drive()
+
+        if self.drive is None:
+            if use_mmap:
+                # mapping fails without enough memory or on file systems without mmap support
+                try:
+                    Superblock.drive = MappedBlockDevice(self.drive_filename, Inode.inode_block_offset,
+                                                         Inode.data_block_offset, self.drive_size, self.bytes_per_block)
+                except (OSError, ValueError) as e:
+                    print('Drive can not be memory mapped (' + str(e) + '), using read/write calls !')
+            if self.drive is None:
+                Superblock.drive = BlockDevice(self.drive_filename, Inode.inode_block_offset,
+                                               Inode.data_block_offset, self.bytes_per_block)
+            Inode.drive = Superblock.drive
+            Index.drive = Superblock.drive
+
+            Superblock.block_cache = BlockCache(self.block_cache_size)
+            Inode.block_cache = Superblock.block_cache
+
+
+    '''
+        Function to close drive file, called when file system is unmounted
+    '''
+    def close_drive(self):
+        if self.drive is not None:
+            self.drive.flush()
+            self.drive.close()
+            Superblock.drive = None
+            Inode.drive = None
+            Index.drive = None
+            Superblock.block_cache = None
+            Inode.block_cache = None
+
+
 
 
     '''
@@ -183,20 +448,11 @@ class Superblock :
 
         # bytes of superblock size
         byte_stream += self.superblock_size.to_bytes(2, byteorder='big')
-        byte_stream += self.total_used_blocks.to_bytes(2, byteorder='big')
-
-        # bytes of total bytes per block
-        byte_stream += (self.bytes_per_block.to_bytes(2, byteorder='big'))
 
-        # bytes of total comsumed blocks
-        byte_stream += (self.total_blocks.to_bytes(2, byteorder='big'))
-
-        # bytes of total inodes and rest of the single valued print
-        byte_stream += (self.total_inodes_used.to_bytes(2, byteorder='big'))
-        byte_stream += (self.bytes_per_inode.to_bytes(2, byteorder='big'))
-        byte_stream += (self.total_inodes.to_bytes(2, byteorder='big'))
-        byte_stream += (self.total_used_index.to_bytes(2, byteorder='big'))
-        byte_stream += (self.total_index.to_bytes(2, byteorder='big'))
+        # bytes of counters and geometry, values that do not fit in 2 bytes are
+        # stored in full after format version (format version 3)
+        byte_stream += self.get_short_fields()
+        byte_stream += (min(self.total_index, 0xffff).to_bytes(2, byteorder='big'))
 
         # bytes for time stamps
         for x in self.last_mount_time:
@@ -223,42 +479,66 @@ class Superblock :
                 byte_stream.append(x)
 
 
-        # bytes for extra space
-        for x in range(220):
-            byte_stream.append(0)
+        # bytes of format version, followed by geometry and counters of format version 3 and extra space
+        byte_stream += self.format_version.to_bytes(2, byteorder='big')
+        if self.format_version >= 3:
+            byte_stream += struct.pack('>4I', self.bytes_per_block, self.total_blocks, self.total_inodes, self.total_index)
+            byte_stream += self.get_ext_counters()
+        byte_stream += bytes(self.superblock_size - len(byte_stream))
 
 
         # writing superblock to file
-        with open(self.drive_filename, "rb+") as fp:
-            fp.seek(0)
-            fp.write(byte_stream)
+        self.drive.pwrite(0, byte_stream)
 
 
 
 
     '''
-        This function writes Data block list to drive
+        This function writes only the usage counters of superblock (bytes 4 to 16 : used blocks,
+        bytes per block, total blocks, used inodes, bytes per inode, total inodes, used index tables,
+        and 4 byte counters and feature fields of format version 3)
     '''
-    def write_dblist_to_file(self):
+    def write_sblock_counters(self):
 
-        byte_stream = bytearray()
+        self.drive.pwrite(4, self.get_short_fields())
+        if self.format_version >= 3:
+            self.drive.pwrite(self.ext_fields_offset + 16, self.get_ext_counters())
 
-        # bytes of block list size
-        byte_stream += self.block_list_size.to_bytes(2, byteorder='big')
 
-        # bytes of head of free block list
-        byte_stream += self.block_list_head.to_bytes(2, byteorder='big')
+    '''
+        Functions to fetch 2 byte counters and geometry (bytes 4 to 18) of superblock, values are capped
+        to 2 bytes, and 4 byte counters of format version 3 followed by feature flags and share table position
+    '''
+    def get_short_fields(self):
+        return struct.pack('>7H', *[min(x, 0xffff) for x in (self.total_used_blocks, self.bytes_per_block,
+                                                             self.total_blocks, self.total_inodes_used,
+                                                             self.bytes_per_inode, self.total_inodes,
+                                                             self.total_used_index)])
+
+    def get_ext_counters(self):
+        return struct.pack('>5I', self.total_used_blocks, self.total_inodes_used, self.total_used_index,
+                           self.feature_flags, self.share_table_block)
 
-        # bytes for entire byte free list
-        for x in self.block_list:
-            byte_stream += x.to_bytes(2, byteorder='big')
 
-        # writing byte stream of data block to file
-        with open(self.drive_filename, 'rb+') as fp:
-            fp.seek(self.superblock_size)
-            fp.write(byte_stream)
 
-        #print(byte_stream, len(byte_stream))
+    '''
+        This function writes Data block list (block bitmap) to drive,
+        only the bitmap words changed since last write are written, header only when drive is formatted
+    '''
+    def write_dblist_to_file(self, write_header=False):
+
+        if write_header:
+            byte_stream = bytearray()
+
+            # bytes of block list size, head of free list (2 bytes, till format version 2) is not used by bitmap
+            byte_stream += self.block_list_size.to_bytes(self.list_field_size, byteorder='big')
+            byte_stream += bytes(4 - self.list_field_size)
+            self.drive.pwrite(self.superblock_size, byte_stream)
+
+        # writing changed runs of bitmap words to file
+        for offset, run in self.block_bitmap.get_dirty_runs():
+            self.drive.pwrite(self.superblock_size + 4 + offset, run)
+        self.block_bitmap.clear_dirty()
 
 
     '''
@@ -269,19 +549,129 @@ class Superblock :
         byte_stream = bytearray()
 
         # bytes for size of entire inode list
-        byte_stream += self.inode_list_size.to_bytes(2, byteorder='big')
+        byte_stream += self.inode_list_size.to_bytes(self.list_field_size, byteorder='big')
 
         # bytes for head of the free inode list
-        byte_stream += self.inode_list_head.to_bytes(2, byteorder='big')
+        byte_stream += self.inode_list_head.to_bytes(self.list_field_size, byteorder='big')
 
         # bytes for entire inode list
-        for x in self.inode_list:
-            byte_stream += x.to_bytes(2, byteorder='big')
+        byte_stream += struct.pack('>%d%s' % (len(self.inode_list), self.get_list_format()), *self.inode_list)
 
         # writing byte stream to file
-        with open(self.drive_filename, 'rb+') as fp:
-            fp.seek(self.superblock_size+self.data_block_size)
-            fp.write(byte_stream)
+        self.drive.pwrite(self.superblock_size+self.data_block_size, byte_stream)
+        self.ilist_dirty = False
+        self.ilist_dirty_slots = set()
+
+
+
+    '''
+        This function writes only changed part of inode list to drive : head of the list
+        and every changed entry, adjacent entries are written together
+    '''
+    def write_ilist_changes(self):
+
+        list_offset = self.superblock_size+self.data_block_size
+        field_size = self.list_field_size
+
+        # head of the free inode list follows list size
+        if self.ilist_dirty:
+            self.drive.pwrite(list_offset + field_size, self.inode_list_head.to_bytes(field_size, byteorder='big'))
+
+        self.write_list_entries(list_offset + 2*field_size, self.inode_list, self.ilist_dirty_slots, field_size)
+        self.ilist_dirty = False
+        self.ilist_dirty_slots = set()
+
+
+
+    '''
+        This function writes only changed part of index list to drive : head of the list
+        and every changed entry (4 bytes each)
+    '''
+    def write_idxlist_changes(self):
+
+        list_offset = self.superblock_size+self.data_block_size+self.ilist_block_size+self.inode_block_size
+
+        field_size = self.list_field_size
+
+        if self.idxlist_dirty:
+            self.drive.pwrite(list_offset + field_size, self.index_list_head.to_bytes(field_size, byteorder='big'))
+
+        self.write_list_entries(list_offset + 2*field_size, self.index_list, self.idxlist_dirty_slots, 4)
+        self.idxlist_dirty = False
+        self.idxlist_dirty_slots = set()
+
+
+
+    '''
+        Function to get struct format of inode list entries
+    '''
+    def get_list_format(self):
+        return 'H' if self.list_field_size == 2 else 'I'
+
+
+
+    '''
+        This function writes changed entries 'dirty_slots' of an array represented list stored at
+        'entries_offset', each entry has 'entry_size' bytes; every run of adjacent entries is one write
+    '''
+    def write_list_entries(self, entries_offset, values, dirty_slots, entry_size):
+
+        run_start = -1
+        run_stream = bytearray()
+        for slot in sorted(dirty_slots):
+            # writing previous run if current entry is not adjacent to it
+            if len(run_stream) > 0 and slot != run_start + len(run_stream) // entry_size:
+                self.drive.pwrite(entries_offset + run_start*entry_size, run_stream)
+                run_stream = bytearray()
+
+            if len(run_stream) == 0:
+                run_start = slot
+            run_stream += values[slot].to_bytes(entry_size, byteorder='big')
+
+        if len(run_stream) > 0:
+            self.drive.pwrite(entries_offset + run_start*entry_size, run_stream)
+
+
+
+    '''
+        This function writes changed directory entries to data blocks of their directories,
+        every run of adjacent entries is written with a single write
+    '''
+    def write_dentry_changes(self):
+
+        entry_size = self.dentry_record.size
+        for dir_inode, slots in self.dirty_dentries.items():
+            if dir_inode not in self.dentry_names:
+                continue
+            names = self.dentry_names[dir_inode]
+            children = self.child_dict[dir_inode]
+            slots = sorted(x for x in slots if x < len(names))
+
+            run_start = 0
+            for i in range(1, len(slots) + 1):
+                if i == len(slots) or slots[i] != slots[i-1] + 1:
+                    byte_stream = bytearray(entry_size*(i - run_start))
+                    for j in range(run_start, i):
+                        name = names[slots[j]]
+                        self.dentry_record.pack_into(byte_stream, (j - run_start)*entry_size, children[name],
+                                                     self.active_inode_dict[children[name]].file_type,
+                                                     name.encode('utf-8'))
+                    self.active_inode_dict[dir_inode].write_data(slots[run_start]*entry_size, byte_stream)
+                    run_start = i
+
+        self.dirty_dentries = {}
+
+
+
+    '''
+        This function writes changed words of share table to its data blocks
+    '''
+    def write_share_table_changes(self):
+
+        table_offset = Inode.data_block_offset + self.share_table_block*self.bytes_per_block
+        for offset, run in self.share_table.get_dirty_runs():
+            self.drive.pwrite(table_offset + offset, run)
+        self.share_table.clear_dirty()
 
 
 
@@ -290,18 +680,17 @@ class Superblock :
     '''
     def write_iblock_to_file(self):
 
-        byte_stream = bytearray()
-
-        # collecting bytes streams for individual inode
-        for i in range(1024):
-            node = Inode(i)
-            byte_stream += node.get_inode_bytestream()
+        # every empty inode is same as inode 0 except inode number (4 bytes at offset 3),
+        # inode block is written in chunks so that drives with many inodes need bounded memory
+        template = Inode(0).get_inode_bytestream()
+        for first in range(0, self.total_inodes, self.chunk_inodes):
+            count = min(self.chunk_inodes, self.total_inodes - first)
+            byte_stream = bytearray(template * count)
+            for i in range(count):
+                byte_stream[i*self.bytes_per_inode+3:i*self.bytes_per_inode+7] = (first + i).to_bytes(4, byteorder='big')
 
-        # writing data to file
-        with open(self.drive_filename, 'rb+') as fp:
-            fp.seek(self.superblock_size+self.data_block_size+self.ilist_block_size)
-            fp.write(byte_stream)
-        #print(len(byte_stream))
+            # writing data to file
+            self.drive.pwrite(Inode.inode_block_offset + first*self.bytes_per_inode, byte_stream)
 
 
 
@@ -313,37 +702,107 @@ class Superblock :
         byte_stream = bytearray()
 
         # bytes for index list size
-        byte_stream += self.index_list_size.to_bytes(2, byteorder='big')
+        byte_stream += self.index_list_size.to_bytes(self.list_field_size, byteorder='big')
 
         # bytes for head of the index list
-        byte_stream += self.index_list_head.to_bytes(2, byteorder='big')
+        byte_stream += self.index_list_head.to_bytes(self.list_field_size, byteorder='big')
 
         # bytes for entire lndex list
-        for x in self.index_list:
-            byte_stream += x.to_bytes(4, byteorder='big')
+        byte_stream += struct.pack('>%dI' % len(self.index_list), *self.index_list)
 
-        with open(self.drive_filename, 'rb+') as fp:
-            fp.seek(self.superblock_size+self.data_block_size+self.ilist_block_size+self.inode_block_size)
-            fp.write(byte_stream)
+        self.drive.pwrite(self.superblock_size+self.data_block_size+self.ilist_block_size+self.inode_block_size, byte_stream)
+        self.idxlist_dirty = False
+        self.idxlist_dirty_slots = set()
 
 
 
     '''
-        This function writes entire index block to file
+        This function writes entire index block to file, empty index tables are all zeros
+        (not needed after formatting, as formatted drive is zero filled)
     '''
     def write_idxBlock_to_file(self):
 
-        byte_stream = bytearray()
+        byte_stream = bytes(len(Index().get_index_bytestream()) * self.total_index)
+
+        self.drive.pwrite(self.superblock_size+self.data_block_size+self.ilist_block_size+self.inode_block_size+self.idxList_block_size, byte_stream)
+
+
+
+
+    '''
+        This function writes all dirty inodes back to drive, inodes are sorted by inode number
+        and every run of consecutive inodes is written with a single write
+    '''
+    def flush_inodes(self):
+
+        dirty_nums = sorted(x for x in Inode.dirty_inodes if x in self.active_inode_dict)
+        Inode.dirty_inodes.clear()
+        if len(dirty_nums) == 0:
+            return
+
+        # encoding all dirty inodes into one shared buffer
+        byte_stream = Inode.encode_inodes([self.active_inode_dict[num] for num in dirty_nums])
+        view = memoryview(byte_stream)
+
+        # writing one run of adjacent inodes at a time
+        run_idx = 0
+        for i in range(1, len(dirty_nums) + 1):
+            if i == len(dirty_nums) or dirty_nums[i] != dirty_nums[i-1] + 1:
+                self.drive.pwrite(Inode.inode_block_offset + dirty_nums[run_idx]*self.bytes_per_inode,
+                                  view[run_idx*self.bytes_per_inode:i*self.bytes_per_inode])
+                run_idx = i
+
+        for num in dirty_nums:
+            self.active_inode_dict[num].dirty = False
+
+
+
+    '''
+        This function writes every modified metadata structure (inodes, lists, superblock) to drive
+    '''
+    def sync(self):
+
+        # directory entries first, they might allocate blocks to directories
+        if len(self.dirty_dentries) > 0:
+            self.write_dentry_changes()
+
+        self.flush_inodes()
+
+        # counters are kept by allocation groups
+        self.total_inodes_used = self.total_inodes - self.get_free_inode_count()
+        self.total_used_blocks = self.block_bitmap.used_count
+
+        if self.ilist_dirty or len(self.ilist_dirty_slots) > 0:
+            self.chain_free_inodes(sorted(self.ilist_dirty_slots))
+            self.write_ilist_changes()
+
+        if self.idxlist_dirty or len(self.idxlist_dirty_slots) > 0:
+            self.write_idxlist_changes()
 
-        #collecting byte streams for every index table
-        for i in range(512):
-            table = Index()
-            byte_stream += table.get_index_bytestream()
+        if self.dblist_dirty:
+            self.write_dblist_to_file()
+            self.dblist_dirty = False
 
-        with open(self.drive_filename, 'rb+') as fp:
-            fp.seek(self.superblock_size+self.data_block_size+self.ilist_block_size+self.inode_block_size+self.idxList_block_size)
-            fp.write(byte_stream)
+        if self.share_table is not None and len(self.share_table.dirty_words) > 0:
+            self.write_share_table_changes()
 
+        if self.sblock_dirty:
+            self.write_sblock_counters()
+            self.sblock_dirty = False
+
+        self.last_flush_time = time.time()
+
+
+    '''
+        This function is called at end of every command, it flushes only if 'flush_interval' seconds
+        have passed since last flush, so that a burst of commands is written in one batch
+    '''
+    def sync_if_due(self):
+        if time.time() - self.last_flush_time >= self.flush_interval:
+            self.sync()
+
+        # command is over, no inode object is held anymore
+        self.active_inode_dict.trim()
 
 
 
@@ -356,30 +815,80 @@ class Superblock :
 
     '''
         Function to load vfs to file 
+        if use_mmap is True, entire drive is memory mapped instead of using read/write calls
+        superblock is read before drive is opened, as geometry stored in it is needed to open the drive;
+        rest of the metadata takes one read, except with lazy inodes, where the lists before inode block
+        and index list after it are read separately, so that inode block itself is never read at mount
     '''
-    def read_vfs(self):
+    def read_vfs(self, use_mmap=False):
 
         try:
-            # reading superblock from file
-            self.read_sblock_from_file()
+            # reading superblock, geometry stored in it is needed to open the drive
+            with open(self.drive_filename, 'rb') as fp:
+                self.read_sblock_from_file(fp.read(self.superblock_size))
+
+            # opening drive, kept open till exit
+            self.open_drive(use_mmap)
+            Inode.dirty_inodes.clear()
+            self.ilist_dirty_slots = set()
+            self.idxlist_dirty_slots = set()
+
+            # reading rest of the metadata (lists and inode block, up to index tables) in a single read,
+            # inode block is skipped when inodes are read on first access
+            if self.lazy_inodes:
+                byte_stream = self.drive.pread(self.superblock_size, self.data_block_size + self.ilist_block_size)
+            else:
+                byte_stream = self.drive.pread(self.superblock_size, Index.index_block_offset - self.superblock_size)
+            offset = 0
+
+            # reading data block list
+            self.read_dblist_from_file(byte_stream[offset:offset + self.data_block_size])
+            offset += self.data_block_size
+
+            # reading inode list, free list of drives written by earlier versions is chained
+            # in ascending order by next sync
+            self.read_iList_from_file(byte_stream[offset:offset + self.ilist_block_size])
+            offset += self.ilist_block_size
+            self.build_inode_free_lists()
+            self.chain_free_inodes()
+            self.reset_alloc_groups()
+
+            # inode block is parsed from memory once active inodes are known
+            if self.lazy_inodes:
+                inode_block = None
+                self.read_idxList_from_file()
+            else:
+                inode_block = byte_stream[offset:offset + self.inode_block_size]
+                offset += self.inode_block_size
 
-            # reading data block list from file
-            self.read_dblist_from_file()
+                # reading index list
+                self.read_idxList_from_file(byte_stream[offset:offset + self.idxList_block_size])
+            byte_stream = None
 
-            # reading inode list from file
-            self.read_iList_from_file()
+            # fetching all active inodes, version 1 drives never updated the count on drive
+            self.build_act_inode_dict(inode_block)
+            self.total_inodes_used = len(self.active_inode_dict)
 
-            # read index list from file
-            self.read_idxList_from_file()
+            # drives formatted before index tables were used have 0th index table free
+            if self.index_list[0] != 0 and self.index_list_head == 0:
+                self.fetch_index()
 
-            # fetching all active inodes
-            self.build_act_inode_dict()
+            # loading share counts of drives having cloned files
+            if self.feature_flags & self.feature_shared_blocks:
+                self.read_share_table()
 
-            # bulding dentry dictionary
+            # upgrading free block list of version 1 drive
+            if self.format_version < 2:
+                self.convert_block_list()
+
+            # bulding dentry dictionary, directories are loaded on first access if their entries are on drive
             self.build_dentry_obj()
+            if self.format_version >= 3 and not self.feature_flags & self.feature_dir_blocks:
+                self.convert_dentries()
 
 
-            # assign "root" as current working directory
+            # assign "root" as current working directory, threads started later begin there
+            Superblock.owner_thread = threading.get_ident()
             self.cur_working_dir = '/'
             self.cur_working_dir_num = 0
             return 1
@@ -388,41 +897,33 @@ class Superblock :
 
 
 
-    def read_iList_from_file(self):
-
-        byte_stream = bytearray()
+    def read_iList_from_file(self, byte_stream=None):
 
-        try:
-            with open(self.drive_filename, 'rb') as fp:
-                fp.seek(self.superblock_size+self.data_block_size)
-                byte_stream = bytearray(fp.read(self.ilist_block_size))
-        except IOError:
-            print('Error in reading Inode List Block')
+        if byte_stream is None:
+            byte_stream = bytearray()
+            try:
+                byte_stream = self.drive.pread(self.superblock_size+self.data_block_size, self.ilist_block_size)
+            except IOError:
+                print('Error in reading Inode List Block')
 
         # processing byte stream
-        offset = 0
-        self.inode_list_size = int.from_bytes(byte_stream[offset:offset+2], byteorder='big', signed=False)
-        offset += 2
-        self.inode_list_head = int.from_bytes(byte_stream[offset:offset+2], byteorder='big', signed=False)
-        offset += 2
+        list_format = self.get_list_format()
+        self.inode_list_size, self.inode_list_head = struct.unpack_from('>2' + list_format, byte_stream, 0)
 
-        # setting inode list empty
-        self.inode_list = []
-        for i in range(0, self.inode_list_size):
-            self.inode_list.append(int.from_bytes(byte_stream[offset:offset+2], byteorder='big', signed=False))
-            offset += 2
+        # decoding entire inode list at once
+        self.inode_list = list(struct.unpack_from('>%d%s' % (self.inode_list_size, list_format),
+                                                  byte_stream, 2*self.list_field_size))
 
 
 
-    def read_sblock_from_file(self):
-        byte_stream = bytearray()  # bytearray(b'') = output
+    def read_sblock_from_file(self, byte_stream=None):
 
-        try:
-            with open(self.drive_filename, 'rb') as fp:  # for opening binary files
-                byte_stream = bytearray(
-                    fp.read(self.superblock_size))  # store evth in file in the binary format in byte_stream
-        except IOError:
-            print('Error in reading Superblock')
+        if byte_stream is None:
+            byte_stream = bytearray()  # bytearray(b'') = output
+            try:
+                byte_stream = self.drive.pread(0, self.superblock_size)  # store evth in file in the binary format in byte_stream
+            except IOError:
+                print('Error in reading Superblock')
 
         #print(byte_stream)
         # processing byte stream
@@ -469,12 +970,14 @@ class Superblock :
         # retrieving time stamps : mount time
         offset += 2
 
+        self.last_mount_time = []
         for i in range(0, 6):
             self.last_mount_time.append(
                 int.from_bytes(byte_stream[offset:offset + 1], byteorder='big', signed=False))
             offset += 1
 
         # retrieving time stamps : modified time
+        self.last_modified_time = []
         for i in range(0, 6):
             self.last_modified_time.append(
                 int.from_bytes(byte_stream[offset:offset + 1], byteorder='big', signed=False))
@@ -504,74 +1007,108 @@ class Superblock :
             self.passwd_list.append(("".join([chr(c) for c in password])).strip())
         #print(self.passwd_list)
 
+        # drives created before format version was stored have zero here
+        format_version = max(1, int.from_bytes(byte_stream[offset:offset + 2], byteorder='big', signed=False))
+        offset += 2
+
+        # format version 3 stores geometry and counters in 4 bytes each, followed by optional features
+        self.feature_flags = 0
+        self.share_table = None
+        self.share_table_block = 0
+        if format_version >= 3:
+            (self.bytes_per_block, self.total_blocks, self.total_inodes, self.total_index,
+             self.total_used_blocks, self.total_inodes_used, self.total_used_index,
+             self.feature_flags, self.share_table_block) = struct.unpack_from('>9I', byte_stream, offset)
+
+        self.set_geometry(format_version, self.bytes_per_block, self.total_blocks, self.total_inodes, self.total_index)
+
         #print(self.file_sys_type, self.superblock_size, self.total_used_blocks, self.last_mount_time,
         #      self.last_modified_time, self.max_no_of_users, self.username_list, self.passwd_list)
 
 
     '''
-       This function writes Data block list from file to the data block
+       This function reads Data block list (block bitmap) from file
     '''
-    def read_dblist_from_file(self):
+    def read_dblist_from_file(self, byte_stream=None):
 
-        byte_stream = bytearray()
+        self.block_bitmap = BlockBitmap(self.total_blocks, self.block_groups.group_size)
 
-        try:
-            with open(self.drive_filename, 'rb') as fp:  # for opening binary files
-                fp.seek(self.superblock_size)  # reach till the datablock list
-                byte_stream = bytearray(
-                    fp.read(self.data_block_size))  # store evth in file in the binary format in byte_stream
-        except IOError:
-            print('Error in reading data Block list')
+        # version 1 drives store a linked free list, bitmap is rebuilt from inodes by convert_block_list()
+        if self.format_version < 2:
+            return
 
-        #print(byte_stream)
+        if byte_stream is None:
+            byte_stream = bytearray()
+            try:
+                # reach till the datablock list and store evth in file in the binary format in byte_stream
+                byte_stream = self.drive.pread(self.superblock_size, 4 + len(self.block_bitmap.bits))
+            except IOError:
+                print('Error in reading data Block list')
 
         # processing byte stream
         offset = 0
-        self.block_list_size = int.from_bytes(byte_stream[offset:offset + 2], byteorder='big', signed=False)
+        self.block_list_size = int.from_bytes(byte_stream[offset:offset + self.list_field_size], byteorder='big', signed=False)
+
+        # bytes for entire block bitmap, after header of size and (unused) head
+        offset += 4
+        self.block_bitmap.load(byte_stream[offset:])
+        self.total_used_blocks = self.block_bitmap.used_count
 
-        offset += 2
-        self.block_list_head = int.from_bytes(byte_stream[offset:offset + 2], byteorder='big', signed=False)
 
-        offset += 2
-        # bytes for entire byte free list
 
-        for x in range(0, self.total_blocks):
-            self.block_list.append(int.from_bytes(byte_stream[offset:offset + 2], byteorder='big', signed=False))
-            offset += 2
+    '''
+        This function converts a version 1 drive (linked free block list) to block bitmap,
+        blocks in use are taken from the block pointers of active inodes (the linked list of
+        version 1 drives leaks blocks that were released without writing the list)
+    '''
+    def convert_block_list(self):
 
-            # print(byte_stream, len(byte_stream))
+        self.block_bitmap = BlockBitmap(self.total_blocks, self.block_groups.group_size)
+        self.block_bitmap.set_used(0)
+        for node in self.active_inode_dict.values():
+            for x in node.direct_block_pointers:
+                if x != 0:
+                    self.block_bitmap.set_used(x)
+
+        self.total_used_blocks = self.block_bitmap.used_count
+        self.format_version = 2
+
+        # writing bitmap first, then superblock with new format version
+        self.write_dblist_to_file(True)
+        self.write_sblock_to_file()
 
 
     '''
-        This function writes index list block to drive
+        This function reads share table from its data blocks
     '''
-    def read_idxList_from_file(self):
+    def read_share_table(self):
 
-        byte_stream = bytearray()
+        self.share_table = ShareTable(self.total_blocks)
+        byte_stream = self.drive.pread(Inode.data_block_offset + self.share_table_block*self.bytes_per_block,
+                                       ShareTable.get_table_size(self.total_blocks))
+        self.share_table.load(byte_stream)
 
-        try:
-            with open(self.drive_filename, 'rb') as fp:  # for opening binary files
-                fp.seek(
-                    self.superblock_size + self.data_block_size + self.ilist_block_size + self.inode_block_size)  # reach till the datablock list
-                byte_stream = bytearray(
-                    fp.read(self.idxList_block_size))  # store evth in file in the binary format in byte_stream
-        except IOError:
-            print('Error in reading index list')
 
-        #print(byte_stream)
+    '''
+        This function writes index list block to drive
+    '''
+    def read_idxList_from_file(self, byte_stream=None):
 
-        # value of index list size
-        offset = 0
-        self.index_list_size = int.from_bytes(byte_stream[offset:offset + 2], byteorder='big', signed=False)
+        if byte_stream is None:
+            byte_stream = bytearray()
+            try:
+                # reach till the index list and store evth in file in the binary format in byte_stream
+                byte_stream = self.drive.pread(
+                    self.superblock_size + self.data_block_size + self.ilist_block_size + self.inode_block_size,
+                    self.idxList_block_size)
+            except IOError:
+                print('Error in reading index list')
 
-        # value of head of the index list
-        offset += 2
-        self.index_list_head = int.from_bytes(byte_stream[offset:offset + 2], byteorder='big', signed=False)
+        # values of index list size and head of the index list
+        self.index_list_size, self.index_list_head = struct.unpack_from('>2' + self.get_list_format(), byte_stream, 0)
 
-        # bytes for entire lndex list
-        for x in range(0, self.total_index):
-            self.index_list.append(int.from_bytes(byte_stream[offset:offset + 4], byteorder='big', signed=False))
-            offset += 4
+        # decoding entire index list at once, entries start after size and head
+        self.index_list = list(struct.unpack_from('>%dI' % self.total_index, byte_stream, 2*self.list_field_size))
 
 
 
@@ -581,32 +1118,131 @@ class Superblock :
     #######################################################
     '''
 
+    '''
+        Function to fetch allocation group of calling thread, threads get groups in turn on first allocation
+    '''
+    def get_alloc_group(self):
+        if self.thread_state.alloc_group < 0:
+            self.thread_state.alloc_group = next(self.group_counter)
+        return self.thread_state.alloc_group
+
+
+    '''
+        Function to give allocation group 0 to calling thread (thread creating or mounting the drive),
+        threads allocating later get following groups
+    '''
+    def reset_alloc_groups(self):
+        self.thread_state.alloc_group = 0
+        Superblock.group_counter = itertools.count(1)
+
+
+    '''
+        Function to build free inode numbers of every allocation group from inode list (sorted lists are heaps)
+    '''
+    def build_inode_free_lists(self):
+        self.inode_free = []
+        for group in range(self.inode_groups.count):
+            start, end = self.inode_groups.get_range(group)
+            self.inode_free.append([x for x in range(start, end) if self.inode_list[x] != x])
+
+
+    '''
+        Function to get count of free inodes
+    '''
+    def get_free_inode_count(self):
+        return sum(len(x) for x in self.inode_free)
+
+
+    '''
+        Functions to fetch nearest free inode before/after 'inode_num', -1/inode_list_size if there is none,
+        free inodes of every group must be sorted
+    '''
+    def prev_free_inode(self, inode_num):
+        group = self.inode_groups.get_group(inode_num)
+        free = self.inode_free[group]
+        i = bisect.bisect_left(free, inode_num)
+        if i > 0:
+            return free[i - 1]
+        for free in reversed(self.inode_free[:group]):
+            if len(free) > 0:
+                return free[-1]
+        return -1
+
+    def next_free_inode(self, inode_num):
+        group = max(self.inode_groups.get_group(inode_num), 0)
+        free = self.inode_free[group]
+        i = bisect.bisect_right(free, inode_num)
+        if i < len(free):
+            return free[i]
+        for free in self.inode_free[group + 1:]:
+            if len(free) > 0:
+                return free[0]
+        return self.inode_list_size
+
+
+    '''
+        Function to chain free inodes of inode list in ascending order (list on drive stays readable by earlier
+        versions), only entries of free inodes around 'changed' inodes are relinked (every free inode if changed
+        is None); called when no command is running (sync, mount)
+    '''
+    def chain_free_inodes(self, changed=None):
+        # every inode fetched or released since last chaining is in 'changed', heaps of other groups are still sorted
+        for group in set(self.inode_groups.get_group(x) for x in (changed or [])):
+            self.inode_free[group].sort()
+
+        if changed is None:
+            free = [x for group in self.inode_free for x in group]
+            links = zip(free, free[1:] + [self.inode_list_size])
+        else:
+            relink = set()
+            for inode_num in changed:
+                if self.inode_list[inode_num] != inode_num:
+                    relink.add(inode_num)
+                relink.add(self.prev_free_inode(inode_num))
+            relink.discard(-1)
+            links = [(x, self.next_free_inode(x)) for x in relink]
+
+        for inode_num, next_num in links:
+            if self.inode_list[inode_num] != next_num:
+                self.inode_list[inode_num] = next_num
+                self.ilist_dirty_slots.add(inode_num)
+
+        head = self.next_free_inode(-1)
+        if head != self.inode_list_head:
+            self.inode_list_head = head
+            self.ilist_dirty = True
+
+
     '''
         Function to fetch free inode number:
-            it checks if any free inode number exists, if yes then fetches that inode number
+            it checks if any free inode number exists, if yes then fetches lowest free inode number
+            of allocation group of calling thread (of next group having a free inode if own group is full)
     '''
     def fetch_inode(self):
 
-        if self.total_inodes_used < self.total_inodes :
-            inode_num = self.inode_list_head
-            self.inode_list_head = self.inode_list[self.inode_list_head]
-            self.inode_list[inode_num] = inode_num
+        for group in self.inode_groups.search_order(self.get_alloc_group()):
+            free = self.inode_free[group]
+            if len(free) == 0:
+                continue
+            with self.inode_groups.locks[group]:
+                if len(free) == 0:
+                    continue
+                inode_num = heapq.heappop(free)
+                self.inode_list[inode_num] = inode_num
+                self.ilist_dirty_slots.add(inode_num)
 
             self.active_inode_dict[inode_num] = Inode(inode_num)
+            self.active_inode_dict[inode_num].mark_dirty()
 
-            # fetching inode object data from file
-            # self.active_inode_dict[inode_num].read_inode_from_file()
-
-            # incrementing count in superblock
-            self.total_inodes_used += 1
+            # count in superblock, exact count is taken at sync
+            self.total_inodes_used = self.total_inodes - self.get_free_inode_count()
+            self.ilist_dirty = True
+            self.sblock_dirty = True
 
             return inode_num
-            #print(self.active_inode_dict.keys(), "\n")
-            #print(self.inode_list, "\n")
-            #print(self.inode_list_head)
-        else:
-            print("Max file limit exceeded !")
-            return -1
+
+        print("Max file limit exceeded !")
+        return -1
 
 
     '''
@@ -614,17 +1250,69 @@ class Superblock :
             this function accepts inode number and releases the inode object associated with it
     '''
     def release_inode(self, inode_num):
-        if inode_num in self.active_inode_dict.keys():
-            self.inode_list[inode_num] = self.inode_list_head
-            self.inode_list_head = inode_num
-            self.active_inode_dict.pop(inode_num, None)
+        if inode_num not in self.active_inode_dict:
+            print("Inode not in use !")
+            return
+
+        # entries of released directory, caller holds its write lock
+        self.child_dict.pop(inode_num, None)
+        self.dentry_names.pop(inode_num, None)
+        self.dentry_slots.pop(inode_num, None)
+        self.dirty_dentries.pop(inode_num, None)
+
+        # inode goes back to its own group, it is chained into free list on drive at sync
+        group = self.inode_groups.get_group(inode_num)
+        with self.inode_groups.locks[group]:
+            heapq.heappush(self.inode_free[group], inode_num)
+            self.inode_list[inode_num] = self.inode_list_size
+            self.ilist_dirty_slots.add(inode_num)
+        self.active_inode_dict.pop(inode_num, None)
+        Inode.dirty_inodes.discard(inode_num)
+
+        # count in superblock, exact count is taken at sync
+        self.total_inodes_used = self.total_inodes - self.get_free_inode_count()
+        self.ilist_dirty = True
+        self.sblock_dirty = True
+
+
+    '''
+        Function to fetch free index table, returns index table number, -1 if no table is free
+    '''
+    def fetch_index(self):
+        with self.alloc_lock:
+            if self.total_used_index < self.total_index:
+                index_num = self.index_list_head
+                self.index_list_head = self.index_list[index_num]
+                self.index_list[index_num] = index_num
+                self.idxlist_dirty_slots.add(index_num)
+
+                # incrementing count in superblock
+                self.total_used_index += 1
+                self.idxlist_dirty = True
+                self.sblock_dirty = True
+
+                return index_num
+            else:
+                print("No free index tables available !")
+                return -1
 
-            #print(self.active_inode_dict.keys(), "\n")
-            #print(self.inode_list, "\n")
-            #print(self.inode_list_head)
 
-        else:
-            print("Inode not in use !")
+    '''
+        Function to free index table 'index_num'
+    '''
+    def release_index(self, index_num):
+        with self.alloc_lock:
+            if self.index_list[index_num] == index_num:
+                self.index_list[index_num] = self.index_list_head
+                self.index_list_head = index_num
+                self.idxlist_dirty_slots.add(index_num)
+
+                # decrementing count in superblock
+                self.total_used_index -= 1
+                self.idxlist_dirty = True
+                self.sblock_dirty = True
+            else:
+                print("Index table not in use !")
 
 
     '''
@@ -639,49 +1327,273 @@ class Superblock :
 
 
     '''
-        Function to build active inode list 
+        Function to build active inode list, with 'lazy_inodes' no inode is read here,
+        every inode is read from drive when first accessed
     '''
-    def build_act_inode_dict(self):
-        # fetching all occupied inodes
-        active_inode_num = [x for x in range(self.inode_list_size) if self.inode_list[x] == x]
+    def build_act_inode_dict(self, inode_block=None):
+        self.active_inode_dict = InodeTable(self.is_inode_active, self.get_active_inode_numbers,
+                                            self.max_resident_inodes)
+        if self.lazy_inodes:
+            return
+
+        # fetching all occupied inodes,
+        # inodes are parsed from in-memory inode block when caller has already read it
+        active_inode_num = self.get_active_inode_numbers()
+        if inode_block is not None:
+            for num, node in zip(active_inode_num, Inode.decode_inodes(inode_block, active_inode_num)):
+                self.active_inode_dict[num] = node
+            return
 
-        # add root to active inode dict and children dictionary
         for num in active_inode_num:
             self.active_inode_dict[num] = Inode(num)
             self.active_inode_dict[num].read_inode_from_file()
 
 
+    '''
+        Functions to check whether inode 'inode_num' is in use and to list inode numbers in use,
+        both are taken from inode list
+    '''
+    def is_inode_active(self, inode_num):
+        return 0 <= inode_num < self.inode_list_size and self.inode_list[inode_num] == inode_num
+
+    def get_active_inode_numbers(self):
+        return [x for x in range(self.inode_list_size) if self.inode_list[x] == x]
+
+
     '''
         Function to build dentry objects
     '''
     def build_dentry_obj(self):
-        active_inode_num = list(self.active_inode_dict.keys())
+        self.child_dict = {}
+        self.dentry_names = {}
+        self.dentry_slots = {}
+        self.dirty_dentries = {}
+        self.path_cache = PathCache(self.path_cache_size)
 
-        # removing root as it wont be child of any other inode
-        active_inode_num.remove(0)
-        for num in active_inode_num:
-            self.child_dict[self.active_inode_dict[num].parent_inode][0].append(num)
-            self.child_dict[self.active_inode_dict[num].parent_inode][1].append(self.active_inode_dict[num].filename)
+        if self.feature_flags & self.feature_dir_blocks:
+            return
+
+        # drives without directory entry blocks : every inode is scanned,
+        # root is skipped as it wont be child of any other inode
+        for num, node in self.active_inode_dict.items():
+            if node.file_type == 0:
+                self.child_dict.setdefault(num, {})
+            if num != 0:
+                self.child_dict.setdefault(node.parent_inode, {})[node.filename] = num
+
+
+
+    '''
+        Function to store entries of every directory in its data blocks, called once for drives of format version 3
+        created before directory entries were stored, later mounts load directories on first access
+    '''
+    def convert_dentries(self):
+        self.feature_flags |= self.feature_dir_blocks
+        for dir_inode, children in self.child_dict.items():
+            self.dentry_names[dir_inode] = []
+            self.dentry_slots[dir_inode] = {}
+            self.active_inode_dict[dir_inode].size_in_bytes = 0
+            for name in children:
+                if self.add_dentry_slot(dir_inode, name) < 0:
+                    # keeping drive as it was, entries written so far are ignored without the feature flag
+                    self.feature_flags &= ~self.feature_dir_blocks
+                    self.build_dentry_obj()
+                    return
+
+        self.sblock_dirty = True
+        self.sync()
+
+
+
+    '''
+        Function to fetch children of directory 'dir_inode' (filename -> inode number),
+        entries of directory are read from its data blocks on first access
+    '''
+    def get_children(self, dir_inode):
+        children = self.child_dict.get(dir_inode)
+        if children is not None:
+            return children
+
+        node = self.active_inode_dict.get(dir_inode)
+        if node is None or node.file_type != 0:
+            return {}
+
+        # loaded by one thread, others wait for it; loading of other directories goes on meanwhile
+        lock = self.dentry_load_locks.get(dir_inode)
+        lock.acquire_write()
+        try:
+            children = self.child_dict.get(dir_inode)
+            if children is None:
+                children = self.load_children(node)
+        finally:
+            lock.release_write()
+        return children
+
+
+
+    '''
+        Function to read entries of directory inode 'node' into child_dict (called with load lock of directory held),
+        child_dict entry is set last, so that entry slots are in place once directory is seen as loaded
+    '''
+    def load_children(self, node):
+        dir_inode = node.inode_number
+        children = {}
+        if self.feature_flags & self.feature_dir_blocks:
+            # decoding entries of directory, entries fill first 'size_in_bytes' bytes of directory
+            entry_size = self.dentry_record.size
+            byte_stream = node.read_data(0, node.size_in_bytes)
+            names = []
+            for offset in range(0, len(byte_stream) - entry_size + 1, entry_size):
+                inode_num, file_type, name = self.dentry_record.unpack_from(byte_stream, offset)
+                name = name.rstrip(b'\0').decode('utf-8')
+                children[name] = inode_num
+                names.append(name)
+            self.dentry_names[dir_inode] = names
+            self.dentry_slots[dir_inode] = {name: slot for slot, name in enumerate(names)}
+
+        self.child_dict[dir_inode] = children
+        return children
+
+
+
+    '''
+        Function to give entry 'filename' a slot in data blocks of directory 'dir_inode', a block is allocated to
+        directory if its blocks are full, returns 1 on success, -1 otherwise
+    '''
+    def add_dentry_slot(self, dir_inode, filename):
+        names = self.dentry_names[dir_inode]
+        node = self.active_inode_dict[dir_inode]
+
+        size = (len(names) + 1)*self.dentry_record.size
+        if size > node.blocks_allocated*self.bytes_per_block:
+            if self.allocate_data_blocks(dir_inode, 1) < 0:
+                print('No space left for directory entry !')
+                return -1
+
+        self.dentry_slots[dir_inode][filename] = len(names)
+        self.dirty_dentries.setdefault(dir_inode, set()).add(len(names))
+        names.append(filename)
+        node.size_in_bytes = size
+        node.mark_dirty()
+        return 1
+
+
+
+    '''
+        Function to free slot of entry 'filename' in directory 'dir_inode', last entry is moved to freed slot
+    '''
+    def remove_dentry_slot(self, dir_inode, filename):
+        names = self.dentry_names[dir_inode]
+        slot = self.dentry_slots[dir_inode].pop(filename)
+        last = names.pop()
+        if slot < len(names):
+            names[slot] = last
+            self.dentry_slots[dir_inode][last] = slot
+            self.dirty_dentries.setdefault(dir_inode, set()).add(slot)
+
+        self.active_inode_dict[dir_inode].size_in_bytes = len(names)*self.dentry_record.size
+        self.active_inode_dict[dir_inode].mark_dirty()
 
 
 
     '''
-        Function to add inode to dentry object : child_dict
+        Function to add inode to dentry object : child_dict,
+        caller holds write lock of parent directory, directories are changed independently of each other
     '''
     def add_inode_to_dentry(self, inode_number):
 
-        self.child_dict[self.active_inode_dict[inode_number].parent_inode][0].append(inode_number)
-        self.child_dict[self.active_inode_dict[inode_number].parent_inode][1].append(self.active_inode_dict[inode_number].filename)
+        node = self.active_inode_dict[inode_number]
+        children = self.get_children(node.parent_inode)
+        if node.parent_inode in self.dentry_names:
+            if self.add_dentry_slot(node.parent_inode, node.filename) < 0:
+                return -1
+        children[node.filename] = inode_number
+
+        # paths cached as missing might exist now
+        self.path_cache.name_added()
+        return 1
 
 
 
     '''
-        Function to pop dentry object
+        Function to pop dentry object, caller holds write lock of parent directory
     '''
     def remove_inode_from_dentry(self, inode_number):
-        idx = self.child_dict[self.active_inode_dict[inode_number].parent_inode][0].index(inode_number)
-        self.child_dict[self.active_inode_dict[inode_number].parent_inode][0].pop(idx)
-        self.child_dict[self.active_inode_dict[inode_number].parent_inode][1].pop(idx)
+        node = self.active_inode_dict[inode_number]
+
+        # parent already released (rm -r) means subtree was dropped along with parent
+        path = self.get_path(inode_number) if node.parent_inode in self.active_inode_dict else None
+
+        # parent might not be loaded yet when child was found through path cache
+        if self.get_children(node.parent_inode).pop(node.filename, None) is not None:
+            if node.parent_inode in self.dentry_names:
+                self.remove_dentry_slot(node.parent_inode, node.filename)
+
+        # dropping cached paths of inode, and of everything below it if it is a directory,
+        # after name is gone so that a concurrent walk can not cache it again
+        if path is not None:
+            if node.file_type == 0:
+                self.path_cache.invalidate_subtree(path)
+            else:
+                self.path_cache.invalidate(path, inode_number)
+
+
+
+    '''
+        Function to fetch inode number of child 'filename' of directory 'dir_inode', -1 if there is no such child
+    '''
+    def get_child_inode(self, dir_inode, filename):
+        return self.get_children(dir_inode).get(filename, -1)
+
+
+
+    '''
+        Function to get absolute path of inode 'inode_num', path is built from parents on first use and cached
+    '''
+    def get_path(self, inode_num):
+        if inode_num == 0:
+            return '/'
+
+        path = self.path_cache.get_path(inode_num)
+        if path is None:
+            # walking up till root or till an ancestor with cached path
+            version = self.path_cache.get_version()
+            names = []
+            x = inode_num
+            base = ''
+            while x != 0:
+                base = self.path_cache.get_path(x)
+                if base is not None:
+                    break
+                names.append(self.active_inode_dict[x].filename)
+                x = self.active_inode_dict[x].parent_inode
+            if x == 0:
+                base = ''
+
+            path = base + '/' + '/'.join(reversed(names))
+            self.path_cache.store_path(inode_num, path, version)
+        return path
+
+
+
+    '''
+        Function to resolve path components 'names' starting from directory 'start_inode',
+        'path' is absolute form of the path, used as key of path cache
+    '''
+    def resolve_path(self, start_inode, path, names):
+        inode_num = self.path_cache.lookup(path)
+        if inode_num is not None:
+            return inode_num
+
+        version = self.path_cache.get_version()
+        inode_num = start_inode
+        for name in names:
+            inode_num = self.get_child_inode(inode_num, name)
+            if inode_num < 0:
+                break
+
+        self.path_cache.store(path, inode_num, version)
+        return inode_num
 
 
 
@@ -689,14 +1601,8 @@ class Superblock :
         Function to get filenamses present in current directory
     '''
     def get_cwd_filenames(self):
-        filenames = []
-        cwd_inodes = self.child_dict[self.cur_working_dir_num][0]
-        cwd_filenames = self.child_dict[self.cur_working_dir_num][1]
-
-        for i in range(len(cwd_inodes)):
-            if self.active_inode_dict[cwd_inodes[i]].file_type == 1:
-                filenames.append(cwd_filenames[i])
-        return filenames
+        return [name for name, num in self.get_children(self.cur_working_dir_num).items()
+                if self.active_inode_dict[num].file_type == 1]
 
 
 
@@ -704,14 +1610,8 @@ class Superblock :
         Function to get dictionaries under cwd
     '''
     def get_cwd_directories(self):
-        directories = []
-        cwd_inodes = self.child_dict[self.cur_working_dir_num][0]
-        cwd_filenames = self.child_dict[self.cur_working_dir_num][1]
-
-        for i in range(len(cwd_inodes)):
-            if self.active_inode_dict[cwd_inodes[i]].file_type == 0:
-                directories.append(cwd_filenames[i])
-        return directories
+        return [name for name, num in self.get_children(self.cur_working_dir_num).items()
+                if self.active_inode_dict[num].file_type == 0]
 
 
     '''
@@ -719,20 +1619,14 @@ class Superblock :
     '''
     def get_cwd_child_inodes(self):
 
-        return self.child_dict[self.cur_working_dir_num][0]
+        return list(self.get_children(self.cur_working_dir_num).values())
 
 
     '''
         Function to fetch inode number based on filename
     '''
     def get_file_inode_number(self, filename):
-        cwd_filenames = self.child_dict[self.cur_working_dir_num][1]
-
-        if filename in cwd_filenames:
-            idx = cwd_filenames.index(filename)
-            return self.child_dict[self.cur_working_dir_num][0][idx]
-        else:
-            return -1
+        return self.get_child_inode(self.cur_working_dir_num, filename)
 
 
 
@@ -762,16 +1656,7 @@ class Superblock :
         if '' in path_mod or len(path_mod) == 0:
             return -1
 
-        last_dir_inode = 0
-        while len(path_mod) != 0:
-            try:
-                idx = self.child_dict[last_dir_inode][1].index(path_mod[0])
-                last_dir_inode = self.child_dict[last_dir_inode][0][idx]
-                path_mod.pop(0)
-            except ValueError:
-                return -1
-
-        return last_dir_inode
+        return self.resolve_path(0, '/' + '/'.join(path_mod), path_mod)
 
 
     '''
@@ -801,16 +1686,8 @@ class Superblock :
         if '' in path_mod or len(path_mod) == 0:
             return -1
 
-        last_dir_inode = self.cur_working_dir_num
-        while len(path_mod) != 0:
-            try:
-                idx = self.child_dict[last_dir_inode][1].index(path_mod[0])
-                last_dir_inode = self.child_dict[last_dir_inode][0][idx]
-                path_mod.pop(0)
-            except ValueError:
-                return -1
-
-        return last_dir_inode
+        cwd_path = self.get_path(self.cur_working_dir_num).rstrip('/')
+        return self.resolve_path(self.cur_working_dir_num, cwd_path + '/' + '/'.join(path_mod), path_mod)
 
 
 
@@ -819,19 +1696,14 @@ class Superblock :
     '''
     def set_cwd(self, inode_num):
         self.cur_working_dir_num = inode_num
-
-        cwd_path = []
-
-        while inode_num != 0:
-            cwd_path.insert(0, self.active_inode_dict[inode_num].filename)
-            inode_num = self.active_inode_dict[inode_num].parent_inode
-
-        self.cur_working_dir = '/' + '/'.join(cwd_path)
+        self.cur_working_dir = self.get_path(inode_num)
 
     '''
-        Function to get current working directory path
+        Function to get current working directory path, path changes if a parent directory is moved
     '''
     def get_cwd(self):
+        if self.path_cache is not None:
+            self.cur_working_dir = self.get_path(self.cur_working_dir_num)
         return self.cur_working_dir
 
     '''
@@ -841,37 +1713,193 @@ class Superblock :
     '''
 
     '''
-        Function to fetch 'n' free datablocks out of data block list
+        Function to fetch 'n' free datablocks out of data block list,
+        blocks are taken as contiguous extents where possible so that file data can be read/written
+        with one call per extent; blocks come from allocation group of calling thread, rest of them
+        from following groups once it is full
     '''
     def fetch_data_blocks(self, n):
         data_blocks = []
-        if self.total_used_blocks + n < self.total_blocks:
-            self.total_used_blocks += n
-
-            # capturing free data blocks from data block list
-            while n > 0:
-                data_blocks.append(self.block_list_head)
-                self.block_list_head = self.block_list[self.block_list_head]
-                n -= 1
-        else:
+        if n > self.block_bitmap.get_free_count():
             print("No free data blocks available !")
+            return data_blocks
+
+        # capturing n free data blocks from block bitmap, group by group
+        for group in self.block_groups.search_order(self.get_alloc_group()):
+            if len(data_blocks) == n:
+                break
+            if self.block_bitmap.get_free_count(group) == 0:
+                continue
+            with self.block_groups.locks[group]:
+                take = min(n - len(data_blocks), self.block_bitmap.get_free_count(group))
+                for start, count in self.block_bitmap.allocate_extents(take, group):
+                    data_blocks.extend(range(start, start + count))
+
+        # other threads took free blocks meanwhile
+        if len(data_blocks) < n:
+            self.return_data_blocks(data_blocks)
+            print("No free data blocks available !")
+            return []
 
+        self.total_used_blocks = self.block_bitmap.used_count
+        self.dblist_dirty = True
+        self.sblock_dirty = True
         return data_blocks
 
 
     '''
-        Function to release requested data_blocks[]
+        Function to allocate 'n' more data blocks to inode 'inode_num' (after blocks it already has),
+        index tables are fetched for blocks beyond direct pointers, returns 1 on success, -1 otherwise
+    '''
+    def allocate_data_blocks(self, inode_num, n):
+        blocks_allocated = self.active_inode_dict[inode_num].blocks_allocated
+        if blocks_allocated + n > Inode.max_blocks:
+            print("File too large, max file size is " + str(Inode.max_blocks*self.bytes_per_block) + " bytes !")
+            return -1
+
+        # blocks and index tables are fetched together, so that a failed allocation leaves no trace
+        data_blocks = []
+        index_nums = []
+        if n > 0:
+            data_blocks = self.fetch_data_blocks(n)
+            if len(data_blocks) == 0:
+                return -1
+
+        # fetching index tables needed beyond tables already in use
+        for i in range(Inode.get_index_count(blocks_allocated + n) - Inode.get_index_count(blocks_allocated)):
+            index_num = self.fetch_index()
+            if index_num < 0:
+                for x in index_nums:
+                    self.release_index(x)
+                self.return_data_blocks(data_blocks)
+                return -1
+            index_nums.append(index_num)
+
+        self.active_inode_dict[inode_num].append_block_pointers(data_blocks, index_nums)
+        self.active_inode_dict[inode_num].mark_dirty()
+        return 1
+
+
+    '''
+        Function to release data blocks and index tables of inode 'inode_num'
     '''
     def release_data_blocks(self, inode_num):
-        data_blocks = self.active_inode_dict[inode_num].direct_block_pointers
-        data_blocks = [x for x in data_blocks if x != 0]
-        self.active_inode_dict[inode_num].blocks_allocated = 0
-        self.active_inode_dict[inode_num].direct_block_pointers = [0 for x in range(16)]
-
-        while len(data_blocks) != 0:
-            tmp_block = data_blocks.pop(0)
-            self.block_list[tmp_block] = self.block_list_head
-            self.block_list_head = tmp_block
+        data_blocks = [x for x in self.active_inode_dict[inode_num].get_data_blocks() if x != 0]
+        for index_num in self.active_inode_dict[inode_num].get_index_tables():
+            self.release_index(index_num)
+        self.active_inode_dict[inode_num].set_block_pointers([], [])
+        self.active_inode_dict[inode_num].mark_dirty()
+
+        self.free_data_blocks(data_blocks)
+
+
+    '''
+        Function to return data_blocks[] to block bitmap, blocks shared with other files only lose one reference
+    '''
+    def free_data_blocks(self, data_blocks):
+        if self.share_table is not None:
+            with self.alloc_lock:
+                data_blocks = self.share_table.drop_refs(data_blocks)
+
+        self.return_data_blocks(data_blocks)
+
+
+    '''
+        Function to return data_blocks[] no file references to block bitmap
+    '''
+    def return_data_blocks(self, data_blocks):
+        if len(data_blocks) == 0:
+            return
+
+        # released blocks might be handed to another file, dropping their cached data first
+        self.block_cache.invalidate_blocks(data_blocks)
+        for group, blocks in self.block_groups.split(data_blocks).items():
+            with self.block_groups.locks[group]:
+                self.block_bitmap.release(blocks)
+        self.total_used_blocks = self.block_bitmap.used_count
+        self.dblist_dirty = True
+        self.sblock_dirty = True
+
+
+    '''
+        Function to enable sharing of data blocks on drive, share table is placed in a contiguous run
+        of free data blocks, returns 1 on success, -1 otherwise
+    '''
+    def enable_block_sharing(self):
+        with self.alloc_lock:
+            if self.share_table is not None:
+                return 1
+            if self.format_version < 3:
+                print('Drive of format version ' + str(self.format_version) + ' does not support cloning !')
+                return -1
+
+            # table might span groups, run is searched in entire bitmap
+            table_blocks = -(-ShareTable.get_table_size(self.total_blocks) // self.bytes_per_block)
+            self.block_groups.acquire_all()
+            try:
+                start = self.block_bitmap.allocate_run(table_blocks)
+            finally:
+                self.block_groups.release_all()
+            if start < 0:
+                print('No contiguous free space for share table !')
+                return -1
+            self.total_used_blocks = self.block_bitmap.used_count
+            self.dblist_dirty = True
+
+            # entire table is written by next sync, blocks of table might hold data of a released file
+            self.share_table = ShareTable(self.total_blocks)
+            self.share_table.dirty_words = set(range(-(-self.total_blocks // ShareTable.word_entries)))
+            self.share_table_block = start
+            self.feature_flags |= self.feature_shared_blocks
+            self.sblock_dirty = True
+            return 1
+
+
+    '''
+        Function to make inode 'dest_inode' share data blocks of inode 'source_inode' (clone),
+        only index tables of clone are written, data is not copied; returns 1 on success, -1 otherwise
+    '''
+    def clone_data_blocks(self, source_inode, dest_inode):
+        with self.alloc_lock:
+            if self.enable_block_sharing() < 0:
+                return -1
+
+            data_blocks = list(self.active_inode_dict[source_inode].get_data_blocks())
+
+            # clone needs index tables of its own, they point to the same data blocks
+            index_nums = []
+            for i in range(len(self.active_inode_dict[source_inode].get_index_tables())):
+                index_num = self.fetch_index()
+                if index_num < 0:
+                    for x in index_nums:
+                        self.release_index(x)
+                    return -1
+                index_nums.append(index_num)
+
+            if not self.share_table.add_refs(data_blocks):
+                print('File is shared by too many clones !')
+                for x in index_nums:
+                    self.release_index(x)
+                return -1
+
+            self.active_inode_dict[dest_inode].set_block_pointers(data_blocks, index_nums)
+            self.active_inode_dict[dest_inode].mark_dirty()
+            return 1
+
+
+    '''
+        Function to fetch hit/miss counters of data block cache, of path cache (prefixed with 'path_')
+        and of inode table (prefixed with 'inode_')
+    '''
+    def get_cache_stats(self):
+        if self.block_cache is None:
+            return {}
+        stats = self.block_cache.get_stats()
+        for key, value in self.path_cache.get_stats().items():
+            stats['path_' + key] = value
+        for key, value in self.active_inode_dict.get_stats().items():
+            stats['inode_' + key] = value
+        return stats
 
 
     '''
@@ -0,0 +1,126 @@
+'''
+    Tests of copy-on-write clones (cp -c) : clone shares data blocks of source through share table,
+    either file stays readable once other one is removed, shared blocks are freed only after both are removed
+'''
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import vfs_core_interface as vfs
+
+
+class CloneTest(unittest.TestCase):
+
+    data = random.Random(17).randbytes(5*4096 + 100)    # 6 data blocks
+    blocks = 6
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp_dir.name)
+        with open('a', 'wb') as fp:
+            fp.write(self.data)
+        os.mkdir('out')
+        with contextlib.redirect_stdout(io.StringIO()):
+            vfs.init_filesystem()
+            vfs.create_vfs(False, 4096, 1024, 64)
+            vfs.mount_vfs()
+            vfs.set_cur_usr('admin')
+            vfs.put_cmd('a')
+            vfs.mkdir_cmd(['d'])
+        self.free_before_clone = self.get_free_blocks()
+
+    def tearDown(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            vfs.exit_cmd()
+        os.chdir(self.cwd)
+        self.tmp_dir.cleanup()
+
+    def remount(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            vfs.exit_cmd()
+            vfs.init_filesystem()
+            vfs.mount_vfs()
+            vfs.set_cur_usr('admin')
+
+    def get_free_blocks(self):
+        return vfs.file_system.block_bitmap.get_free_count()
+
+    def read_file(self, path):
+        os.chdir('out')
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                vfs.get_cmd(path)
+            with open(os.path.basename(path), 'rb') as fp:
+                data = fp.read()
+            os.remove(os.path.basename(path))
+        finally:
+            os.chdir(self.tmp_dir.name)
+        return data
+
+    def clone(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            vfs.cp_cmd('a', 'd', True)
+        self.assertEqual(vfs.file_system.share_table.shared_count, self.blocks)
+        self.assertEqual(self.read_file('d/a'), self.data)
+
+        # only share table takes new blocks, data blocks are not copied
+        self.free_after_clone = self.get_free_blocks()
+        self.assertLess(self.free_before_clone - self.free_after_clone, self.blocks)
+
+    def check_remove_one_then_other(self, first, second, remount=False):
+        self.clone()
+        if remount:
+            self.remount()
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            vfs.rm_cmd(first)
+        self.assertEqual(self.read_file(second), self.data)
+        self.assertEqual(self.get_free_blocks(), self.free_after_clone)
+        self.assertEqual(vfs.file_system.share_table.shared_count, 0)
+        if remount:
+            self.remount()
+            self.assertEqual(self.read_file(second), self.data)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            vfs.rm_cmd(second)
+        self.assertEqual(self.get_free_blocks(), self.free_after_clone + self.blocks)
+        if remount:
+            self.remount()
+            self.assertEqual(self.get_free_blocks(), self.free_after_clone + self.blocks)
+
+    def test_remove_source_first(self):
+        self.check_remove_one_then_other('a', 'd/a')
+
+    def test_remove_clone_first(self):
+        self.check_remove_one_then_other('d/a', 'a')
+
+    def test_share_counts_survive_remount(self):
+        self.check_remove_one_then_other('a', 'd/a', True)
+
+    def test_clone_of_clone(self):
+        self.clone()
+        with contextlib.redirect_stdout(io.StringIO()):
+            vfs.mkdir_cmd(['e'])
+            vfs.cp_cmd('d/a', 'e', True)
+        free_blocks = self.get_free_blocks()
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            vfs.rm_cmd('a')
+            vfs.rm_cmd('d/a')
+        self.assertEqual(self.read_file('e/a'), self.data)
+        self.assertEqual(self.get_free_blocks(), free_blocks)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            vfs.rm_cmd('e/a')
+        self.assertEqual(self.get_free_blocks(), free_blocks + self.blocks)
+
+
+if __name__ == '__main__':
+    unittest.main()
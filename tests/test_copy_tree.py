@@ -0,0 +1,152 @@
+'''
+    Tests of recursive directory copy (cp -r) : copied tree has shape and file data of source tree,
+    tree that can not be copied entirely leaves no inodes or blocks behind
+'''
+import contextlib
+import hashlib
+import io
+import os
+import random
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import vfs_core_interface as vfs
+
+
+class CopyTreeTest(unittest.TestCase):
+
+    # source tree, directories map to their contents, files to their size
+    source = {'f1': 9000, 'h': 0, 'e': {'f2': 4096, 'g': {}, 'k': {'f3': 70000}}}
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp_dir.name)
+        os.mkdir('src')
+        os.mkdir('out')
+        self.data = {}
+        with contextlib.redirect_stdout(io.StringIO()):
+            vfs.init_filesystem()
+            vfs.create_vfs(False, 4096, 1024, 64)
+            vfs.mount_vfs()
+            vfs.set_cur_usr('admin')
+            vfs.mkdir_cmd(['d', 't'])
+            self.make_tree('d', self.source, random.Random(18))
+            # destination already holds an entry, so it has its directory block before the copy
+            vfs.cd_cmd('t')
+            vfs.touch_cmd(['x'])
+            vfs.cd_cmd('/')
+
+    def tearDown(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            vfs.exit_cmd()
+        os.chdir(self.cwd)
+        self.tmp_dir.cleanup()
+
+    def make_tree(self, path, tree, rand):
+        # mkdir, touch and put work in current directory
+        for name, item in tree.items():
+            vfs.cd_cmd('/' + path)
+            if isinstance(item, dict):
+                vfs.mkdir_cmd([name])
+                self.make_tree(path + '/' + name, item, rand)
+                continue
+            ext_path = os.path.join(self.tmp_dir.name, 'src', name)
+            with open(ext_path, 'wb') as fp:
+                fp.write(rand.randbytes(item))
+            vfs.put_cmd(ext_path)
+            self.data[name] = hashlib.sha1(open(ext_path, 'rb').read()).hexdigest()
+        vfs.cd_cmd('/')
+
+    def read_tree(self, path):
+        # directory contents (or digest of file data) of tree at 'path', as in source tree
+        vfs.cd_cmd('/' + path)
+        names = vfs.ls_cmd()
+        vfs.cd_cmd('/')
+        tree = {}
+        for name in names:
+            if name.startswith('['):
+                tree[name[1:-1]] = self.read_tree(path + '/' + name[1:-1])
+            else:
+                tree[name] = self.read_file(path + '/' + name)
+        return tree
+
+    def read_file(self, path):
+        os.chdir('out')
+        try:
+            vfs.get_cmd(path)
+            with open(os.path.basename(path), 'rb') as fp:
+                data = hashlib.sha1(fp.read()).hexdigest()
+            os.remove(os.path.basename(path))
+        finally:
+            os.chdir(self.tmp_dir.name)
+        return data
+
+    def expected_tree(self, tree):
+        return {name: self.expected_tree(item) if isinstance(item, dict) else self.data[name]
+                for name, item in tree.items()}
+
+    def get_free_counts(self):
+        return vfs.file_system.block_bitmap.get_free_count(), vfs.file_system.get_free_inode_count()
+
+    def check_copy(self, clone):
+        free_blocks, free_inodes = self.get_free_counts()
+        with contextlib.redirect_stdout(io.StringIO()):
+            vfs.cp_r_cmd('d', 't', clone)
+            self.assertEqual(self.read_tree('t/d'), self.expected_tree(self.source))
+            self.assertEqual(self.read_tree('d'), self.expected_tree(self.source))
+
+            vfs.exit_cmd()
+            vfs.init_filesystem()
+            vfs.mount_vfs()
+            vfs.set_cur_usr('admin')
+            self.assertEqual(self.read_tree('t/d'), self.expected_tree(self.source))
+
+        # one inode per file and directory of tree
+        self.assertEqual(vfs.file_system.get_free_inode_count(), free_inodes - 8)
+        return free_blocks - vfs.file_system.block_bitmap.get_free_count()
+
+    def test_copy_has_shape_and_data_of_source(self):
+        # data blocks of files, and a block of entries for every directory holding any (d, e, k)
+        self.assertEqual(self.check_copy(False), 3 + 1 + 18 + 3)
+
+    def test_clone_has_shape_and_data_of_source(self):
+        # no data blocks are copied, only blocks of directory entries and share table are taken
+        self.assertLess(self.check_copy(True), 3 + 1 + 18)
+
+    def check_rollback(self, patch):
+        free_counts = self.get_free_counts()
+        with patch, contextlib.redirect_stdout(io.StringIO()):
+            vfs.cp_r_cmd('d', 't')
+            vfs.cd_cmd('t')
+            self.assertEqual(vfs.ls_cmd(), ['x'])
+            vfs.cd_cmd('/')
+        self.assertEqual(self.get_free_counts(), free_counts)
+
+    def test_failed_inode_fetch_drops_partial_copy(self):
+        fetch_inode = vfs.file_system.fetch_inode
+        results = [fetch_inode, fetch_inode, fetch_inode, lambda: -1]
+        self.check_rollback(mock.patch.object(vfs.file_system, 'fetch_inode',
+                                              side_effect=lambda: results.pop(0)() if results else -1))
+
+    def test_failed_block_allocation_drops_partial_copy(self):
+        allocate = vfs.file_system.allocate_data_blocks
+        results = [allocate, lambda *args: -1]
+        self.check_rollback(mock.patch.object(vfs.file_system, 'allocate_data_blocks',
+                                              side_effect=lambda *args: results.pop(0)(*args)))
+
+    def test_copy_into_itself_is_refused(self):
+        out = io.StringIO()
+        free_counts = self.get_free_counts()
+        with contextlib.redirect_stdout(out):
+            vfs.cp_r_cmd('d', 'd/e')
+        self.assertIn('into itself', out.getvalue())
+        self.assertEqual(self.get_free_counts(), free_counts)
+
+
+if __name__ == '__main__':
+    unittest.main()
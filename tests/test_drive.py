@@ -0,0 +1,54 @@
+'''
+    Tests of drive device used by mount : read/write calls, or memory mapped drive (mount -m)
+'''
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import vfs_core_interface as vfs
+import block_device
+from block_device import BlockDevice, MappedBlockDevice
+
+
+class DriveDeviceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp_dir.name)
+        with contextlib.redirect_stdout(io.StringIO()):
+            vfs.init_filesystem()
+            vfs.create_vfs(False, 4096, 1024, 64)
+
+    def tearDown(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            vfs.exit_cmd()
+        os.chdir(self.cwd)
+        self.tmp_dir.cleanup()
+
+    def test_mount_after_create_maps_drive(self):
+        self.assertEqual(vfs.mount_vfs(True), 1)
+        self.assertIsInstance(vfs.file_system.drive, MappedBlockDevice)
+
+    def test_mount_after_create_uses_read_write_calls(self):
+        self.assertEqual(vfs.mount_vfs(), 1)
+        self.assertIs(type(vfs.file_system.drive), BlockDevice)
+
+    def test_failed_mapping_falls_back_to_read_write_calls(self):
+        out = io.StringIO()
+        with mock.patch.object(block_device.mmap, 'mmap', side_effect=OSError(12, 'Cannot allocate memory')):
+            with contextlib.redirect_stdout(out):
+                self.assertEqual(vfs.mount_vfs(True), 1)
+        self.assertIn('Cannot allocate memory', out.getvalue())
+        self.assertIs(type(vfs.file_system.drive), BlockDevice)
+        self.assertEqual(vfs.ls_cmd(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+'''
+    Tests of filename length limit : names are stored UTF-8 encoded in 64 bytes, so that
+    names longer than 64 bytes are refused instead of being cut in middle of a character
+'''
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import vfs_core_interface as vfs
+
+
+class FilenameLengthTest(unittest.TestCase):
+
+    long_name = 'a' + 'é'*40       # 41 characters, 81 bytes
+    full_name = 'é'*32             # 32 characters, 64 bytes
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp_dir.name)
+        with contextlib.redirect_stdout(io.StringIO()):
+            vfs.init_filesystem()
+            vfs.create_vfs(False, 4096, 1024, 64)
+            vfs.mount_vfs()
+            vfs.set_cur_usr('admin')
+
+    def tearDown(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            vfs.exit_cmd()
+        os.chdir(self.cwd)
+        self.tmp_dir.cleanup()
+
+    def remount(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            vfs.exit_cmd()
+            vfs.init_filesystem()
+            vfs.mount_vfs()
+            vfs.set_cur_usr('admin')
+
+    def test_long_names_are_refused(self):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            vfs.touch_cmd([self.long_name])
+            vfs.mkdir_cmd([self.long_name])
+            vfs.touch_cmd(['f'])
+            vfs.mv_cmd('f', self.long_name)
+        self.assertEqual(out.getvalue().count('64 bytes'), 3)
+        self.assertEqual(sorted(vfs.ls_cmd()), ['f'])
+
+    def test_long_put_is_refused(self):
+        ext_path = os.path.join(self.tmp_dir.name, self.long_name)
+        with open(ext_path, 'wb') as fp:
+            fp.write(b'data')
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            vfs.put_cmd(ext_path)
+        self.assertIn('64 bytes', out.getvalue())
+        self.assertEqual(vfs.ls_cmd(), [])
+
+    def test_names_of_64_bytes_survive_remount(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            vfs.touch_cmd([self.full_name])
+            vfs.mkdir_cmd(['d' + self.full_name[1:]])
+            vfs.sync_vfs()
+        self.remount()
+        self.assertEqual(sorted(vfs.ls_cmd()), sorted([self.full_name, '[d' + self.full_name[1:] + ']']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+'''
+    Tests of on-disk format : files put on drive are read back byte for byte after remount, for drives of
+    format version 3 (configurable geometry) and version 2 (fixed geometry), and version 1 drives
+    (linked free block list) are converted to block bitmap on mount
+'''
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import vfs_core_interface as vfs
+from superblock import Superblock
+
+
+class FormatTest(unittest.TestCase):
+
+    format_version_offset = Superblock.ext_fields_offset - 2    # 2 byte format version, 0 on version 1 drives
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp_dir.name)
+        os.mkdir('src')
+        os.mkdir('out')
+        self.files = {}
+
+    def tearDown(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            vfs.exit_cmd()
+        os.chdir(self.cwd)
+        self.tmp_dir.cleanup()
+
+    def create_v2_drive(self):
+        # current code formats version 3 only, version 2 drive has fixed geometry and no feature flags
+        set_geometry = Superblock.set_geometry
+        def v2_geometry(fs, format_version, *args):
+            set_geometry(fs, 2, 4096, 16384, 1024, 512)
+        with mock.patch.object(Superblock, 'set_geometry', v2_geometry), \
+             mock.patch.object(Superblock, 'feature_dir_blocks', 0):
+            self.assertEqual(vfs.create_vfs(), 0)
+
+    def mount(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            vfs.init_filesystem()
+            self.assertEqual(vfs.mount_vfs(), 1)
+            vfs.set_cur_usr('admin')
+
+    def remount(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            vfs.exit_cmd()
+        self.mount()
+
+    def put_files(self, sizes):
+        rand = random.Random(len(sizes))
+        with contextlib.redirect_stdout(io.StringIO()):
+            for name, size in sizes:
+                self.files[name] = rand.randbytes(size)
+                with open(os.path.join('src', name), 'wb') as fp:
+                    fp.write(self.files[name])
+                vfs.put_cmd(os.path.join('src', name))
+
+    def assert_files_read_back(self):
+        self.assertEqual(sorted(vfs.ls_cmd()), sorted(self.files))
+        os.chdir('out')
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                for name in self.files:
+                    vfs.get_cmd(name)
+            for name, data in self.files.items():
+                with open(name, 'rb') as fp:
+                    self.assertEqual(fp.read(), data, name)
+                os.remove(name)
+        finally:
+            os.chdir(self.tmp_dir.name)
+
+    def test_v3_files_survive_remount(self):
+        # 512 byte blocks, largest file needs index tables beyond direct pointers
+        with contextlib.redirect_stdout(io.StringIO()):
+            vfs.init_filesystem()
+            self.assertEqual(vfs.create_vfs(False, 512, 4096, 64), 0)
+        self.mount()
+        self.put_files([('empty', 0), ('one', 1), ('block', 512), ('odd', 5000), ('large', 300000)])
+        self.assert_files_read_back()
+
+        self.remount()
+        self.assertEqual(vfs.file_system.format_version, 3)
+        self.assertEqual(vfs.file_system.bytes_per_block, 512)
+        self.assert_files_read_back()
+
+    def test_v2_files_survive_remount(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            vfs.init_filesystem()
+            self.create_v2_drive()
+        self.mount()
+        self.assertEqual(vfs.file_system.format_version, 2)
+        self.put_files([('empty', 0), ('one', 1), ('block', 4096), ('odd', 50000), ('large', 200000)])
+        self.assert_files_read_back()
+
+        self.remount()
+        self.assertEqual(vfs.file_system.format_version, 2)
+        self.assert_files_read_back()
+
+    def test_v1_drive_is_converted_on_mount(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            vfs.init_filesystem()
+            self.create_v2_drive()
+        self.mount()
+        # version 1 files never used index tables
+        self.put_files([('one', 1), ('block', 4096), ('odd', 50000)])
+        used_blocks = vfs.file_system.block_bitmap.used_count
+        with contextlib.redirect_stdout(io.StringIO()):
+            vfs.exit_cmd()
+
+        # stamping drive as version 1, free block list region is not read on mount
+        with open(Superblock.drive_filename, 'r+b') as fp:
+            fp.seek(self.format_version_offset)
+            fp.write(bytes(2))
+
+        self.mount()
+        self.assertEqual(vfs.file_system.format_version, 2)
+        self.assertEqual(vfs.file_system.block_bitmap.used_count, used_blocks)
+        self.assert_files_read_back()
+
+        self.remount()
+        self.assertEqual(vfs.file_system.format_version, 2)
+        self.assertEqual(vfs.file_system.block_bitmap.used_count, used_blocks)
+        self.assert_files_read_back()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,179 @@
+'''
+    Tests of free block and free inode counts : counts kept per allocation group match block bitmap and
+    inode list after files are removed (rm, rm -r), also when files were allocated by several threads,
+    and all blocks and inodes of removed files are free again, before and after remount
+'''
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import vfs_core_interface as vfs
+
+
+class FreeCountTest(unittest.TestCase):
+
+    sizes = [0, 1, 4096, 5000, 70000, 300000]
+    thread_count = 4
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp_dir.name)
+        os.mkdir('src')
+        rand = random.Random(25)
+        self.ext_paths = []
+        for i, size in enumerate(self.sizes):
+            self.ext_paths.append(os.path.join(self.tmp_dir.name, 'src', 'f%d' % i))
+            with open(self.ext_paths[-1], 'wb') as fp:
+                fp.write(rand.randbytes(size))
+
+        # 8 allocation groups of 256 blocks and of 32 inodes
+        with contextlib.redirect_stdout(io.StringIO()):
+            vfs.init_filesystem()
+            vfs.create_vfs(False, 4096, 2048, 256)
+            vfs.mount_vfs()
+            vfs.set_cur_usr('admin')
+            # root directory takes block of its entries with first entry
+            vfs.touch_cmd(['keep'])
+        self.initial_counts = self.get_free_counts()
+
+    def tearDown(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            vfs.exit_cmd()
+        os.chdir(self.cwd)
+        self.tmp_dir.cleanup()
+
+    def remount(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            vfs.exit_cmd()
+            vfs.init_filesystem()
+            vfs.mount_vfs()
+            vfs.set_cur_usr('admin')
+
+    def get_free_counts(self):
+        return vfs.file_system.block_bitmap.get_free_count(), vfs.file_system.get_free_inode_count()
+
+    def assert_counts_match(self):
+        fs = vfs.file_system
+        bitmap = fs.block_bitmap
+        for group in range(bitmap.group_count):
+            start, end = bitmap.get_group_range(group)
+            free = sum(1 for x in range(start, end) if not bitmap.is_used(x))
+            self.assertEqual(bitmap.get_free_count(group), free, 'block group %d' % group)
+        self.assertEqual(bitmap.get_free_count(), sum(1 for x in range(fs.total_blocks) if not bitmap.is_used(x)))
+
+        free_inodes = [x for x in range(fs.total_inodes) if fs.inode_list[x] != x]
+        self.assertEqual(fs.get_free_inode_count(), len(free_inodes))
+        self.assertEqual(sorted(x for group in fs.inode_free for x in group), free_inodes)
+        for group, free in enumerate(fs.inode_free):
+            start, end = fs.inode_groups.get_range(group)
+            self.assertTrue(all(start <= x < end for x in free), 'inode group %d' % group)
+
+    def put_files(self, path):
+        vfs.cd_cmd(path)
+        for ext_path in self.ext_paths:
+            vfs.put_cmd(ext_path)
+        vfs.mkdir_cmd(['sub'])
+        vfs.cd_cmd(path + '/sub')
+        for ext_path in self.ext_paths[::2]:
+            vfs.put_cmd(ext_path)
+        vfs.cd_cmd('/')
+
+    def put_files_from_threads(self, path):
+        # every thread allocates from its own group, files of thread 'i' go to directory 'path/t<i>'
+        vfs.cd_cmd(path)
+        vfs.mkdir_cmd(['t%d' % i for i in range(self.thread_count)])
+        vfs.cd_cmd('/')
+        errors = []
+        def worker(i):
+            try:
+                vfs.set_cur_usr('admin')
+                self.put_files(path + '/t%d' % i)
+            except Exception as e:
+                errors.append(e)
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(self.thread_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+        # blocks and inodes of threads are spread over groups
+        bitmap = vfs.file_system.block_bitmap
+        self.assertGreater(sum(1 for group in range(bitmap.group_count) if bitmap.group_used[group] > 0), 1)
+        self.assertGreater(sum(1 for free in vfs.file_system.inode_free
+                               if len(free) < vfs.file_system.inode_groups.group_size), 1)
+
+    def test_rm_frees_blocks_and_inodes(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.put_files('/')
+            self.assert_counts_match()
+            self.assertLess(self.get_free_counts()[0], self.initial_counts[0])
+
+            for i in range(len(self.ext_paths)):
+                vfs.rm_cmd('f%d' % i)
+            for i in range(0, len(self.ext_paths), 2):
+                vfs.rm_cmd('sub/f%d' % i)
+            vfs.rm_cmd('sub')
+        self.assert_counts_match()
+        # directory 'sub' had block of its entries
+        self.assertEqual(self.get_free_counts(), self.initial_counts)
+
+        self.remount()
+        self.assert_counts_match()
+        self.assertEqual(self.get_free_counts(), self.initial_counts)
+
+    def test_rm_r_frees_tree(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            vfs.mkdir_cmd(['d'])
+            self.put_files('/d')
+            self.put_files_from_threads('/d')
+            self.assert_counts_match()
+
+            self.remount()
+            self.assert_counts_match()
+            vfs.rm_r_cmd('d')
+        self.assert_counts_match()
+        self.assertEqual(self.get_free_counts(), self.initial_counts)
+
+        self.remount()
+        self.assert_counts_match()
+        self.assertEqual(self.get_free_counts(), self.initial_counts)
+
+    def test_rm_from_other_threads(self):
+        # files allocated in groups of some threads are removed by other threads
+        with contextlib.redirect_stdout(io.StringIO()):
+            vfs.mkdir_cmd(['d'])
+            self.put_files_from_threads('/d')
+
+            errors = []
+            def worker(i):
+                try:
+                    vfs.set_cur_usr('admin')
+                    vfs.rm_r_cmd('/d/t%d' % ((i + 1) % self.thread_count))
+                except Exception as e:
+                    errors.append(e)
+            threads = [threading.Thread(target=worker, args=(i,)) for i in range(self.thread_count)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(errors, [])
+            vfs.rm_cmd('d')
+        self.assert_counts_match()
+        self.assertEqual(self.get_free_counts(), self.initial_counts)
+
+        self.remount()
+        self.assert_counts_match()
+        self.assertEqual(self.get_free_counts(), self.initial_counts)
+
+
+if __name__ == '__main__':
+    unittest.main()
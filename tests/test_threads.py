@@ -0,0 +1,188 @@
+'''
+    Tests of commands run by several threads at once : concurrent mv (in both directions between two
+    directories and of directories), rm and put finish without deadlock and leave a consistent namespace,
+    every inode is reachable once from root and blocks in use are exactly blocks of reachable inodes
+'''
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import vfs_core_interface as vfs
+
+
+class ThreadedCommandTest(unittest.TestCase):
+
+    file_count = 60
+    thread_timeout = 60     # seconds, threads still running after it are taken as deadlocked
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp_dir.name)
+        os.mkdir('src')
+        self.deadlocked = False
+
+        # contents of every file follow its name wherever it is moved
+        rand = random.Random(23)
+        self.data = {}
+        for i in range(self.file_count):
+            self.data['f%d' % i] = rand.randbytes(rand.choice([0, 1, 100, 4096, 9000, 70000]))
+            with open(os.path.join('src', 'f%d' % i), 'wb') as fp:
+                fp.write(self.data['f%d' % i])
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            vfs.init_filesystem()
+            vfs.create_vfs(False, 4096, 8192, 1024)
+            vfs.mount_vfs()
+            vfs.set_cur_usr('admin')
+            vfs.mkdir_cmd(['a', 'b', 'c'])
+            vfs.cd_cmd('/a')
+            for i in range(self.file_count):
+                vfs.put_cmd(self.get_ext_path('f%d' % i))
+            vfs.mkdir_cmd(['d%d' % i for i in range(4)])
+            vfs.cd_cmd('/')
+
+    def tearDown(self):
+        # drive lock of deadlocked threads is never released
+        if not self.deadlocked:
+            with contextlib.redirect_stdout(io.StringIO()):
+                vfs.exit_cmd()
+        os.chdir(self.cwd)
+        self.tmp_dir.cleanup()
+
+    def get_ext_path(self, name):
+        return os.path.join(self.tmp_dir.name, 'src', name)
+
+    def run_threads(self, workers):
+        errors = []
+        def run(worker, seed):
+            try:
+                vfs.set_cur_usr('admin')
+                worker(random.Random(seed))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=run, args=(worker, seed), daemon=True)
+                   for seed, worker in enumerate(workers)]
+        with contextlib.redirect_stdout(io.StringIO()):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(self.thread_timeout)
+        self.deadlocked = any(thread.is_alive() for thread in threads)
+        self.assertFalse(self.deadlocked, 'threads deadlocked')
+        self.assertEqual(errors, [])
+
+    def get_namespace(self):
+        # path -> inode of every reachable inode, checking entries against inodes they name
+        fs = vfs.file_system
+        namespace = {'/': 0}
+        stack = [('', 0)]
+        while len(stack) > 0:
+            path, inode_num = stack.pop()
+            for name, child in fs.get_children(inode_num).items():
+                node = fs.active_inode_dict[child]
+                self.assertEqual(node.filename, name)
+                self.assertEqual(node.parent_inode, inode_num)
+                self.assertNotIn(child, namespace.values())
+                namespace[path + '/' + name] = child
+                if node.file_type == 0:
+                    stack.append((path + '/' + name, child))
+        return namespace
+
+    def assert_consistent(self):
+        fs = vfs.file_system
+        namespace = self.get_namespace()
+
+        # inodes in use are exactly reachable inodes
+        self.assertEqual(fs.total_inodes - fs.get_free_inode_count(), len(namespace))
+        self.assertEqual(sorted(x for x in range(fs.total_inodes) if fs.inode_list[x] == x),
+                         sorted(namespace.values()))
+
+        # blocks in use are blocks of reachable inodes and reserved 0th block, none used twice
+        blocks = [x for inode_num in namespace.values() for x in fs.active_inode_dict[inode_num].get_data_blocks()]
+        self.assertEqual(len(blocks), len(set(blocks)))
+        self.assertEqual(sorted(blocks), [x for x in range(1, fs.total_blocks) if fs.block_bitmap.is_used(x)])
+
+        # files kept their data, whichever directory they ended in
+        files = {path: inode_num for path, inode_num in namespace.items()
+                 if fs.active_inode_dict[inode_num].file_type == 1}
+        for path, inode_num in files.items():
+            self.assertEqual(bytes(vfs.cat_cmd([path])[0]), self.data[path.rsplit('/', 1)[1]], path)
+        return namespace
+
+    def check_remount(self, namespace):
+        with contextlib.redirect_stdout(io.StringIO()):
+            vfs.exit_cmd()
+            vfs.init_filesystem()
+            vfs.mount_vfs()
+            vfs.set_cur_usr('admin')
+        self.assertEqual(self.assert_consistent(), namespace)
+
+    def test_cross_moves_and_removes(self):
+        # files are moved both ways between 'a' and 'b' while other threads remove some of them
+        def mover(rand):
+            for x in range(300):
+                src, dst = rand.sample(['a', 'b'], 2)
+                vfs.mv_cmd('/%s/f%d' % (src, rand.randrange(self.file_count)), '/' + dst)
+
+        def remover(rand):
+            for x in range(40):
+                vfs.rm_cmd('/%s/f%d' % (rand.choice(['a', 'b']), rand.randrange(self.file_count)))
+
+        self.run_threads([mover]*6 + [remover]*2)
+        namespace = self.assert_consistent()
+        self.assertLess(len(namespace), self.file_count + 8)
+        self.check_remount(namespace)
+
+    def test_directory_moves_and_puts(self):
+        # directories are moved between 'a', 'b' and into each other while files are put into them
+        def dir_mover(rand):
+            dirs = ['/a', '/b'] + ['/%s/d%d' % (p, i) for p in 'ab' for i in range(4)]
+            for x in range(150):
+                vfs.mv_cmd('/%s/d%d' % (rand.choice('ab'), rand.randrange(4)), rand.choice(dirs))
+
+        def putter(rand):
+            vfs.cd_cmd('/c')
+            vfs.mkdir_cmd(['p%d' % threading.get_ident()])
+            vfs.cd_cmd('p%d' % threading.get_ident())
+            for x in range(30):
+                name = 'f%d' % rand.randrange(self.file_count)
+                vfs.put_cmd(self.get_ext_path(name))
+                if rand.random() < 0.3:
+                    vfs.rm_cmd(name)
+
+        def tree_remover(rand):
+            for x in range(30):
+                vfs.rm_r_cmd('/%s/d%d/d%d' % (rand.choice('ab'), rand.randrange(4), rand.randrange(4)))
+                vfs.mv_cmd('/a/f%d' % rand.randrange(self.file_count), '/b')
+
+        self.run_threads([dir_mover]*4 + [putter]*3 + [tree_remover]*2)
+        namespace = self.assert_consistent()
+        self.assertTrue(any(path.startswith('/c/p') for path in namespace))
+        self.check_remount(namespace)
+
+    def test_same_file_from_all_threads(self):
+        # every thread puts, moves and removes same names
+        def worker(rand):
+            for x in range(60):
+                name = 'f%d' % rand.randrange(4)
+                vfs.cd_cmd(rand.choice(['/a', '/b']))
+                vfs.put_cmd(self.get_ext_path(name))
+                vfs.mv_cmd(name, rand.choice(['/a', '/b', '/c']))
+                if rand.random() < 0.5:
+                    vfs.rm_cmd('/%s/%s' % (rand.choice('abc'), name))
+
+        self.run_threads([worker]*8)
+        self.check_remount(self.assert_consistent())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,18 @@
+'''
+    Importing required modules
+'''
+import threading
+
+
+class ThreadState(threading.local):
+
+    '''
+        Constructor :
+            runs once in every thread that uses the object, every thread starts with its own copy of 'defaults'
+            (current directory and user), attributes set later by a thread are seen only by that thread
+    '''
+    def __init__(self, defaults):
+        self.__dict__.update(defaults)
+        self.held_locks = []        # inode locks held by command running in this thread
+        self.command_depth = 0      # no of nested commands running in this thread (put calls touch)
+        self.alloc_group = -1       # allocation group of thread, given on first allocation
@@ -6,7 +6,9 @@ Importing supporting class files and packages
 from superblock import *
 from inode import *
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 
+import functools
 import os
 import math
 import ntpath
@@ -30,22 +32,150 @@ def init_filesystem():
 
 
 '''
-    Function to create new virtual file system
+    Decorator of commands, commands can be run by several threads at once :
+    command runs with drive lock held for read (sync waits till running commands return),
+    inode locks taken by command are released when it returns; a command called by another command
+    (touch by put) runs under locks of calling command
 '''
-def create_vfs():
+def vfs_command(cmd):
+    @functools.wraps(cmd)
+    def run(*args, **kwargs):
+        state = file_system.thread_state
+        if state.command_depth > 0:
+            return cmd(*args, **kwargs)
+
+        file_system.drive_lock.acquire_read()
+        state.command_depth += 1
+        try:
+            return cmd(*args, **kwargs)
+        finally:
+            state.command_depth -= 1
+            file_system.unlock_inodes()
+            file_system.drive_lock.release_read()
+    return run
+
+
+'''
+    Decorator of functions that need drive to themselves (mount, create, sync, exit) : function waits till
+    running commands return, and commands wait till it returns
+'''
+def vfs_exclusive(func):
+    @functools.wraps(func)
+    def run(*args, **kwargs):
+        file_system.drive_lock.acquire_write()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            file_system.drive_lock.release_write()
+    return run
+
+
+'''
+    Function to lock inodes used by a command : resolve() returns (read_nums, write_nums) found from paths
+    without holding locks (-1 for paths not found), inodes are locked and resolve() is repeated under locks;
+    if paths changed meanwhile, inodes are locked again; returns (read_nums, write_nums) that are locked
+'''
+def lock_resolved(resolve):
+    global file_system
+    keep = len(file_system.thread_state.held_locks)
+    nums = resolve()
+    while True:
+        file_system.lock_inodes(*nums)
+        locked = resolve()
+        if locked == nums:
+            return nums
+        file_system.unlock_inodes(keep)
+        nums = locked
+
+
+'''
+    Function to fetch inode number of absolute or relative path 'path', -1 if path does not exist
+'''
+def resolve_path_core(path):
+    global file_system
+    if len(path) == 0:
+        return -1
+    if path[0] == '/':
+        return file_system.validate_abs_path(path)
+    # relative path starts at current directory, which might have been removed by another thread
+    if file_system.cur_working_dir_num not in file_system.active_inode_dict:
+        return -1
+    return file_system.validate_rel_path(path)
+
+
+'''
+    Function to fetch (parent inode number, inode number) of path 'path', (-1, -1) if path does not exist or is root
+'''
+def resolve_parent_core(path):
+    global file_system
+    inode_num = resolve_path_core(path)
+    node = file_system.active_inode_dict.get(inode_num)
+    if inode_num <= 0 or node is None:
+        return -1, -1
+    return node.parent_inode, inode_num
+
+
+'''
+    Function to check whether mv of 'source_inode' (in directory 'parent') to 'dest_inode' moves a directory
+    to another directory
+'''
+def is_dir_move(parent, source_inode, dest_inode):
+    global file_system
+    if source_inode < 0 or dest_inode < 0 or dest_inode == parent:
+        return False
+    source = file_system.active_inode_dict.get(source_inode)
+    dest = file_system.active_inode_dict.get(dest_inode)
+    return source is not None and dest is not None and source.file_type == 0 and dest.file_type == 0
+
+
+'''
+    Function to check whether inode 'inode_num' is directory 'dir_inode' or lies below it
+    (parents of directories do not change while rename lock is held)
+'''
+def is_in_tree(dir_inode, inode_num):
     global file_system
-    return file_system.create_empty_vfs()
+    while inode_num != dir_inode:
+        if inode_num <= 0:
+            return False
+        inode_num = file_system.active_inode_dict[inode_num].parent_inode
+    return True
+
+
+'''
+    Function to fetch inode numbers of directory tree 'inode_num', level by level (parents come before their children)
+'''
+def get_tree_inodes(inode_num):
+    global file_system
+    tree = [inode_num]
+    i = 0
+    while i < len(tree):
+        tree.extend(file_system.get_children(tree[i]).values())
+        i += 1
+    return tree
+
+
+'''
+    Function to create new virtual file system,
+    preallocate reserves disk space for entire drive instead of keeping data area sparse,
+    block_size, total_blocks and total_inodes set the geometry of new drive
+'''
+@vfs_exclusive
+def create_vfs(preallocate=False, block_size=4096, total_blocks=16384, total_inodes=1024):
+    global file_system
+    return file_system.create_empty_vfs(preallocate, block_size, total_blocks, total_inodes)
 
 
 '''
     function to mount existing filesystem, identify root
+    use_mmap maps entire drive into memory (drive must fit in RAM)
 '''
-def mount_vfs():
+@vfs_exclusive
+def mount_vfs(use_mmap=False):
 
     # declaring file_system aas global variable
     global file_system
     #file_system = Superblock()
-    return file_system.read_vfs()
+    return file_system.read_vfs(use_mmap)
 
 
 
@@ -58,12 +188,13 @@ def get_cwd():
     if file_system == 0:
         return '...'
     else:
-        return file_system.cur_working_dir
+        return file_system.get_cwd()
 
 
 '''
     Function to implement touch command
 '''
+@vfs_command
 def touch_cmd(fname_list):
     global file_system
 
@@ -73,9 +204,9 @@ def touch_cmd(fname_list):
 
 
     for filename in fname_list:
-        # check if length of filename is <= 64
-        if len(filename) > 64:
-            print('filename can have max 64 characters !')
+        # check if length of filename is <= 64 bytes
+        if not Inode.name_fits(filename):
+            print('filename can have max 64 bytes (UTF-8) !')
             return
         # check if length of filename is zero
         if len(filename) == 0:
@@ -86,16 +217,21 @@ def touch_cmd(fname_list):
             print('filename contains invalid characters !')
             return
 
+    # locking current directory and files already present in it
+    lock_resolved(lambda: ([], [cur_wdno] + list(map(file_system.get_file_inode_number, fname_list))))
+    if cur_wdno not in file_system.active_inode_dict:
+        print('current directory has been removed !')
+        return
+
     # Check if user has access to edit current working dir
     if not file_system.active_inode_dict[cur_wdno].get_write_perm(cur_uidx):
         print('current user do not have write permission to current directory')
         return
 
-    # check if file exists in curernt directory
-    cwd_files = file_system.get_cwd_directories() + file_system.get_cwd_filenames()
-
     for filename in fname_list:
-        if filename not in cwd_files:
+        # check if file exists in curernt directory
+        inode_num = file_system.get_file_inode_number(filename)
+        if inode_num < 0:
             # fetching inode
             inode_num = file_system.fetch_inode()
 
@@ -108,7 +244,9 @@ def touch_cmd(fname_list):
 
 
             # adding inode to dentry objects
-            file_system.add_inode_to_dentry(inode_num)
+            if file_system.add_inode_to_dentry(inode_num) < 0:
+                file_system.release_inode(inode_num)
+                return
 
             # setting file creation and modify time
             file_system.active_inode_dict[inode_num].set_file_creation_time()
@@ -118,24 +256,21 @@ def touch_cmd(fname_list):
             file_system.active_inode_dict[inode_num].set_read_perm(list([file_system.cur_uidx, 0]))
             file_system.active_inode_dict[inode_num].set_write_perm(list([file_system.cur_uidx, 0]))
 
-        else:
-            idx = file_system.child_dict[file_system.cur_working_dir_num][1].index(filename)
-            inode_num = file_system.child_dict[file_system.cur_working_dir_num][0][idx]
-
         # modifying access time
         file_system.active_inode_dict[inode_num].set_last_modify_time()
 
-        # writing inode to file
-        file_system.write_ilist_to_file()
-        file_system.active_inode_dict[inode_num].write_inode_to_file()
+        # marking inode to be written back to file
+        file_system.active_inode_dict[inode_num].mark_dirty()
 
 
 
 '''
     Function to implement ls command
 '''
+@vfs_command
 def ls_cmd():
     global file_system
+    file_system.lock_inodes([file_system.cur_working_dir_num])
 
     # to fetch list of all files and directories in "current working directory"
     return ['['+f+']' for f in file_system.get_cwd_directories()] + file_system.get_cwd_filenames()
@@ -145,6 +280,7 @@ def ls_cmd():
 '''
     Function to implement rm command
 '''
+@vfs_command
 def rm_cmd(filename):
     global file_system
     cur_usr_idx = file_system.cur_uidx
@@ -154,14 +290,13 @@ def rm_cmd(filename):
     if len(filename) == 0:
         print('Invalid path.')
         return
-    if filename[0] == '/':
-        inode_num = file_system.validate_abs_path(filename)
-    else:
-        inode_num = file_system.validate_rel_path(filename)
+
+    # locking file and its directory
+    parent, inode_num = lock_resolved(lambda: ([], list(resolve_parent_core(filename))))[1]
 
     if inode_num > 0 :
 
-        if file_system.active_inode_dict[inode_num].file_type == 0 and len(file_system.child_dict[inode_num][0]) != 0 :
+        if file_system.active_inode_dict[inode_num].file_type == 0 and len(file_system.get_children(inode_num)) != 0 :
             print('\"'+filename+'\"'+' is not an empty directory !')
             print('use \"rm -r\" instead')
             return
@@ -174,9 +309,6 @@ def rm_cmd(filename):
 
         # relesing inode number
         file_system.release_inode(inode_num)
-
-        # writing changed inode list to file
-        file_system.write_ilist_to_file()
     else:
         print('File doesn\'t exists !')
 
@@ -185,6 +317,7 @@ def rm_cmd(filename):
 '''
     Function to implement rm -r command
 '''
+@vfs_command
 def rm_r_cmd(dirpath):
     global file_system
     cur_usr_idx = file_system.cur_uidx
@@ -194,10 +327,12 @@ def rm_r_cmd(dirpath):
     if len(dirpath) == 0:
         print('Invalid path.')
         return
-    if dirpath[0] == '/':
-        inode_num = file_system.validate_abs_path(dirpath)
-    else:
-        inode_num = file_system.validate_rel_path(dirpath)
+
+    # locking directory of tree and every inode of tree
+    def resolve():
+        parent, x = resolve_parent_core(dirpath)
+        return ([], [parent] + (get_tree_inodes(x) if x > 0 else [x]))
+    inode_num = lock_resolved(resolve)[1][1]
 
     inode_Q = []
     if inode_num > 0:
@@ -211,7 +346,7 @@ def rm_r_cmd(dirpath):
                 if not file_system.active_inode_dict[tmp_i].get_write_perm(cur_usr_idx):
                     print('current user do not have write permission for all files in directory tree')
                     return
-                q = q + file_system.child_dict[tmp_i][0]
+                q = q + list(file_system.get_children(tmp_i).values())
             inode_Q.append(q)
 
         inode_Q.pop()
@@ -230,10 +365,6 @@ def rm_r_cmd(dirpath):
             # relesing inode number
             file_system.release_inode(tmp_inode)
 
-        # writing changed inode list,data block list to file
-        file_system.write_ilist_to_file()
-        file_system.write_dblist_to_file()
-
     else:
         print('Invalid file/directory path !')
 
@@ -262,6 +393,7 @@ def validate_rel_path_core(path):
 '''
     Function to implement 'mkdir' command
 '''
+@vfs_command
 def mkdir_cmd(dname_list):
     global file_system
     # fetch current working dir and current user
@@ -269,9 +401,9 @@ def mkdir_cmd(dname_list):
     cur_wdno = file_system.cur_working_dir_num
 
     for dirname in dname_list:
-        # check if length of filename <= 64
-        if len(dirname) > 64 :
-            print('Directory name can contain at most 64 characters !')
+        # check if length of directory name <= 64 bytes
+        if not Inode.name_fits(dirname):
+            print('Directory name can contain at most 64 bytes (UTF-8) !')
             return
 
         # check if any directory name is invalid
@@ -279,18 +411,21 @@ def mkdir_cmd(dname_list):
             print('filename cannot contain *, \',\\,/,[,]')
             return
 
+    # locking current directory
+    file_system.lock_inodes([], [cur_wdno])
+    if cur_wdno not in file_system.active_inode_dict:
+        print('current directory has been removed !')
+        return
+
     # Check if user has access to edit current working dir
     if not file_system.active_inode_dict[cur_wdno].get_write_perm(cur_uidx):
         print('current user do not have write permission to current directory.')
         return
 
 
-    # check if directory name exists in curernt directory
-    cwd_files = file_system.get_cwd_filenames()
-    cwd_dir = file_system.get_cwd_directories()
-
     for dirname in dname_list:
-        if dirname not in cwd_files and dirname not in cwd_dir:
+        # check if directory name exists in curernt directory
+        if file_system.get_file_inode_number(dirname) < 0:
             # fetching inode
             inode_num = file_system.fetch_inode()
 
@@ -302,16 +437,17 @@ def mkdir_cmd(dname_list):
             file_system.active_inode_dict[inode_num].set_write_perm([cur_uidx])
 
             # adding inode to dentry objects
-            file_system.add_inode_to_dentry(inode_num)
+            if file_system.add_inode_to_dentry(inode_num) < 0:
+                file_system.release_inode(inode_num)
+                return
 
             # modifying access time, file creation time and modify time
             file_system.active_inode_dict[inode_num].set_last_access_time()
             file_system.active_inode_dict[inode_num].set_file_creation_time()
             file_system.active_inode_dict[inode_num].set_last_modify_time()
 
-            # writing inode list and new inode to file
-            file_system.write_ilist_to_file()
-            file_system.active_inode_dict[inode_num].write_inode_to_file()
+            # marking new inode to be written back to file
+            file_system.active_inode_dict[inode_num].mark_dirty()
 
 
         else:
@@ -319,8 +455,9 @@ def mkdir_cmd(dname_list):
 
 
 '''
-    Function to implement cd command
+    Function to implement cd command, current directory is kept per thread
 '''
+@vfs_command
 def cd_cmd(path):
     global file_system
     cur_usr_idx = file_system.cur_uidx
@@ -330,17 +467,23 @@ def cd_cmd(path):
     if len(path) == 0:
         print('Invalid path.')
         return
-    if path == '..':
-        inode_num = file_system.active_inode_dict[file_system.cur_working_dir_num].parent_inode
-        file_system.set_cwd(inode_num)
-        return
     if path == '$' or path == '.':
         file_system.set_cwd(0)
         return
-    if path[0] == '/':
-        inode_num = file_system.validate_abs_path(path)
+
+    # locking current directory (start of relative path) and directory being entered
+    cur_wdno = file_system.cur_working_dir_num
+    if path == '..':
+        file_system.lock_inodes([cur_wdno])
     else:
-        inode_num = file_system.validate_rel_path(path)
+        inode_num = lock_resolved(lambda: ([cur_wdno, resolve_path_core(path)], []))[0][1]
+    if (path == '..' or path[0] != '/') and cur_wdno not in file_system.active_inode_dict:
+        print('current directory has been removed !')
+        return
+
+    if path == '..':
+        file_system.set_cwd(file_system.active_inode_dict[cur_wdno].parent_inode)
+        return
 
     if inode_num == -1:
         print('Path invalid !')
@@ -356,28 +499,42 @@ def cd_cmd(path):
         return
 
 
+'''
+    Function to write back modified metadata, called at the end of every command
+'''
+@vfs_exclusive
+def sync_vfs():
+    global file_system
+    if file_system is not None and file_system.drive is not None:
+        file_system.sync_if_due()
+
+
 '''
     Function to perform write operations before exiting
 '''
+@vfs_exclusive
 def exit_cmd():
     global file_system
 
-    # dumping superblock, data list and inode list metadata to file
-    #file_system.write_sblock_to_file()
-    #file_system.write_dblist_to_file()
-    #file_system.write_ilist_to_file()
+    if file_system.drive is None:
+        return
+
+    # dumping superblock, data list, inode list and dirty inodes to file
+    file_system.sync()
 
-    # writing active inodes to file
-    #for inode_num in file_system.active_inode_dict:
-    #    file_system.active_inode_dict[inode_num].write_inode_to_file()
+    # closing the drive file opened at mount
+    file_system.close_drive()
 
 
 '''
     Function to implement "put" command:
         "put <filepath1>" command receives an external file from filepath1 and puts it into 
         current working directory of virtual file system
+        file is streamed in chunks of Superblock.stream_chunk_size, blocks are allocated as data arrives,
+        progress(bytes_done, file_size) is called after every chunk
 '''
-def put_cmd(ext_path):
+@vfs_command
+def put_cmd(ext_path, progress=None):
     global file_system
     cur_usr_idx = file_system.cur_uidx
 
@@ -388,8 +545,8 @@ def put_cmd(ext_path):
         filename = ntpath.basename(ext_path)
 
         # check length of filename
-        if len(filename) > 64:
-            print('Filename has more than 64 characters !')
+        if not Inode.name_fits(filename):
+            print('Filename has more than 64 bytes (UTF-8) !')
             return
 
         # check validity of filename
@@ -404,100 +561,126 @@ def put_cmd(ext_path):
 
 
 
-        # check if file size is less than 64KB
-        if file_size < 65536:
-            # read file into a byte stream
-            byte_stream = bytearray()
-            try:
-                with open(ext_path, 'rb') as fp:
-                    fp.seek(0)
-                    byte_stream = bytearray(fp.read(file_size))
-            except IOError:
-                print('Error in reading file !')
-                return
+        # check if file exists in current working directory and if user has permission to edit directory,
+        # directory and file present under same name are locked
+        cwd_no = file_system.cur_working_dir_num
+        lock_resolved(lambda: ([], [cwd_no, file_system.get_file_inode_number(filename)]))
+        if cwd_no not in file_system.active_inode_dict:
+            print('current directory has been removed !')
+            return
+        if not file_system.active_inode_dict[cwd_no].get_write_perm(cur_usr_idx):
+            print('current user do not have permission to edit this directory.')
+            return
 
+        inode_num = file_system.get_file_inode_number(filename)
+        new_file = inode_num <= 0
 
-            # check if file exists in current working directory and if user has permission to edit directory
-            cwd_no = file_system.cur_working_dir_num
-            if not file_system.active_inode_dict[cwd_no].get_write_perm(cur_usr_idx):
-                print('current user do not have permission to edit this directory.')
+        if not new_file:
+            # blocks of directory hold its entries
+            if file_system.active_inode_dict[inode_num].file_type == 0:
+                print('\'' + filename + '\' is a directory !')
                 return
 
-            inode_num = file_system.get_file_inode_number(filename)
+            # releasing preoccupied blocks by existing inode
+            file_system.release_data_blocks(inode_num)
 
-            if inode_num > 0:
-                # releasing preoccupied blocks by existing inode
-                file_system.release_data_blocks(inode_num)
-                file_system.active_inode_dict[inode_num].blocks_allocated = 0
+        if file_size == 0:
+            # using touch if file size == 0
+            return touch_cmd([filename])
 
-                if file_size > 0:
-                    # allocating new blocks if file_size > 0
-                    data_blocks = file_system.fetch_data_blocks(math.ceil(file_size / 4096))
-                    if len(data_blocks) == 0:
-                        print('Error in fetching free data blocks !')
-                        return
-                else:
-                    # using touch if file size == 0
-                    return touch_cmd(filename)
+        if new_file:
+            # fetching free inode from file
+            inode_num = file_system.fetch_inode()
+            if inode_num < 0:
+                return
 
-            else:
+        # setting inode parameters appropriately, size grows as file is streamed
+        file_system.active_inode_dict[inode_num].filename = filename
+        file_system.active_inode_dict[inode_num].file_type = 1
+        file_system.active_inode_dict[inode_num].parent_inode = file_system.cur_working_dir_num
+        file_system.active_inode_dict[inode_num].size_in_bytes = 0
+        file_system.active_inode_dict[inode_num].set_last_access_time()
+        file_system.active_inode_dict[inode_num].set_last_modify_time()
+        file_system.active_inode_dict[inode_num].set_file_creation_time()
+        file_system.active_inode_dict[inode_num].set_write_perm([cur_usr_idx])
+        file_system.active_inode_dict[inode_num].set_read_perm([cur_usr_idx])
+
+        # streaming file to data blocks
+        if stream_to_inode(ext_path, inode_num, file_size, progress) < 0:
+            # dropping partially written file
+            file_system.release_data_blocks(inode_num)
+            file_system.active_inode_dict[inode_num].size_in_bytes = 0
+            if new_file:
+                file_system.release_inode(inode_num)
+            return
 
-                if file_size > 0:
-                    # allocating new blocks if file_size > 0
-                    data_blocks = file_system.fetch_data_blocks(math.ceil(file_size / 4096))
-                    if len(data_blocks) == 0:
-                        print('Error in fetching free data blocks !')
-                        return
-                else:
-                    # using touch if file size == 0
-                    return touch_cmd(filename)
+        # add inode to dentry
+        if new_file and file_system.add_inode_to_dentry(inode_num) < 0:
+            file_system.release_data_blocks(inode_num)
+            file_system.release_inode(inode_num)
+            return
 
-                # fetching free inode from file
-                inode_num = file_system.fetch_inode()
+        # marking new inode to be written back to file
+        file_system.active_inode_dict[inode_num].mark_dirty()
 
-            # setting inode parameters appropriately
-            file_system.active_inode_dict[inode_num].filename = filename
-            file_system.active_inode_dict[inode_num].file_type = 1
-            file_system.active_inode_dict[inode_num].parent_inode = file_system.cur_working_dir_num
-            file_system.active_inode_dict[inode_num].size_in_bytes = file_size
-            file_system.active_inode_dict[inode_num].blocks_allocated = len(data_blocks)
-            file_system.active_inode_dict[inode_num].set_last_access_time()
-            file_system.active_inode_dict[inode_num].set_last_modify_time()
-            file_system.active_inode_dict[inode_num].set_file_creation_time()
-            file_system.active_inode_dict[inode_num].set_write_perm([cur_usr_idx])
-            file_system.active_inode_dict[inode_num].set_read_perm([cur_usr_idx])
+    else:
+        print('File doesn\'t exists !')
+        return
 
 
-            # assigning direct data block pointers to inode
-            file_system.active_inode_dict[inode_num].direct_block_pointers = [0 for x in range(16)]
-            for i in range(len(data_blocks)):
-                file_system.active_inode_dict[inode_num].direct_block_pointers[i] = data_blocks[i]
+'''
+    Function to copy external file into data blocks of inode, one chunk at a time, data is copied by kernel
+    from external file to drive file (see BlockDevice.import_blocks), data blocks (and index tables)
+    are allocated per chunk, returns 1 on success, -1 otherwise
+'''
+def stream_to_inode(ext_path, inode_num, file_size, progress=None):
+    global file_system
+    node = file_system.active_inode_dict[inode_num]
+
+    # checking whole file up front, so that a put does not fail half way through
+    total_blocks = math.ceil(file_size / file_system.bytes_per_block)
+    if total_blocks > Inode.max_blocks:
+        print("File too large, max file size is " + str(Inode.max_blocks*file_system.bytes_per_block) + " bytes !")
+        return -1
+    if total_blocks > file_system.block_bitmap.get_free_count():
+        print('Error in fetching free data blocks !')
+        return -1
 
-            # writing file to data blocks
-            file_system.active_inode_dict[inode_num].write_stream_to_blocks(byte_stream)
+    try:
+        with open(ext_path, 'rb') as fp:
+            while node.size_in_bytes < file_size:
+                n = min(file_system.stream_chunk_size, file_size - node.size_in_bytes)
 
-            # add inode to dentry
-            file_system.add_inode_to_dentry(inode_num)
+                # allocating blocks for this chunk only
+                blocks_needed = math.ceil((node.size_in_bytes + n) / file_system.bytes_per_block) - node.blocks_allocated
+                if file_system.allocate_data_blocks(inode_num, blocks_needed) < 0:
+                    print('Error in fetching free data blocks !')
+                    return -1
 
-            # write data block list, inode list & new inode to file
-            file_system.write_ilist_to_file()
-            file_system.write_dblist_to_file()
-            file_system.active_inode_dict[inode_num].write_inode_to_file()
+                copied = node.import_data(fp.fileno(), node.size_in_bytes, node.size_in_bytes, n)
+                node.size_in_bytes += copied
+                node.mark_dirty()
 
+                if progress is not None:
+                    progress(node.size_in_bytes, file_size)
 
-        else:
-            print('File larger than 64KB , put operation aborted !')
-            return
-    else:
-        print('File doesn\'t exists !')
-        return
+                # external file was truncated while being copied
+                if copied < n:
+                    break
+    except IOError:
+        print('Error in reading file !')
+        return -1
+
+    return 1
 
 
 '''
     Function to implement 'get' command:
         get <filename> - extracts the 'file' provided in <filename> to current working directory of external OS
+        file is copied by kernel in chunks of Superblock.stream_chunk_size, progress(bytes_done, file_size) is called after every chunk
 '''
-def get_cmd(path):
+@vfs_command
+def get_cmd(path, progress=None):
     global file_system
     cur_usr_idx = file_system.cur_uidx
 
@@ -505,10 +688,9 @@ def get_cmd(path):
     if len(path) == 0:
         print('Invalid path.')
         return
-    if path[0] == '/':
-        inode_num = file_system.validate_abs_path(path)
-    else:
-        inode_num = file_system.validate_rel_path(path)
+
+    # file is only read, other readers are not blocked
+    inode_num = lock_resolved(lambda: ([resolve_path_core(path)], []))[0][0]
 
     if inode_num > 0:
 
@@ -521,17 +703,20 @@ def get_cmd(path):
             print('directory cannot be checked out.')
             return
 
-        byte_stream = file_system.active_inode_dict[inode_num].read_data_blocks()
-        filename = file_system.active_inode_dict[inode_num].filename
+        node = file_system.active_inode_dict[inode_num]
+        filename = node.filename
 
         if Path(filename).exists():
             print('File already exists at path - '+ str(Path.cwd()))
             return
         else:
             try:
+                # copying file one chunk at a time, data does not pass through python objects
                 with open(filename, 'wb') as fp:
-                    fp.seek(0)
-                    fp.write(byte_stream)
+                    for offset in range(0, node.size_in_bytes, file_system.stream_chunk_size):
+                        node.export_data(fp.fileno(), offset, offset, file_system.stream_chunk_size)
+                        if progress is not None:
+                            progress(min(offset + file_system.stream_chunk_size, node.size_in_bytes), node.size_in_bytes)
             except IOError:
                 print('Error in file creation !')
                 return
@@ -544,6 +729,7 @@ def get_cmd(path):
 '''
     Function to implement 'mv' command 
 '''
+@vfs_command
 def mv_cmd(source_path, dest_path):
 
     global file_system
@@ -556,19 +742,22 @@ def mv_cmd(source_path, dest_path):
     if len(source_path) == 0:
         print('Invalid path.')
         return
-    if source_path[0] == '/':
-        source_inode = file_system.validate_abs_path(source_path)
-    else:
-        source_inode = file_system.validate_rel_path(source_path)
-
 
     if len(dest_path) == 0:
         print('Invalid path.')
         return
-    if dest_path[0] == '/':
-        dest_inode = file_system.validate_abs_path(dest_path)
-    else:
-        dest_inode = file_system.validate_rel_path(dest_path)
+
+    # locking source, its directory and destination (both directories are locked, in inode number order),
+    # a directory moved to another directory also takes rename lock, taken before inode locks
+    renaming = False
+    while True:
+        parent, source_inode, dest_inode = lock_resolved(
+            lambda: ([], list(resolve_parent_core(source_path)) + [resolve_path_core(dest_path)]))[1]
+        if renaming or not is_dir_move(parent, source_inode, dest_inode):
+            break
+        file_system.unlock_inodes()
+        file_system.lock_rename()
+        renaming = True
 
     # checking validity of source and destination
     if source_inode == -1 :
@@ -584,18 +773,25 @@ def mv_cmd(source_path, dest_path):
             return
 
         # extract name out of destination path
-        dest_name = [s for s in dest_path.split('/') if s != []]
-        if len(dest_path) == 0:
+        dest_name = [s for s in dest_path.split('/') if s != '']
+        if len(dest_name) == 0:
             print('Destination path is empty !')
+            return
+        elif not Inode.name_fits(dest_name[-1]):
+            print('Filename has more than 64 bytes (UTF-8) !')
+            return
         else:
-            # renaming the source file
-            all_cwd_files = file_system.get_cwd_directories() + file_system.get_cwd_filenames()
-            if dest_name[-1] not in all_cwd_files:
+            # renaming the source file, new name must be free in directory of source
+            parent = file_system.active_inode_dict[source_inode].parent_inode
+            if file_system.get_child_inode(parent, dest_name[-1]) < 0:
+                old_name = file_system.active_inode_dict[source_inode].filename
+                file_system.remove_inode_from_dentry(source_inode)
                 file_system.active_inode_dict[source_inode].filename = dest_name[-1]
-                parent = file_system.active_inode_dict[source_inode].parent_inode
-                idx = file_system.child_dict[parent][0].index(source_inode)
-                file_system.child_dict[parent][1][idx] = dest_name[-1]
-                file_system.active_inode_dict[source_inode].write_inode_to_file()
+                if file_system.add_inode_to_dentry(source_inode) < 0:
+                    # entry slot freed above is still available to old name
+                    file_system.active_inode_dict[source_inode].filename = old_name
+                    file_system.add_inode_to_dentry(source_inode)
+                file_system.active_inode_dict[source_inode].mark_dirty()
                 return
             else:
                 print('Filename already exists !')
@@ -612,23 +808,27 @@ def mv_cmd(source_path, dest_path):
             print('current user do not have permission to write in destination')
             return
 
+        if is_dir_move(parent, source_inode, dest_inode) and is_in_tree(source_inode, dest_inode):
+            print('Cannot move a directory into itself !')
+            return
+
         filename = file_system.active_inode_dict[source_inode].filename
-        if filename in file_system.child_dict[dest_inode][1]:
+        if file_system.get_child_inode(dest_inode, filename) >= 0:
             print('Source filename already exists at destination !')
             return
         else:
-            # removing old entry from child list of 'source parent'
-            src_parent = file_system.active_inode_dict[source_inode].parent_inode
-            idx = file_system.child_dict[src_parent][0].index(source_inode)
-            file_system.child_dict[src_parent][0].pop(idx)
-            file_system.child_dict[src_parent][1].pop(idx)
+            # removing old entry from children of 'source parent'
+            file_system.remove_inode_from_dentry(source_inode)
 
-            # making new entry at child list of destination
+            # making new entry in children of destination, restoring old entry if destination has no space for it
+            old_parent = file_system.active_inode_dict[source_inode].parent_inode
             file_system.active_inode_dict[source_inode].parent_inode = dest_inode
-            file_system.child_dict[dest_inode][0].append(source_inode)
-            file_system.child_dict[dest_inode][1].append(filename)
-            
-            file_system.active_inode_dict[source_inode].write_inode_to_file()
+            if file_system.add_inode_to_dentry(source_inode) < 0:
+                file_system.active_inode_dict[source_inode].parent_inode = old_parent
+                file_system.add_inode_to_dentry(source_inode)
+                return
+
+            file_system.active_inode_dict[source_inode].mark_dirty()
 
     # when both source and destination are files, its a rename operation
     if file_system.active_inode_dict[dest_inode].file_type == 1 :
@@ -637,9 +837,12 @@ def mv_cmd(source_path, dest_path):
 
 
 '''
-    Function to copy a file into directory (currently source must be a file)
+    Function to copy a file into directory (currently source must be a file),
+    if clone is True copy shares data blocks of source, shared blocks are never written in place
+    (put writes a file anew into new blocks), a block is freed once no file uses it
 '''
-def cp_cmd(source_path, dest_path):
+@vfs_command
+def cp_cmd(source_path, dest_path, clone=False):
     global file_system
     cur_usr_idx = file_system.cur_uidx
 
@@ -648,25 +851,21 @@ def cp_cmd(source_path, dest_path):
     if len(source_path) == 0:
         print('Invalid path.')
         return
-    if source_path[0] == '/':
-        source_inode = file_system.validate_abs_path(source_path)
-    else:
-        source_inode = file_system.validate_rel_path(source_path)
 
     if len(dest_path) == 0:
         print('Invalid path.')
         return
-    if dest_path[0] == '/':
-        dest_inode = file_system.validate_abs_path(dest_path)
-    else:
-        dest_inode = file_system.validate_rel_path(dest_path)
+
+    # source is locked for read, destination directory for write
+    read_nums, write_nums = lock_resolved(lambda: ([resolve_path_core(source_path)], [resolve_path_core(dest_path)]))
+    source_inode, dest_inode = read_nums[0], write_nums[0]
 
     # checking validity of source and destination path
     if source_inode == -1:
         print('Invalid source path !')
         return
     if file_system.active_inode_dict[source_inode].file_type == 0:
-        print('Directory copy feature is not yet provided. Please use it to copy files only !')
+        print('Source is a directory, use \"cp -r\" to copy directories !')
         return
     if dest_inode == -1:
         print('Invalid destination path !')
@@ -676,7 +875,7 @@ def cp_cmd(source_path, dest_path):
         return
 
     # check if file with same name already exists at destination
-    if file_system.active_inode_dict[source_inode].filename in file_system.child_dict[dest_inode][1]:
+    if file_system.get_child_inode(dest_inode, file_system.active_inode_dict[source_inode].filename) >= 0:
         print('File with same name exists at destination !')
         return
 
@@ -689,50 +888,175 @@ def cp_cmd(source_path, dest_path):
     cp_inode = file_system.fetch_inode()
 
     if cp_inode > 0:
-        # copying basic parameters of an inode
-        file_system.active_inode_dict[cp_inode].read_mode = file_system.active_inode_dict[source_inode].read_mode
-        file_system.active_inode_dict[cp_inode].write_mode = file_system.active_inode_dict[source_inode].write_mode
-        file_system.active_inode_dict[cp_inode].edit_flag = file_system.active_inode_dict[source_inode].edit_flag
-        file_system.active_inode_dict[cp_inode].file_type = file_system.active_inode_dict[source_inode].file_type
-        file_system.active_inode_dict[cp_inode].size_in_bytes = file_system.active_inode_dict[source_inode].size_in_bytes
-        file_system.active_inode_dict[cp_inode].blocks_allocated = file_system.active_inode_dict[source_inode].blocks_allocated
-        file_system.active_inode_dict[cp_inode].filename = file_system.active_inode_dict[source_inode].filename
-
-        file_system.active_inode_dict[cp_inode].parent_inode = dest_inode
+        # copying basic parameters of an inode, adding dentry to filesystem
+        if copy_inode_params(source_inode, cp_inode, dest_inode) < 0:
+            file_system.release_inode(cp_inode)
+            return
 
-        # adding dentry to filesystem
-        file_system.add_inode_to_dentry(cp_inode)
 
+        # clone points to data blocks of source, only its inode and index tables are written
+        if clone and file_system.active_inode_dict[source_inode].blocks_allocated > 0:
+            if file_system.clone_data_blocks(source_inode, cp_inode) < 0:
+                file_system.remove_inode_from_dentry(cp_inode)
+                file_system.release_inode(cp_inode)
+                return
 
-        # fetching blocks if file size is non zero
-        if file_system.active_inode_dict[source_inode].blocks_allocated > 0:
-            data_blocks = file_system.fetch_data_blocks(file_system.active_inode_dict[source_inode].blocks_allocated)
-            if len(data_blocks) == 0:
+        # fetching blocks (and index tables for large files) if file size is non zero
+        elif file_system.active_inode_dict[source_inode].blocks_allocated > 0:
+            if file_system.allocate_data_blocks(cp_inode, file_system.active_inode_dict[source_inode].blocks_allocated) < 0:
                 print('Error in fetching free data blocks !')
+                file_system.remove_inode_from_dentry(cp_inode)
+                file_system.release_inode(cp_inode)
                 return
 
-            # Assigning data blocks to copied file
-            file_system.active_inode_dict[cp_inode].direct_block_pointers = [0 for x in range(16)]
-            for i in range(len(data_blocks)):
-                file_system.active_inode_dict[cp_inode].direct_block_pointers[i] = data_blocks[i]
-
-            # Copying the original file data to copied file
-            byte_stream = file_system.active_inode_dict[source_inode].read_data_blocks()
-            file_system.active_inode_dict[cp_inode].write_stream_to_blocks(byte_stream)
+            # Copying the original file data to copied file, blocks are copied inside drive file by kernel
+            try:
+                file_system.active_inode_dict[cp_inode].copy_data_from(file_system.active_inode_dict[source_inode])
+            except IOError:
+                print('Error in copying data blocks !')
 
-    # Write inode to drive file
-    file_system.active_inode_dict[cp_inode].write_inode_to_file()
+        # marking inode to be written back to drive file
+        file_system.active_inode_dict[cp_inode].mark_dirty()
 
     return
 
 
+'''
+    Function to copy basic parameters of inode 'source_inode' to new inode 'cp_inode'
+    and add it to directory 'parent_inode', returns -1 if directory has no space for new entry;
+    copied directory starts empty, its entries are added as its children are copied, copy is stamped
+    with current time (same as a new file)
+'''
+def copy_inode_params(source_inode, cp_inode, parent_inode):
+    global file_system
+    source = file_system.active_inode_dict[source_inode]
+    node = file_system.active_inode_dict[cp_inode]
+
+    node.read_mode = source.read_mode
+    node.write_mode = source.write_mode
+    node.edit_flag = source.edit_flag
+    node.file_type = source.file_type
+    node.size_in_bytes = source.size_in_bytes if source.file_type == 1 else 0
+    node.filename = source.filename
+    node.parent_inode = parent_inode
+
+    node.set_file_creation_time()
+    node.set_last_modify_time()
+    node.set_last_access_time()
+
+    return file_system.add_inode_to_dentry(cp_inode)
+
+
+'''
+    Function to implement 'cp -r' command : copies directory tree 'source_path' into directory 'dest_path',
+    inodes, data blocks and index tables of entire tree are allocated first, then file data is copied
+    by a pool of Superblock.copy_workers threads; metadata is written once, by sync at end of command
+'''
+@vfs_command
+def cp_r_cmd(source_path, dest_path, clone=False):
+    global file_system
+    cur_usr_idx = file_system.cur_uidx
+
+    # validating source and destination paths
+    source_inode, dest_inode = -1, -1
+    if len(source_path) == 0 or len(dest_path) == 0:
+        print('Invalid path.')
+        return
+
+    # entire source tree is locked for read, destination directory for write
+    read_nums, write_nums = lock_resolved(lambda: (get_tree_inodes(resolve_path_core(source_path)),
+                                                   [resolve_path_core(dest_path)]))
+    source_inode, dest_inode = read_nums[0], write_nums[0]
+
+    if source_inode == -1:
+        print('Invalid source path !')
+        return
+    if file_system.active_inode_dict[source_inode].file_type == 1:
+        return cp_cmd(source_path, dest_path, clone)
+    if dest_inode == -1 or file_system.active_inode_dict[dest_inode].file_type == 1:
+        print('Invalid destination path !')
+        return
+    if file_system.get_child_inode(dest_inode, file_system.active_inode_dict[source_inode].filename) >= 0:
+        print('File with same name exists at destination !')
+        return
+    if not file_system.active_inode_dict[dest_inode].get_write_perm(cur_usr_idx):
+        print('current user do not have permission to write at destination !')
+        return
+
+    # destination must not be inside source tree
+    x = dest_inode
+    while x != 0 and x != source_inode:
+        x = file_system.active_inode_dict[x].parent_inode
+    if x == source_inode:
+        print('Cannot copy a directory into itself !')
+        return
+
+    # every inode of source tree, level by level, parents come before their children
+    tree = read_nums
+
+    # checking space for entire tree up front, blocks of directories hold their entries and are not copied
+    files = {x for x in tree if file_system.active_inode_dict[x].file_type == 1
+             and file_system.active_inode_dict[x].blocks_allocated > 0}
+    blocks_needed = 0 if clone else sum(file_system.active_inode_dict[x].blocks_allocated for x in files)
+    index_needed = sum(len(file_system.active_inode_dict[x].get_index_tables()) for x in files)
+    if len(tree) > file_system.total_inodes - file_system.total_inodes_used:
+        print('Max file limit exceeded !')
+        return
+    if blocks_needed > file_system.block_bitmap.get_free_count():
+        print('Error in fetching free data blocks !')
+        return
+    if index_needed > file_system.total_index - file_system.total_used_index:
+        print('No free index tables available !')
+        return
+
+    # allocating inodes and blocks of tree, source inode -> copied inode
+    cp_map = {}
+    copy_runs = []
+    for x in tree:
+        # fetch_inode reports 'Max file limit exceeded !' itself, if another thread took the last free inodes
+        cp_inode = file_system.fetch_inode()
+        status = cp_inode
+        if cp_inode >= 0:
+            parent = dest_inode if x == source_inode else cp_map[file_system.active_inode_dict[x].parent_inode]
+            status = copy_inode_params(x, cp_inode, parent)
+            cp_map[x] = cp_inode
+
+        if status >= 0 and x in files:
+            if clone:
+                status = file_system.clone_data_blocks(x, cp_inode)
+            else:
+                status = file_system.allocate_data_blocks(cp_inode, file_system.active_inode_dict[x].blocks_allocated)
+        if status < 0:
+            # dropping partially copied tree, children first
+            for y in reversed(list(cp_map.values())):
+                file_system.remove_inode_from_dentry(y)
+                file_system.release_data_blocks(y)
+                file_system.release_inode(y)
+            return
+
+        if x in files and not clone:
+            copy_runs.extend(file_system.active_inode_dict[cp_inode].get_copy_runs(file_system.active_inode_dict[x]))
+
+        file_system.active_inode_dict[cp_inode].mark_dirty()
+
+    # copying file data, runs of all files are spread over worker threads
+    if len(copy_runs) > 0:
+        try:
+            with ThreadPoolExecutor(max_workers=file_system.copy_workers) as pool:
+                list(pool.map(lambda run: file_system.drive.copy_blocks(*run), copy_runs))
+        except IOError:
+            print('Error in copying data blocks !')
+
+
 
 '''
     Function to print detailed file list, should provide output resembling to command 'll' or 'ls -l'
 '''
 
+@vfs_command
 def ll_cmd():
     global file_system
+    file_system.lock_inodes([file_system.cur_working_dir_num])
     inode_ls = file_system.get_cwd_child_inodes()
     user_idx = file_system.cur_uidx
     ll_out = []
@@ -769,6 +1093,7 @@ def ll_cmd():
     Function to implement simple 'cat' command that accepts multiple filenames as
     arguments and prints it on standard output device
 '''
+@vfs_command
 def cat_cmd(file_list):
     global file_system
     cat_out = []
@@ -783,14 +1108,11 @@ def cat_cmd(file_list):
         print('missing file input for \'cat\' command')
         return cat_out
 
-    for file in file_list:
-        if len(file) > 0:
-            tmp_inode = -1
-            if file[0] == '/':
-                tmp_inode = file_system.validate_abs_path(file)
-            else:
-                tmp_inode = file_system.validate_rel_path(file)
+    # every file is locked for read
+    read_nums = lock_resolved(lambda: (list(map(resolve_path_core, file_list)), []))[0]
 
+    for file, tmp_inode in zip(file_list, read_nums):
+        if len(file) > 0:
             if tmp_inode == -1:
                 print('file does not exists')
                 return cat_out
@@ -821,6 +1143,7 @@ def cat_cmd(file_list):
 '''
     Function to implement 'chmod' 
 '''
+@vfs_command
 def chmod_cmd(perm, path, uidx=''):
     global file_system
     cur_uidx = file_system.cur_uidx
@@ -841,10 +1164,7 @@ def chmod_cmd(perm, path, uidx=''):
     if len(path) == 0:
         print('Invalid path.')
         return
-    if path[0] == '/':
-        inode_num = file_system.validate_abs_path(path)
-    else:
-        inode_num = file_system.validate_rel_path(path)
+    inode_num = lock_resolved(lambda: ([], [resolve_path_core(path)]))[1][0]
 
     if inode_num < 0 :
         print('Invalid path.')
@@ -866,8 +1186,8 @@ def chmod_cmd(perm, path, uidx=''):
         print('invalid permission assignment.')
         return
 
-    # writing changes to file
-    file_system.active_inode_dict[inode_num].write_inode_to_file()
+    # marking changes to be written back to file
+    file_system.active_inode_dict[inode_num].mark_dirty()
     return
 
 
@@ -878,9 +1198,18 @@ def pwd_cmd():
     global file_system
     return file_system.get_cwd()
 
+
+'''
+    Function to implement 'stats' command, returns counters of data block cache
+'''
+def stats_cmd():
+    global file_system
+    return file_system.get_cache_stats()
+
 '''
     Function to implement edit command
 '''
+@vfs_command
 def edit_cmd(data_stream, path, edit_opt):
     global file_system
     cur_uidx = file_system.cur_uidx
@@ -890,10 +1219,7 @@ def edit_cmd(data_stream, path, edit_opt):
     if len(path) == 0:
         print('Invalid path.')
         return
-    if path[0] == '/':
-        inode_num = file_system.validate_abs_path(path)
-    else:
-        inode_num = file_system.validate_rel_path(path)
+    inode_num = lock_resolved(lambda: ([], [resolve_path_core(path)]))[1][0]
 
     if inode_num < 0:
         print('Invalid path.')
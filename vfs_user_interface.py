@@ -19,8 +19,8 @@ import getpass
 '''
 
 cmd_parse_tree = {
-    "create" : {"vfs" : 1},
-    "mount" : 2,
+    "create" : {"vfs" : {"$": 1}},
+    "mount" : {"$": 2, "-m": 23},
     "touch" : {"#": 3},
     "ls"    : {"$": 4, "-l" : 14},
     "rm"    : {"#" : 5, "-r" : {"#" : 8}, '*' : 16},
@@ -29,7 +29,7 @@ cmd_parse_tree = {
     "put"   : {'#' : 9},
     "get"   : {'#' : 10},
     "mv"    : {'#' : {'#' : 11}},
-    "cp"    : {'#' : {'#' : 12}},
+    "cp"    : {'#' : {'#' : 12}, "-c" : {'#' : {'#' : 25}}, "-r" : {'#' : {'#' : 26}}, "-rc" : {'#' : {'#' : 27}}},
     "exit" : 13,
     "ll"    : {"$" : 14},
     'cat'   : {'#': 17},
@@ -38,6 +38,7 @@ cmd_parse_tree = {
     'chmod'   : 20,
     'ulist'     : 21,
     'pwd'     : 22,
+    'stats'   : 24,
 }
 
 cur_user_name = 'admin'
@@ -136,6 +137,28 @@ def dirname_validator(fname):
 
 
 
+'''
+    Function to parse options of 'create vfs' command : [-p] [-b <block_size>] [-n <no_of_blocks>] [-i <no_of_inodes>]
+    returns list of create_vfs() arguments, None if options are invalid
+'''
+def create_opt_parser(options):
+    create_args = [False, 4096, 16384, 1024]
+    opt_idx = {'-b': 1, '-n': 2, '-i': 3}
+
+    i = 0
+    while i < len(options):
+        if options[i] == '-p':
+            create_args[0] = True
+            i += 1
+        elif options[i] in opt_idx and i + 1 < len(options) and options[i+1].isdigit():
+            create_args[opt_idx[options[i]]] = int(options[i+1])
+            i += 2
+        else:
+            return None
+
+    return create_args
+
+
 '''
     Function to print file list
 '''
@@ -171,6 +194,23 @@ def print_cat(cat_out):
         return
 
 
+'''
+    Function to print block cache counters
+'''
+def print_stats(stats):
+    for key in stats:
+        print('{0:20s}'.format(key) + str(stats[key]))
+
+
+'''
+    Function to print progress of put/get, shown only for files larger than one chunk
+'''
+def print_progress(done, total):
+    if total <= Superblock.stream_chunk_size:
+        return
+    print('\r{0:3d}%  {1}/{2} bytes'.format(done*100 // total, done, total), end='' if done < total else '\n')
+
+
 '''
     Function to print user list
 '''
@@ -268,6 +308,11 @@ def command_interpreter(command):
             command[1] = '#'
             filename.append(dirname_validator(command[2]))
             command[2] = '#'
+        elif len(command) == 4 and command[1] in ('-c', '-r', '-rc'):
+            filename = [dirname_validator(command[2])]
+            command[2] = '#'
+            filename.append(dirname_validator(command[3]))
+            command[3] = '#'
         else:
             return -1, ''
     elif command[0] == 'ls':
@@ -276,6 +321,15 @@ def command_interpreter(command):
     elif command[0] == 'll':
         if len(command) == 1:
             command.append('$')
+    elif command[0] == 'mount':
+        if len(command) == 1:
+            command.append('$')
+    elif command[0] == 'create':
+        if len(command) >= 2:
+            filename = create_opt_parser(command[2:])
+            if filename is None:
+                return -1, ''
+            command = command[0:2] + ['$']
     elif command[0] == 'cat':
         if len(command) > 1:
             filename = command[1:]
@@ -320,10 +374,12 @@ def user_terminal():
             status, filename = command_interpreter(command)
 
             if status == 1:
-                create_vfs()
+                create_vfs(*filename)
                 mounted = 0
             elif status == 2:
                 mounted = mount_vfs()
+            elif status == 23:
+                mounted = mount_vfs(True)
             elif status == 3:
                 if len(filename) == 0:
                     print('missing filenames after \'touch\' command')
@@ -356,12 +412,12 @@ def user_terminal():
                 if len(filename) == 0:
                     print('Invalid path !')
                 else:
-                    put_cmd(filename)
+                    put_cmd(filename, print_progress)
             elif status == 10:
                 if len(filename) == 0:
                     print('Invalid path !')
                 else:
-                    get_cmd(filename)
+                    get_cmd(filename, print_progress)
             elif status == 11:
                 if len(filename) == 2:
                     mv_cmd(filename[0], filename[1])
@@ -372,6 +428,16 @@ def user_terminal():
                     cp_cmd(filename[0], filename[1])
                 else:
                     print('Invalid command !')
+            elif status == 25:
+                if len(filename) == 2:
+                    cp_cmd(filename[0], filename[1], True)
+                else:
+                    print('Invalid command !')
+            elif status == 26 or status == 27:
+                if len(filename) == 2:
+                    cp_r_cmd(filename[0], filename[1], status == 27)
+                else:
+                    print('Invalid command !')
             elif status == 13:
                 exit_cmd()
             elif status == 14:
@@ -395,8 +461,13 @@ def user_terminal():
                 print_ulist(ulist)
             elif status == 22:
                 print(get_cwd())
+            elif status == 24:
+                print_stats(stats_cmd())
             elif status == -1:
                 print('Invalid command !')
+
+            # writing back metadata modified by command
+            sync_vfs()
     except Exception as e:
         print(traceback.format_exc())
         print('Fatal error occured !')
@@ -439,13 +510,16 @@ def vfs_interface_init():
 
         if mounted < 1:
             cmd = input('>')
-            if cmd == 'create vfs':
-                status = create_vfs()
-                if status == 0:
+            if cmd.startswith('create'):
+                status, create_args = command_interpreter(cmd)
+                if status == 1 and create_vfs(*create_args) == 0:
                     mounted = 0
             elif cmd == 'mount':
                 if mounted != -1:
                     mounted = mount_vfs()
+            elif cmd == 'mount -m':
+                if mounted != -1:
+                    mounted = mount_vfs(True)
 
 
 